@@ -0,0 +1,120 @@
+"""
+Benchmarks of the best parameter selection, object merging and null value
+unification in building.
+
+Runs on synthetic measurement tables, so no database is needed. Run it
+from the life_td_data_generation folder:
+python -m benchmarks.benchmark_building
+"""
+
+import time
+
+from benchmarks.reference import (
+    best_para_loop,
+    objectmerging_loop,
+    unify_null_values_loop,
+)
+from benchmarks.synthetic import (
+    synthetic_measurements,
+    synthetic_objects,
+    synthetic_star_basic,
+)
+from building import (
+    best_para,
+    objectmerging,
+    unify_null_values,
+)
+
+
+def benchmark_best_para(n_rows=1000000, loop_rows=100000, repeat=3):
+    """
+    Times best_para and the previous loop on synthetic measurements.
+
+    The loop is only run on loop_rows measurements as it takes too long
+    on the full table.
+
+    :param int n_rows: Number of measurements for best_para.
+    :param int loop_rows: Number of measurements for the loop.
+    :param int repeat: Number of timing repetitions, the fastest is kept.
+    :returns: Dictionary of variant names and tuples of number of rows
+        and time in seconds.
+    :rtype: dict(str,tuple(int,float))
+    """
+    variants = {
+        "vectorized": (best_para, n_rows),
+        "vectorized, loop size": (best_para, loop_rows),
+        "loop": (best_para_loop, loop_rows),
+    }
+    results = {}
+    for name, (function, rows) in variants.items():
+        mes_table = synthetic_measurements(rows)
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function("teff_st", mes_table)
+            best = min(best, time.perf_counter() - start)
+        results[name] = (rows, best)
+    return results
+
+
+def benchmark_objectmerging(n_rows=200000, repeat=3):
+    """
+    Times objectmerging and the previous row by row version.
+
+    :param int n_rows: Number of objects.
+    :param int repeat: Number of timing repetitions, the fastest is kept.
+    :returns: Dictionary of variant names and tuples of number of rows
+        and time in seconds.
+    :rtype: dict(str,tuple(int,float))
+    """
+    variants = {"vectorized": objectmerging, "loop": objectmerging_loop}
+    cat = synthetic_objects(n_rows)
+    results = {}
+    for name, function in variants.items():
+        best = float("inf")
+        for _ in range(repeat):
+            copy = cat.copy()
+            start = time.perf_counter()
+            function(copy)
+            best = min(best, time.perf_counter() - start)
+        results[name] = (n_rows, best)
+    return results
+
+
+def benchmark_unify_null_values(n_rows=200000, repeat=3):
+    """
+    Times unify_null_values and the previous version on star_basic.
+
+    :param int n_rows: Number of rows of the star_basic table.
+    :param int repeat: Number of timing repetitions, the fastest is kept.
+    :returns: Dictionary of variant names and tuples of number of rows
+        and time in seconds.
+    :rtype: dict(str,tuple(int,float))
+    """
+    variants = {
+        "vectorized": unify_null_values,
+        "loop": unify_null_values_loop,
+    }
+    star_basic = synthetic_star_basic(n_rows)
+    results = {}
+    for name, function in variants.items():
+        best = float("inf")
+        for _ in range(repeat):
+            cat = {"star_basic": star_basic.copy()}
+            start = time.perf_counter()
+            function(cat)
+            best = min(best, time.perf_counter() - start)
+        results[name] = (n_rows, best)
+    return results
+
+
+if __name__ == "__main__":
+    print("best_para")
+    for name, (rows, seconds) in benchmark_best_para().items():
+        print(f"{name}: {rows} rows, {seconds:.2f} s")
+    print("objectmerging")
+    for name, (rows, seconds) in benchmark_objectmerging().items():
+        print(f"{name}: {rows} rows, {seconds:.2f} s")
+    print("unify_null_values")
+    for name, (rows, seconds) in benchmark_unify_null_values().items():
+        print(f"{name}: {rows} rows, {seconds:.2f} s")
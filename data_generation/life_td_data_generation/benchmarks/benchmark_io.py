@@ -0,0 +1,182 @@
+"""
+Micro-benchmarks of the string column handling in utils.io.
+
+Runs on the xml database tables in Path().data, so run it after creating
+the database, from the life_td_data_generation folder:
+python -m benchmarks.benchmark_io
+Without database tables it falls back to synthetic tables and says so in
+its output. Numbers from the synthetic tables do not stand for the real
+catalog.
+"""
+
+import glob
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from astropy.io import votable
+from benchmarks.reference import stringtoobject_dtype_list
+from benchmarks.synthetic import synthetic_objects, synthetic_star_basic
+from utils.io import Path, load, objecttostring, save, stringtoobject
+from utils.profiling import peak_rss_in_mb
+
+
+def string_memory(cat):
+    """
+    Estimates the memory taken up by the string columns of a table.
+
+    For object type columns the size of the Python string objects is added
+    to the size of the pointer array.
+
+    :param cat: Table to inspect.
+    :type cat: astropy.table.table.Table
+    :returns: Memory in bytes.
+    :rtype: int
+    """
+    nbytes = 0
+    for colname in cat.colnames:
+        col = cat[colname]
+        if col.dtype == object:
+            nbytes += col.data.nbytes + sum(sys.getsizeof(s) for s in col)
+        elif col.dtype.kind == "U":
+            nbytes += col.data.nbytes
+    return nbytes
+
+
+def string_tables(location=Path().data, n_rows=50000):
+    """
+    Loads the xml tables to benchmark on.
+
+    Falls back to synthetic objects and star_basic tables with fixed width
+    string columns, as read from xml, if location holds no xml tables.
+
+    :param str location: Folder containing the xml tables.
+    :param int n_rows: Number of rows of each synthetic table.
+    :returns: Tables and their origin, either location or "synthetic".
+    :rtype: tuple(list(astropy.table.table.Table),str)
+    """
+    paths = sorted(glob.glob(os.path.join(location, "*.xml")))
+    if paths:
+        tables = [votable.parse_single_table(path).to_table() for path in paths]
+        return tables, location
+    tables = [synthetic_objects(n_rows), synthetic_star_basic(n_rows)]
+    return [objecttostring(cat) for cat in tables], "synthetic"
+
+
+def benchmark_stringtoobject(location=Path().data, number=3000, repeat=5):
+    """
+    Times the string conversions on all xml tables in location.
+
+    :param str location: Folder containing the xml tables, see
+        string_tables for the fallback to synthetic tables.
+    :param int number: Length of longest string type element, as used by
+        load.
+    :param int repeat: Number of timing repetitions, the fastest is kept.
+    :returns: Origin of the tables and dictionary of variant names and
+        tuples of time in seconds and string memory in bytes, summed over
+        all tables.
+    :rtype: tuple(str,dict(str,tuple(float,int)))
+    """
+    tables, origin = string_tables(location)
+    variants = {
+        "dtype list, object": lambda cat: stringtoobject_dtype_list(
+            cat, number
+        ),
+        "dtype kind, object": lambda cat: stringtoobject(cat, number),
+        "dtype kind, unicode": lambda cat: stringtoobject(
+            cat, number, string_type="unicode"
+        ),
+    }
+    results = {}
+    for name, function in variants.items():
+        best = float("inf")
+        for _ in range(repeat):
+            copies = [cat.copy() for cat in tables]
+            start = time.perf_counter()
+            converted = [function(cat) for cat in copies]
+            best = min(best, time.perf_counter() - start)
+        results[name] = (best, sum(string_memory(cat) for cat in converted))
+    return origin, results
+
+
+def _load_peak_rss(location, path, mmap):
+    """
+    Loads a table and reads all of its string entries.
+
+    Runs in a fresh process of benchmark_load_memory, so that the peak
+    resident set size is not the one of earlier loads.
+
+    :param str location: Folder of the table.
+    :param str path: Name of the table.
+    :param bool mmap: Whether the table is memory mapped.
+    :returns: Increase of the peak resident set size in MB.
+    :rtype: float or None
+    """
+    before = peak_rss_in_mb()
+    [cat] = load([path], location=location, mmap=mmap)
+    for colname in cat.colnames:
+        if cat[colname].dtype.kind in "OU":
+            np.count_nonzero(np.ma.getdata(cat[colname]) == "")
+    if before is None:
+        return None
+    return peak_rss_in_mb() - before
+
+
+def _save_objects(location, n_rows):
+    """
+    Saves a synthetic objects table in the columnar binary format.
+
+    :param str location: Folder to save the table in.
+    :param int n_rows: Number of rows of the table.
+    """
+    save([synthetic_objects(n_rows)], ["objects"], location, fmt="npy")
+    return
+
+
+def benchmark_load_memory(n_rows=200000):
+    """
+    Measures the memory taken up by loading a table in the binary format.
+
+    A synthetic objects table is saved in the columnar binary format and
+    loaded in a fresh process each, read into memory with its strings
+    transformed into object type ones, or memory mapped with fixed width
+    strings. The memory mapped pages read count towards the resident set
+    size as well, but they are page cache that the system can drop again
+    instead of process memory. The table is created in a process of its
+    own too, since the peak resident set size of a started process
+    begins at the size of the process starting it. Run this before
+    anything else growing the calling process.
+
+    :param int n_rows: Number of rows of the table.
+    :returns: Dictionary of variant names and increases of the peak
+        resident set size in MB, None where it cannot be measured.
+    :rtype: dict(str,float)
+    """
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as location:
+        location += os.sep
+        with context.Pool(1) as pool:
+            pool.apply(_save_objects, (location, n_rows))
+        results = {}
+        for name, mmap in [
+            ("read, object", False),
+            ("mmap, fixed width", True),
+        ]:
+            with context.Pool(1) as pool:
+                results[name] = pool.apply(
+                    _load_peak_rss, (location, "objects", mmap)
+                )
+    return results
+
+
+if __name__ == "__main__":
+    print("loading synthetic objects, peak RSS increase:")
+    for name, megabytes in benchmark_load_memory().items():
+        print(f"{name}: {megabytes} MB")
+    origin, results = benchmark_stringtoobject()
+    print(f"tables: {origin}")
+    for name, (seconds, nbytes) in results.items():
+        print(f"{name}: {seconds * 1000:.2f} ms, {nbytes / 1e6:.2f} MB")
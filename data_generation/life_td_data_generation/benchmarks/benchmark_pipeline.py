@@ -0,0 +1,119 @@
+"""
+Benchmarks of the whole building of the database tables and of its
+merge steps on synthetic provider data.
+
+Needs neither network access nor downloaded data. Run it from the
+life_td_data_generation folder, optionally giving the numbers of objects:
+python -m benchmarks.benchmark_pipeline 10000 100000 1000000
+"""
+
+import copy
+import sys
+import time
+
+from benchmarks.synthetic import synthetic_provider_tables
+from building import (
+    best_para,
+    build_source_index,
+    build_sources_table,
+    build_tables,
+    matching_parameters,
+    provider_data_merging,
+)
+from utils.profiling import StageReport
+
+
+def benchmark_build_tables(n_objects=10000, seed=0):
+    """
+    Times build_tables end to end, stage by stage.
+
+    :param int n_objects: Number of distinct objects of the synthetic
+        providers.
+    :param int seed: Seed of the random number generator.
+    :returns: Stages of the StageReport of build_tables.
+    :rtype: list(dict)
+    """
+    prov_tables_dict = synthetic_provider_tables(n_objects, seed)
+    report = StageReport()
+    build_tables(prov_tables_dict, report)
+    return report.stages
+
+
+def benchmark_merge_steps(n_objects=10000, seed=0, repeat=3):
+    """
+    Times the steps merging the provider tables on their own.
+
+    Each step runs on a fresh copy of the provider tables. The sources
+    table is built beforehand and not timed.
+
+    :param int n_objects: Number of distinct objects of the synthetic
+        providers.
+    :param int seed: Seed of the random number generator.
+    :param int repeat: Number of timing repetitions, the fastest is kept.
+    :returns: Dictionary of step names and times in seconds.
+    :rtype: dict(str,float)
+    """
+    prov_tables_dict = synthetic_provider_tables(n_objects, seed)
+    cat = build_sources_table(prov_tables_dict)
+    source_index = build_source_index(cat["sources"])
+
+    def merge_objects(cat, prov_tables_dict):
+        return provider_data_merging(
+            cat, "objects", prov_tables_dict, o_merging=True
+        )
+
+    def match_sources(cat, prov_tables_dict):
+        for prov_name in prov_tables_dict:
+            cat = matching_parameters(
+                cat, prov_name, prov_tables_dict, "mes_teff_st", source_index
+            )
+        return cat
+
+    def merge_measurements(cat, prov_tables_dict):
+        return provider_data_merging(
+            cat,
+            "mes_teff_st",
+            prov_tables_dict,
+            para_match=True,
+            source_index=source_index,
+        )
+
+    def best_teff(cat, prov_tables_dict):
+        return best_para("teff_st", cat["mes_teff_st"])
+
+    merged = merge_measurements(dict(cat), copy.deepcopy(prov_tables_dict))
+    steps = {
+        "objects merging": (merge_objects, cat),
+        "source matching mes_teff_st": (match_sources, cat),
+        "merging mes_teff_st": (merge_measurements, cat),
+        "best_para teff_st": (best_teff, merged),
+    }
+    results = {}
+    for name, (function, start_cat) in steps.items():
+        best = float("inf")
+        for _ in range(repeat):
+            copies = copy.deepcopy(prov_tables_dict)
+            cat_copy = dict(start_cat)
+            start = time.perf_counter()
+            function(cat_copy, copies)
+            best = min(best, time.perf_counter() - start)
+        results[name] = best
+    return results
+
+
+if __name__ == "__main__":
+    scales = [int(arg) for arg in sys.argv[1:]] or [10000, 100000]
+    for n_objects in scales:
+        print(f"{n_objects} objects")
+        for name, seconds in benchmark_merge_steps(n_objects).items():
+            print(f"{name}: {seconds:.2f} s")
+        stages = benchmark_build_tables(n_objects)
+        for stage in stages:
+            print(
+                f"{stage['stage']}: {stage['wall_time_in_s']:.2f} s, "
+                f"process peak {stage['process_peak_rss_in_mb']} MB "
+                f"(+{stage['peak_rss_increase_in_mb']}), "
+                f"rows {stage.get('rows')}"
+            )
+        total = sum(stage["wall_time_in_s"] for stage in stages)
+        print(f"build_tables: {total:.2f} s")
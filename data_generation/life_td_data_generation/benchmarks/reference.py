@@ -0,0 +1,404 @@
+"""
+Previous implementations of functions that have since been rewritten.
+
+They are kept as reference only, the benchmarks time them against the
+current functions and the tests check that both give the same result.
+"""
+
+import numpy as np
+from astropy.table import Column, MaskedColumn, Table, join, vstack
+from building import (
+    _get_parameter_columns,
+    matching_parameters,
+    null_value_columns,
+)
+from provider.life import (
+    assign_diff_lum_classes,
+    assign_null_values,
+    deal_with_leading_d_sptype,
+    deal_with_middle_minus,
+    initiate_columns,
+)
+from provider.utils import nullvalues, replace_value
+
+
+def assign_type(cat: Table, i: int) -> str:
+    """
+    Assigns an object type based on two potential type columns.
+
+    Priority is given to 'type_2' unless it is masked or 'None'.
+
+    :param cat: The table containing type columns.
+    :type cat: Table
+    :param i: Index of the row to process.
+    :type i: int
+    :return: The assigned type string.
+    :rtype: str
+    """
+    # Check if 'type_2' is masked or equal to 'None', then fall back to
+    # 'type_1', otherwise use 'type_2'
+    val_2 = cat["type_2"][i]
+    if isinstance(val_2, np.ma.core.MaskedConstant) or val_2 == "None":
+        cat["type"][i] = cat["type_1"][i]
+    else:
+        cat["type"][i] = val_2
+    return cat["type"][i]
+
+
+def idsjoin_loop(cat: Table, column_ids1: str, column_ids2: str) -> Table:
+    """
+    Previous idsjoin, merging the identifiers row by row.
+
+    :param cat: Table containing the two identifier columns.
+    :type cat: Table
+    :param column_ids1: Name of the first identifier column.
+    :type column_ids1: str
+    :param column_ids2: Name of the second identifier column.
+    :type column_ids2: str
+    :returns: Table with the merged ids column.
+    :rtype: Table
+    """
+    ids = []
+    for colname in [column_ids1, column_ids2]:
+        if isinstance(cat[colname], MaskedColumn):
+            ids.append(cat[colname].filled(""))
+        else:
+            ids.append(cat[colname])
+    merged_ids = []
+    for val1, val2 in zip(*ids):
+        ids1_list = val1.split("|") if val1 not in (None, "") else []
+        ids2_list = val2.split("|") if val2 not in (None, "") else []
+        unique_ids = set(ids1_list + ids2_list) - {""}
+        merged_ids.append("|".join(sorted(unique_ids)))
+    cat["ids"] = Column(data=merged_ids, dtype=object)
+    return cat
+
+
+def objectmerging_loop(cat: Table) -> Table:
+    """
+    Previous objectmerging, merging identifiers and types row by row.
+
+    :param cat: Table containing the ids_1, ids_2, type_1 and type_2
+        columns.
+    :type cat: Table
+    :returns: Table with merged ids and type columns.
+    :rtype: Table
+    """
+    cat = idsjoin_loop(cat, "ids_1", "ids_2")
+    cat.remove_columns(["ids_1", "ids_2"])
+    cat["type"] = Column(dtype=object, length=len(cat))
+    cat["type_1"] = cat["type_1"].astype(object)
+    cat["type_2"] = cat["type_2"].astype(object)
+    for i in range(len(cat)):
+        cat["type"][i] = assign_type(cat, i)
+    cat.remove_columns(["type_1", "type_2"])
+    return cat
+
+
+def best_para_loop(para: str, mes_table: Table) -> Table:
+    """
+    Previous best_para, looping over the groups and quality levels.
+
+    :param para: Parameter name.
+    :type para: str
+    :param mes_table: Table containing measurements.
+    :type mes_table: Table
+    :returns: Table with highest quality rows for each unique object.
+    :rtype: Table
+    """
+    mes_table = mes_table[_get_parameter_columns(para)]
+    best_para_table = mes_table[:0].copy()
+    for group in mes_table.group_by("main_id").groups:
+        best_measurement = None
+        for quality in ["A", "B", "C", "D", "E", "?"]:
+            for row in group:
+                if row[f"{para}_qual"] == quality:
+                    best_measurement = row
+                    break
+            if best_measurement is not None:
+                break
+        if best_measurement is not None:
+            best_para_table.add_row(best_measurement)
+    return best_para_table
+
+
+def best_para_membership_loop(mes_table: Table) -> Table:
+    """
+    Previous best_para_membership, looping over the groups.
+
+    :param mes_table: Table containing membership measurements.
+    :type mes_table: Table
+    :returns: Table with the best membership entry of each child and
+        parent pair.
+    :rtype: Table
+    """
+    para = "membership"
+    best_para_table = mes_table[:0].copy()
+    grouped_mes_table = mes_table.group_by(
+        ["child_object_idref", "parent_object_idref"]
+    )
+    indices = grouped_mes_table.groups.indices
+    for i in range(len(indices) - 1):
+        group = grouped_mes_table[indices[i] : indices[i + 1]]
+        if len(group) == 1:
+            best_para_table.add_row(group[0])
+            continue
+        with_value = group[np.where(group[para] != 999999)]
+        if len(with_value) > 0:
+            max_val = max(with_value[para])
+            for row in group:
+                if row[para] == max_val:
+                    best_para_table.add_row(row)
+                    break
+        else:
+            best_para_table.add_row(group[0])
+    return best_para_table
+
+
+def best_para_id_loop(mes_table: Table) -> Table:
+    """
+    Previous best_para_id, stacking the identifiers reference by reference.
+
+    The SIMBAD identifiers come first, followed by the new identifiers of
+    each of the priority references.
+
+    :param mes_table: Table containing the object_idref, id and id_ref
+        columns.
+    :type mes_table: Table
+    :returns: Table with the best identifier entries.
+    :rtype: Table
+    """
+    grouped_mes_table = mes_table.group_by("id_ref")
+    simbad_ref = "2000A&AS..143....9W"
+    mask = grouped_mes_table.groups.keys["id_ref"] == simbad_ref
+    best_para_table = grouped_mes_table.groups[mask]
+    priority_refs = [
+        "2022A&A...664A..21Q",
+        "2016A&A...595A...1G",
+        "priv. comm.",
+        "2020A&C....3100370A",
+        "2001AJ....122.3466M",
+    ]
+    for ref in priority_refs:
+        mask = grouped_mes_table.groups.keys["id_ref"] == ref
+        all_ref_ids = grouped_mes_table.groups[mask]
+        new_ids = all_ref_ids[
+            np.where(
+                np.invert(np.isin(all_ref_ids["id"], best_para_table["id"]))
+            )
+        ]
+        best_para_table = vstack([best_para_table, new_ids])
+    best_para_table.remove_column("id_ref")
+    return best_para_table
+
+
+def assign_source_idref_join(
+    cat: Table, sources: Table, paras: list[str], provider: str
+) -> Table:
+    """
+    Previous assign_source_idref, joining the sources once per parameter.
+
+    :param cat: Table with the reference columns of the parameters.
+    :type cat: Table
+    :param sources: Table containing reference data.
+    :type sources: Table
+    :param paras: List of parameters to process.
+    :type paras: list[str]
+    :param provider: Name of the data provider.
+    :type provider: str
+    :returns: Table with the source identifier columns.
+    :rtype: Table
+    """
+    for para in paras:
+        ref_column = para + "_ref"
+        source_id_col = f"{para}_source_idref"
+        value_column = para + "_value"
+        if ref_column not in cat.colnames:
+            continue
+        cat = nullvalues(cat, ref_column, "?")
+        source_subset = sources["ref", "source_id"][
+            np.where(sources["provider_name"] == provider)
+        ]
+        cat = join(
+            cat,
+            source_subset,
+            keys_left=ref_column,
+            keys_right="ref",
+            join_type="left",
+        )
+        cat.rename_column("source_id", source_id_col)
+        cat.remove_columns("ref")
+        if value_column in cat.colnames:
+            if isinstance(cat[value_column], MaskedColumn):
+                for i in cat[value_column].mask.nonzero()[0]:
+                    cat[source_id_col][i] = 999999
+    return cat
+
+
+def provider_data_merging_loop(
+    cat: dict[str, Table],
+    table_name: str,
+    prov_tables_dict: dict[str, dict[str, Table]],
+    para_match: bool = False,
+    source_index: dict[str, tuple[np.ndarray, np.ndarray]] | None = None,
+) -> dict[str, Table]:
+    """
+    Previous provider_data_merging without object merging, joining the
+    provider tables one after the other.
+
+    :param cat: Dictionary of cumulative tables.
+    :type cat: dict[str, Table]
+    :param table_name: Name of the table to build.
+    :type table_name: str
+    :param prov_tables_dict: Dictionary mapping providers to their tables.
+    :type prov_tables_dict: dict[str, dict[str, Table]]
+    :param para_match: Whether to perform source ID matching.
+    :type para_match: bool
+    :param source_index: Lookup from build_source_index.
+    :type source_index: dict[str, tuple[numpy.ndarray, numpy.ndarray]] or
+        None
+    :returns: Updated dictionary of cumulative tables.
+    :rtype: dict[str, Table]
+    """
+    for prov_name, prov_data in prov_tables_dict.items():
+        if para_match:
+            cat = matching_parameters(
+                cat, prov_name, prov_tables_dict, table_name, source_index
+            )
+        if table_name not in cat or len(cat[table_name]) == 0:
+            cat[table_name] = prov_data[table_name]
+        elif len(prov_data[table_name]) > 0:
+            cat[table_name] = join(
+                cat[table_name], prov_data[table_name], join_type="outer"
+            )
+    return cat
+
+
+def unify_null_values_loop(cat: dict[str, Table]) -> dict[str, Table]:
+    """
+    Previous unify_null_values, replacing one null value at a time.
+
+    :param cat: Dictionary of tables.
+    :type cat: dict[str, Table]
+    :returns: Dictionary of tables with unified null values.
+    :rtype: dict[str, Table]
+    """
+    for key, cols in null_value_columns.items():
+        if key in cat:
+            for col in cols:
+                cat[key] = replace_value(cat[key], col, "N", "?")
+                cat[key] = replace_value(cat[key], col, "N/A", "?")
+                cat[key] = replace_value(cat[key], col, "", "?")
+    return cat
+
+
+def sptype_string_to_class_loop(table: Table, ref: str) -> Table:
+    """
+    Previous sptype_string_to_class, parsing the spectral types row by row.
+
+    :param table: Table containing the sptype_string column.
+    :type table: Table
+    :param ref: Reference of the spectral classification.
+    :type ref: str
+    :returns: Table with the class_temp, class_temp_nr, class_lum and
+        class_ref columns.
+    :rtype: Table
+    """
+    table = initiate_columns(
+        table,
+        ["class_temp", "class_temp_nr", "class_lum", "class_ref"],
+        [object, object, object, object],
+        [True, True, True, True],
+    )
+    for i in range(len(table)):
+        sptype = deal_with_leading_d_sptype(table, i)
+        sptype = deal_with_middle_minus(sptype)
+        if (
+            len(sptype.split("+")) == 1
+            and len(sptype) > 0
+            and sptype[0] in ["O", "B", "A", "F", "G", "K", "M"]
+        ):
+            table["class_temp"][i] = sptype[0]
+            table["class_ref"][i] = ref
+            table = assign_diff_lum_classes(i, sptype, table)
+        else:
+            table = assign_null_values(table, i)
+        table["sptype_string"][i] = sptype
+    return table
+
+
+def match_spectral_type_scan(sptype: str, model_param: Table) -> float | None:
+    """
+    Previous spectral type matching, searching the model rows from the top.
+
+    :param sptype: Spectral type string (e.g., 'G2V', 'K5.5V').
+    :type sptype: str
+    :param model_param: Mamajek's model table as returned by
+        modeled_param.
+    :type model_param: Table
+    :returns: Modeled effective temperature or None if no match found.
+    :rtype: float or None
+    """
+
+    def first_row(length, prefix):
+        for i in range(len(model_param)):
+            if model_param["SpT"][i][:length] == prefix[:length]:
+                return float(model_param["Teff"][i])
+        return None
+
+    teff = first_row(3, sptype)
+    if teff is None and len(sptype) >= 4 and sptype[2:4] == ".5":
+        teff = first_row(4, sptype)
+        if teff is None:
+            teff = first_row(3, sptype[0] + sptype[1] + sptype[4:])
+    return teff
+
+
+def classify_object_types_loop(
+    otypes: list[str],
+) -> tuple[list[str], list[str], list[int], list[str]]:
+    """
+    Previous row by row object type sorting of create_simbad_helpertable.
+
+    :param otypes: SIMBAD object types per row.
+    :type otypes: list[str]
+    :returns: Types, binary flags, indices of removed rows and their
+        otypes.
+    :rtype: tuple[list[str], list[str], list[int], list[str]]
+    """
+    types = ["None" for _ in otypes]
+    binary_flag = ["False" for _ in otypes]
+    to_remove_list = []
+    removed_otypes = []
+    for i, otype in enumerate(otypes):
+        if "Pl" in otype:
+            types[i] = "pl"
+        elif "*" in otype:
+            if "**" in otype:
+                types[i] = "sy"
+                binary_flag[i] = "True"
+            else:
+                types[i] = "st"
+        else:
+            removed_otypes.append(otype)
+            to_remove_list.append(i)
+    return types, binary_flag, to_remove_list, removed_otypes
+
+
+def stringtoobject_dtype_list(cat: Table, number: int = 100) -> Table:
+    """
+    Previous stringtoobject, scanning a list of number unicode dtypes.
+
+    :param cat: Table to transform.
+    :type cat: Table
+    :param number: Length of longest string type element in the table.
+    :type number: int
+    :returns: Table with string type columns transformed into object
+        type ones.
+    :rtype: Table
+    """
+    stringtypes = [np.dtype(f"<U{j}") for j in range(1, number)]
+    for i in cat.colnames:
+        if cat[i].dtype in stringtypes:
+            cat[i] = cat[i].astype(object)
+    return cat
@@ -0,0 +1,484 @@
+"""
+Synthetic data for the benchmarks of the database building.
+
+The generators create tables with the columns and dtypes of the real ones,
+so no network access or previously downloaded data is needed.
+"""
+
+import numpy as np
+from astropy.table import Column, MaskedColumn, Table
+from sdata import empty_dict, empty_dict_wit_columns, paras_dict
+
+# Provider names and the tables each synthetic provider fills, following
+# the real providers.
+provider_layout = {
+    "sim": (
+        "SIMBAD",
+        ["objects", "ident", "h_link", "star_basic", "mes_binary"],
+    ),
+    "sdb": (
+        "Grant Kennedy Disks",
+        ["objects", "ident", "h_link", "disk_basic"],
+    ),
+    "wds": (
+        "WDS",
+        ["objects", "ident", "h_link", "mes_binary", "mes_sep_ang"],
+    ),
+    "exo": ("Exo-MerCat", ["objects", "ident", "h_link", "mes_mass_pl"]),
+    "life": (
+        "LIFE",
+        ["star_basic", "mes_teff_st", "mes_radius_st", "mes_mass_st"],
+    ),
+    "gaia": (
+        "Gaia",
+        [
+            "objects",
+            "ident",
+            "mes_teff_st",
+            "mes_radius_st",
+            "mes_mass_st",
+            "mes_binary",
+        ],
+    ),
+}
+
+# Parameters of the star_basic table given by each provider.
+star_basic_paras = {
+    "sim": ["coo", "plx", "mag_i", "mag_j", "mag_k", "mag_u", "sptype"],
+    "life": ["coo_gal", "dist_st", "class"],
+}
+
+# Object types each provider knows about and the fraction of them it has.
+provider_coverage = {
+    "sim": (["st", "sy", "pl"], 1.0),
+    "sdb": (["di"], 1.0),
+    "wds": (["st", "sy"], 0.3),
+    "exo": (["pl"], 0.9),
+    "life": (["st"], 0.5),
+    "gaia": (["st", "sy"], 0.8),
+}
+
+# Object types the rows of the basic and measurement tables are about.
+table_object_types = {
+    "star_basic": ["st", "sy"],
+    "planet_basic": ["pl"],
+    "disk_basic": ["di"],
+    "mes_mass_pl": ["pl"],
+    "mes_teff_st": ["st"],
+    "mes_radius_st": ["st"],
+    "mes_mass_st": ["st"],
+    "mes_binary": ["st", "sy"],
+    "mes_sep_ang": ["sy"],
+}
+
+# Columns the providers give in addition to the database columns.
+extra_columns = {"mes_mass_pl": [("mass_pl_sini_flag", np.dtype(object))]}
+
+# Providers giving their measurements without errors, like the modeled
+# values of provider/life.py, so that the measurement tables of the
+# providers differ in their columns.
+providers_without_errors = ["life"]
+
+# Fraction of masked entries in the error and reference columns of the
+# basic and measurement tables. Masked references get masked source
+# identifiers in building.
+masked_fraction = 0.1
+
+# Values of the string columns that are neither qualities nor references.
+string_values = {
+    "binary_flag": ["True", "False"],
+    "mass_pl_rel": ["=", "<", ">"],
+    "mass_pl_sini_flag": ["True", "False"],
+    "rad_rel": ["=", "<", ">"],
+    "sptype_string": ["G2V", "K0III", "M3.5V", "A0V", ""],
+    "class_temp": ["G", "K", "M", "A"],
+    "class_temp_nr": ["0", "2", "3.5"],
+    "class_lum": ["V", "III", "IV"],
+}
+
+qualities = np.array(["A", "B", "C", "D", "E", "?", "N"], dtype=object)
+
+
+def parameter_of_column(colname, paras):
+    """
+    Finds the parameter a column belongs to.
+
+    The longest matching parameter is taken, so e.g. coo_gal_qual belongs
+    to coo_gal and not to coo.
+
+    :param str colname: Column name.
+    :param paras: Parameters of the table.
+    :type paras: list(str)
+    :returns: Parameter or None if the column belongs to none.
+    :rtype: str or None
+    """
+    matches = [para for para in paras if colname.startswith(para + "_")]
+    return max(matches, key=len) if matches else None
+
+
+def provider_columns(table_name, paras=None):
+    """
+    Columns of a provider table as given to the building.
+
+    Derived from the database table in sdata.empty_dict_wit_columns:
+    objects are referred to by main_id instead of object_idref and the
+    source identifiers are left out, as they are assigned in building.
+    Columns missing there are added from extra_columns.
+
+    :param str table_name: Name of the table.
+    :param paras: Only keep the columns of these parameters, defaults to
+        all of them.
+    :type paras: list(str) or None
+    :returns: List of column names and dtypes.
+    :rtype: list(tuple(str,numpy.dtype))
+    """
+    if table_name == "h_link":
+        return [
+            ("main_id", np.dtype(object)),
+            ("parent_main_id", np.dtype(object)),
+            ("h_link_ref", np.dtype(object)),
+            ("membership", np.dtype(int)),
+        ]
+    template = empty_dict_wit_columns[table_name]
+    columns = []
+    if "object_idref" in template.colnames:
+        columns.append(("main_id", np.dtype(object)))
+    for colname in template.colnames:
+        if colname in ["object_idref", "source_id"] or colname.endswith(
+            "_source_idref"
+        ):
+            continue
+        if paras is not None:
+            para = parameter_of_column(colname, paras_dict[table_name])
+            if para not in paras:
+                continue
+        columns.append((colname, template[colname].dtype))
+    if table_name == "ident":
+        columns.append(("id_ref", np.dtype(object)))
+    return columns + extra_columns.get(table_name, [])
+
+
+def synthetic_object_pool(n_objects, seed=0):
+    """
+    Creates the objects all synthetic providers draw from.
+
+    Most objects are stars, the rest systems, planets and disks. Stars,
+    planets and disks get a parent from the systems and stars.
+
+    :param int n_objects: Number of objects.
+    :param int seed: Seed of the random number generator.
+    :returns: Table with main_id, type and parent_main_id columns.
+    :rtype: astropy.table.table.Table
+    """
+    rng = np.random.default_rng(seed)
+    object_types = np.array(["st", "sy", "pl", "di"], dtype=object)
+    types = object_types[
+        rng.choice(len(object_types), n_objects, p=[0.7, 0.15, 0.1, 0.05])
+    ]
+    main_ids = np.array([f"obj {i}" for i in range(n_objects)], dtype=object)
+    parents = np.empty(n_objects, dtype=object)
+    systems = main_ids[types == "sy"]
+    stars = main_ids[types == "st"]
+    for child_type, candidates in [
+        ("st", systems),
+        ("pl", stars),
+        ("di", stars),
+    ]:
+        children = types == child_type
+        if len(candidates) > 0:
+            parents[children] = candidates[
+                rng.integers(0, len(candidates), children.sum())
+            ]
+    return Table(
+        {"main_id": main_ids, "type": types, "parent_main_id": parents}
+    )
+
+
+def _column_values(colname, dtype, n_rows, bibcode, rng):
+    """
+    Random values for a provider table column.
+
+    :param str colname: Column name.
+    :param dtype: Column dtype.
+    :type dtype: numpy.dtype
+    :param int n_rows: Number of rows.
+    :param str bibcode: Reference of the provider.
+    :param rng: Random number generator.
+    :type rng: numpy.random.Generator
+    :returns: Column values.
+    :rtype: numpy.ndarray
+    """
+    if colname.endswith("_ref"):
+        # mostly the provider reference, some from the literature
+        refs = np.array(
+            [bibcode] * 3 + [f"{bibcode[:4]}ref{i}" for i in range(3)],
+            dtype=object,
+        )
+        return refs[rng.integers(0, len(refs), n_rows)]
+    if colname.endswith("_qual"):
+        return qualities[rng.integers(0, len(qualities), n_rows)]
+    if colname in string_values:
+        values = np.array(string_values[colname], dtype=object)
+        return values[rng.integers(0, len(values), n_rows)]
+    if colname == "membership":
+        membership = rng.integers(0, 101, n_rows)
+        membership[rng.random(n_rows) < 0.2] = 999999
+        return membership
+    if dtype.kind == "f":
+        return rng.normal(1.0, 0.3, n_rows)
+    if dtype.kind in "iu":
+        return rng.integers(1990, 2024, n_rows)
+    return np.full(n_rows, "?", dtype=object)
+
+
+def synthetic_provider(prov_name, pool, seed=0):
+    """
+    Creates the tables of one synthetic provider.
+
+    :param str prov_name: Key of the provider in provider_layout.
+    :param pool: Objects from synthetic_object_pool.
+    :type pool: astropy.table.table.Table
+    :param int seed: Seed of the random number generator.
+    :returns: Dictionary of table names and tables.
+    :rtype: dict(str,astropy.table.table.Table)
+    """
+    rng = np.random.default_rng(seed)
+    provider_name, table_names = provider_layout[prov_name]
+    object_types, fraction = provider_coverage[prov_name]
+    known = np.isin(pool["type"], object_types)
+    known &= rng.random(len(pool)) < fraction
+    objects = pool[known]
+    n_objects = len(objects)
+    main_ids = np.asarray(objects["main_id"])
+
+    prov = empty_dict.copy()
+    bibcode = f"2024{prov_name}"
+    prov["provider"] = Table(
+        {
+            "provider_name": [provider_name],
+            "provider_url": ["https://example.org/tap"],
+            "provider_bibcode": [bibcode],
+            "provider_access": ["2024-01-01"],
+        },
+        dtype=[object, object, object, object],
+    )
+
+    for table_name in table_names:
+        if table_name == "objects":
+            numbers = [main_id[4:] for main_id in main_ids]
+            # each provider lists the main identifier and some others
+            ids = [
+                f"{main_id}|HD {number}|Gaia DR3 {number}{prov_name}"
+                for main_id, number in zip(main_ids, numbers)
+            ]
+            cat = Table(
+                {
+                    "type": np.asarray(objects["type"]),
+                    "ids": np.array(ids, dtype=object),
+                    "main_id": main_ids,
+                }
+            )
+        elif table_name == "ident":
+            numbers = [main_id[4:] for main_id in main_ids]
+            cat = Table(
+                {
+                    "main_id": np.repeat(main_ids, 3),
+                    "id": np.array(
+                        [
+                            identifier
+                            for main_id, number in zip(main_ids, numbers)
+                            for identifier in [
+                                main_id,
+                                f"HD {number}",
+                                f"Gaia DR3 {number}{prov_name}",
+                            ]
+                        ],
+                        dtype=object,
+                    ),
+                    "id_ref": np.full(3 * n_objects, bibcode, dtype=object),
+                }
+            )
+        elif table_name == "h_link":
+            children = objects[objects["parent_main_id"] != None]  # noqa: E711
+            cat = Table(
+                {
+                    "main_id": np.asarray(children["main_id"]),
+                    "parent_main_id": np.asarray(children["parent_main_id"]),
+                }
+            )
+            cat["h_link_ref"] = np.full(len(cat), bibcode, dtype=object)
+            cat["membership"] = _column_values(
+                "membership", np.dtype(int), len(cat), bibcode, rng
+            )
+        else:
+            rows = main_ids[
+                np.isin(objects["type"], table_object_types[table_name])
+            ]
+            if table_name.startswith("mes_"):
+                # one or two measurements per object
+                rows = np.concatenate([rows, rows[rng.random(len(rows)) < 0.5]])
+            paras = None
+            if table_name == "star_basic":
+                paras = star_basic_paras[prov_name]
+            cat = Table()
+            columns = provider_columns(table_name, paras)
+            if prov_name in providers_without_errors and table_name.startswith(
+                "mes_"
+            ):
+                columns = [
+                    (colname, dtype)
+                    for colname, dtype in columns
+                    if "_err" not in colname
+                ]
+            for colname, dtype in columns:
+                if colname == "main_id":
+                    cat[colname] = Column(rows, dtype=object)
+                    continue
+                values = _column_values(colname, dtype, len(rows), bibcode, rng)
+                if "_err" in colname or colname.endswith("_ref"):
+                    cat[colname] = MaskedColumn(
+                        values, mask=rng.random(len(rows)) < masked_fraction
+                    )
+                else:
+                    cat[colname] = values
+        prov[table_name] = cat
+
+    # all references used by the provider
+    refs = [np.array([bibcode], dtype=object)]
+    for table_name in table_names:
+        for colname in prov[table_name].colnames:
+            if colname.endswith("_ref"):
+                col = prov[table_name][colname]
+                refs.append(np.ma.getdata(col)[~np.ma.getmaskarray(col)])
+    prov["sources"] = Table(
+        {"ref": np.unique(np.concatenate(refs).astype(str)).astype(object)}
+    )
+    prov["sources"]["provider_name"] = np.full(
+        len(prov["sources"]), provider_name, dtype=object
+    )
+    return prov
+
+
+def synthetic_provider_tables(n_objects, seed=0):
+    """
+    Creates a dictionary of provider tables as given to building.
+
+    All providers draw from the same objects, so objects, identifiers and
+    measurements are duplicated across providers as in the real data.
+
+    :param int n_objects: Number of distinct objects.
+    :param int seed: Seed of the random number generator.
+    :returns: Dictionary of provider keys and their tables.
+    :rtype: dict(str,dict(str,astropy.table.table.Table))
+    """
+    pool = synthetic_object_pool(n_objects, seed)
+    return {
+        prov_name: synthetic_provider(prov_name, pool, seed + i + 1)
+        for i, prov_name in enumerate(provider_layout)
+    }
+
+
+def synthetic_objects(n_rows, seed=0):
+    """
+    Creates an outer joined objects table like in objectmerging.
+
+    About a third of the rows are only in one of the joined tables and
+    the identifier lists of the others overlap partially.
+
+    :param int n_rows: Number of objects.
+    :param int seed: Seed of the random number generator.
+    :returns: Objects table with the ids_1, ids_2, type_1 and type_2
+        columns.
+    :rtype: astropy.table.table.Table
+    """
+    rng = np.random.default_rng(seed)
+    catalogs = np.array(["HD", "HIP", "Gaia DR3", "2MASS J", "GJ"])
+    numbers = rng.integers(0, 10**6, (n_rows, len(catalogs)))
+    ids = np.array(
+        [
+            [f"{catalog} {number}" for catalog, number in zip(catalogs, row)]
+            for row in numbers
+        ],
+        dtype=object,
+    )
+    ids_1 = np.array(["|".join(row[:3]) for row in ids], dtype=object)
+    ids_2 = np.array(["|".join(row[2:]) for row in ids], dtype=object)
+    only = rng.integers(0, 3, n_rows)
+    types = np.array(["st", "sy", "pl", "None"], dtype=object)
+    cat = Table(masked=True)
+    cat["main_id"] = ids[:, 0]
+    cat["ids_1"] = ids_1
+    cat["ids_1"].mask = only == 1
+    cat["ids_2"] = ids_2
+    cat["ids_2"].mask = only == 2
+    cat["type_1"] = types[rng.integers(0, 3, n_rows)]
+    cat["type_1"].mask = only == 1
+    cat["type_2"] = types[rng.integers(0, 4, n_rows)]
+    cat["type_2"].mask = only == 2
+    return cat
+
+
+def synthetic_star_basic(n_rows, seed=0):
+    """
+    Creates a table with the columns and dtypes of the star_basic table.
+
+    String columns hold a mix of qualities, references and the null
+    values unified by unify_null_values.
+
+    :param int n_rows: Number of rows.
+    :param int seed: Seed of the random number generator.
+    :returns: Star basic table.
+    :rtype: astropy.table.table.Table
+    """
+    rng = np.random.default_rng(seed)
+    strings = np.array(
+        ["A", "B", "C", "?", "N", "N/A", "", "2020A&A...1A"], dtype=object
+    )
+    template = empty_dict_wit_columns["star_basic"]
+    cat = Table()
+    for colname in template.colnames:
+        kind = template[colname].dtype.kind
+        if kind == "O":
+            cat[colname] = strings[rng.integers(0, len(strings), n_rows)]
+        elif kind == "f":
+            cat[colname] = rng.random(n_rows)
+        else:
+            cat[colname] = rng.integers(0, 1000, n_rows)
+    return cat
+
+
+def synthetic_measurements(n_rows, n_objects=None, para="teff_st", seed=0):
+    """
+    Creates a measurement table like the mes_* tables of the database.
+
+    Errors and source identifiers are masked for masked_fraction of the
+    measurements.
+
+    :param int n_rows: Number of measurements.
+    :param int n_objects: Number of distinct objects, defaults to a third
+        of the measurements.
+    :param str para: Parameter name.
+    :param int seed: Seed of the random number generator.
+    :returns: Measurement table.
+    :rtype: astropy.table.table.Table
+    """
+    rng = np.random.default_rng(seed)
+    if n_objects is None:
+        n_objects = max(n_rows // 3, 1)
+    main_ids = np.array([f"star {i}" for i in range(n_objects)], dtype=object)
+    quality = np.array(["A", "B", "C", "D", "E", "?"], dtype=object)
+    return Table(
+        {
+            "main_id": main_ids[rng.integers(0, n_objects, n_rows)],
+            f"{para}_value": rng.normal(5000.0, 1000.0, n_rows),
+            f"{para}_err": MaskedColumn(
+                rng.random(n_rows) * 100.0,
+                mask=rng.random(n_rows) < masked_fraction,
+            ),
+            f"{para}_qual": quality[rng.integers(0, len(quality), n_rows)],
+            f"{para}_source_idref": MaskedColumn(
+                rng.integers(0, 10, n_rows),
+                mask=rng.random(n_rows) < masked_fraction,
+            ),
+        }
+    )
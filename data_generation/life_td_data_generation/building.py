@@ -6,16 +6,67 @@ import numpy as np
 from astropy.table import (
     Column,
     MaskedColumn,
-    Row,
     Table,
     column,
     join,
     unique,
     vstack,
 )
-from provider.utils import nullvalues, replace_value
+from provider.utils import (
+    encode_strings,
+    join_on_codes,
+    nullvalues,
+    replace_values,
+)
 from sdata import empty_dict, empty_dict_wit_columns, paras_dict
 from utils.io import Path, save
+from utils.profiling import StageReport, row_counts
+
+# Providers whose identifiers are preferred, highest priority first. Used by
+# best_para_id, with the reference bibcodes taken from the provider table.
+id_priority_providers = [
+    "SIMBAD",
+    "LIFE",
+    "Gaia",
+    "Grant Kennedy Disks",
+    "Exo-MerCat",
+    "WDS",
+]
+
+# Strings the providers use for an unknown quality, flag or reference.
+# unify_null_values replaces all of them by "?", further ones can be added.
+null_tokens = ["N", "N/A", ""]
+
+# Columns of each table in which unify_null_values replaces the null_tokens.
+null_value_columns = {
+    "star_basic": [
+        "coo_qual",
+        "coo_gal_qual",
+        "plx_qual",
+        "dist_st_qual",
+        "sep_ang_qual",
+        "teff_st_qual",
+        "radius_st_qual",
+        "binary_flag",
+        "binary_qual",
+        "mass_st_qual",
+        "sptype_qual",
+        "class_temp",
+        "class_temp_nr",
+        "sptype_ref",
+        "mag_i_ref",
+        "mag_j_ref",
+        "mag_k_ref",
+        "mag_u_ref",
+    ],
+    "planet_basic": ["mass_pl_qual"],
+    "disk_basic": ["rad_qual", "rad_rel"],
+    "mes_mass_pl": ["mass_pl_qual"],
+    "mes_teff_st": ["teff_st_qual"],
+    "mes_radius_st": ["radius_st_qual"],
+    "mes_mass_st": ["mass_st_qual"],
+    "mes_binary": ["binary_qual"],
+}
 
 
 def idsjoin(cat: Table, column_ids1: str, column_ids2: str) -> Table:
@@ -38,56 +89,47 @@ def idsjoin(cat: Table, column_ids1: str, column_ids2: str) -> Table:
     :rtype: Table
     """
     # Step 1: Replace masked/empty values in both columns with empty strings
-    ids1 = (
-        cat[column_ids1].filled("")
-        if isinstance(cat[column_ids1], MaskedColumn)
-        else cat[column_ids1]
-    )
-    ids2 = (
-        cat[column_ids2].filled("")
-        if isinstance(cat[column_ids2], MaskedColumn)
-        else cat[column_ids2]
+    ids = []
+    for colname in [column_ids1, column_ids2]:
+        data = np.ma.getdata(cat[colname]).astype(object)
+        data[np.ma.getmaskarray(cat[colname]) | np.equal(data, None)] = ""
+        ids.append(data)
+
+    # Step 2: Explode the identifiers of all rows into one long array of
+    # (row, identifier) pairs
+    rows_text = ids[0] + "|" + ids[1]
+    counts = np.strings.count(rows_text.astype(str), "|") + 1
+    tokens = np.array(
+        "|".join(rows_text).split("|") if len(cat) > 0 else [], dtype=object
     )
-
-    # Step 2: Vectorized merging of identifiers using set operations
-    merged_ids: list[str] = []
-    for val1, val2 in zip(ids1, ids2):
-        # Split strings on '|'
-        ids1_list = val1.split("|") if val1 not in (None, "") else []
-        ids2_list = val2.split("|") if val2 not in (None, "") else []
-
-        # Merge and remove duplicates/empty strings
-        unique_ids = set(ids1_list + ids2_list) - {""}
-        merged_ids.append("|".join(sorted(unique_ids)))
-
-    # Step 3: Add the merged identifiers column to the table
+    rows = np.repeat(np.arange(len(cat)), counts)
+    rows, tokens = rows[tokens != ""], tokens[tokens != ""]
+
+    # Step 3: Remove duplicates, the codes follow the sort order of the
+    # identifiers so the pairs end up sorted by row and identifier. Fixed
+    # width strings sort faster than objects.
+    merged_ids = np.full(len(cat), "", dtype=object)
+    if len(tokens) > 0:
+        categories, codes = np.unique(tokens.astype(str), return_inverse=True)
+        pairs = np.sort(rows * len(categories) + codes.reshape(-1))
+        pairs = pairs[np.append(True, pairs[1:] != pairs[:-1])]
+        rows = pairs // len(categories)
+        tokens = categories.astype(object)[pairs % len(categories)]
+
+        # Step 4: Re-aggregate the identifiers of each row, joining all of
+        # them at once with newlines, which identifiers don't contain,
+        # between rows
+        last_of_row = np.append(rows[1:] != rows[:-1], True)
+        separators = np.full(len(rows), "|", dtype=object)
+        separators[last_of_row] = "\n"
+        text = "".join(tokens + separators)[:-1]
+        merged_ids[rows[last_of_row]] = text.split("\n")
+
+    # Step 5: Add the merged identifiers column to the table
     cat["ids"] = Column(data=merged_ids, dtype=object)
     return cat
 
 
-def assign_type(cat: Table, i: int) -> str:
-    """
-    Assigns an object type based on two potential type columns.
-
-    Priority is given to 'type_2' unless it is masked or 'None'.
-
-    :param cat: The table containing type columns.
-    :type cat: Table
-    :param i: Index of the row to process.
-    :type i: int
-    :return: The assigned type string.
-    :rtype: str
-    """
-    # Check if 'type_2' is masked or equal to 'None', then fall back to
-    # 'type_1', otherwise use 'type_2'
-    val_2 = cat["type_2"][i]
-    if isinstance(val_2, np.ma.core.MaskedConstant) or val_2 == "None":
-        cat["type"][i] = cat["type_1"][i]
-    else:
-        cat["type"][i] = val_2
-    return cat["type"][i]
-
-
 def objectmerging(cat: Table) -> Table:
     """
     Merges the data of each object given in the different providers.
@@ -103,19 +145,62 @@ def objectmerging(cat: Table) -> Table:
     cat = idsjoin(cat, "ids_1", "ids_2")
     cat.remove_columns(["ids_1", "ids_2"])
 
-    # Initializing merged type column if it doesn't exist
+    # Initializing merged type column if it doesn't exist, preferring
+    # 'type_2' unless it is masked or 'None'
     if "type" not in cat.colnames:
-        cat["type"] = Column(dtype=object, length=len(cat))
-        cat["type_1"] = cat["type_1"].astype(object)
-        cat["type_2"] = cat["type_2"].astype(object)
-        for i in range(len(cat)):
-            cat["type"][i] = assign_type(cat, i)
+        type_1 = cat["type_1"].astype(object)
+        type_2 = cat["type_2"].astype(object)
+        use_type_2 = np.invert(np.ma.getmaskarray(type_2)) & (
+            np.ma.getdata(type_2) != "None"
+        )
+        merged_type = np.where(
+            use_type_2, np.ma.getdata(type_2), np.ma.getdata(type_1)
+        ).astype(object)
+        # masked entries of 'type_1' stay masked constants
+        no_type = np.invert(use_type_2) & np.ma.getmaskarray(type_1)
+        masked = np.empty(np.count_nonzero(no_type), dtype=object)
+        masked.fill(np.ma.masked)
+        merged_type[no_type] = masked
+        cat["type"] = Column(merged_type, dtype=object)
         cat.remove_columns(["type_1", "type_2"])
     return cat
 
 
+def build_source_index(
+    sources: Table,
+) -> dict[str, tuple[np.ndarray, np.ndarray]]:
+    """
+    Builds a lookup from reference to source identifier for each provider.
+
+    The references of each provider are kept sorted, so that they can be
+    looked up for whole columns at once with np.searchsorted. The sources
+    table is unique in reference and provider, otherwise the first
+    source identifier is used.
+
+    :param sources: Table containing the ref, provider_name and source_id
+        columns.
+    :type sources: Table
+    :returns: Dictionary of provider names and tuples of their sorted
+        references and corresponding source identifiers.
+    :rtype: dict[str, tuple[np.ndarray, np.ndarray]]
+    """
+    providers = np.ma.getdata(sources["provider_name"])
+    refs = np.ma.getdata(sources["ref"]).astype(str)
+    source_ids = np.asarray(sources["source_id"])
+    index = {}
+    for provider in np.unique(providers):
+        selected = providers == provider
+        provider_refs, first = np.unique(refs[selected], return_index=True)
+        index[provider] = (provider_refs, source_ids[selected][first])
+    return index
+
+
 def assign_source_idref(
-    cat: Table, sources: Table, paras: list[str], provider: str
+    cat: Table,
+    sources: Table,
+    paras: list[str],
+    provider: str,
+    source_index: dict[str, tuple[np.ndarray, np.ndarray]] | None = None,
 ) -> Table:
     """
     Joins source identifiers to parameters in a catalog table.
@@ -123,9 +208,15 @@ def assign_source_idref(
     For each parameter that has a reference column, this function:
     1. Validates and handles existing source ID columns.
     2. Processes null values in reference columns.
-    3. Links reference data with source identifiers.
+    3. Looks up the source identifiers of the references.
     4. Manages masked parameter values.
 
+    References without source get masked source identifiers. As with a
+    join per parameter, the rows end up sorted by the reference column of
+    the last parameter. Ties are ordered by the reference columns of the
+    earlier parameters and then by their original order, where join
+    leaves the order of ties unspecified.
+
     :param cat: Table with empty para_source_id columns.
     :type cat: Table
     :param sources: Table containing reference data.
@@ -134,9 +225,23 @@ def assign_source_idref(
     :type paras: list[str]
     :param provider: Name of the data provider.
     :type provider: str
+    :param source_index: Lookup from build_source_index, built from
+        sources if not given.
+    :type source_index: dict[str, tuple[np.ndarray, np.ndarray]] or None
     :returns: Catalog table with parameter source IDs added.
     :rtype: Table
     """
+    if source_index is None:
+        source_index = build_source_index(sources)
+    refs, source_ids = source_index.get(
+        provider,
+        (
+            np.array([], dtype=str),
+            np.array([], dtype=sources["source_id"].dtype),
+        ),
+    )
+
+    sort_keys = []
     for para in paras:
         ref_column = para + "_ref"
         source_id_col = f"{para}_source_idref"
@@ -157,28 +262,31 @@ def assign_source_idref(
         # Replace null values in reference column
         cat = nullvalues(cat, ref_column, "?")
 
-        # Join with sources table to get source IDs for this provider
-        source_subset = sources["ref", "source_id"][
-            np.where(sources["provider_name"] == provider)
-        ]
-        cat = join(
-            cat,
-            source_subset,
-            keys_left=ref_column,
-            keys_right="ref",
-            join_type="left",
-        )
-
-        # Rename generic source_id column to parameter-specific name
-        cat.rename_column("source_id", source_id_col)
-        cat.remove_columns("ref")
+        # Look up source IDs of the references for this provider
+        values = np.ma.getdata(cat[ref_column]).astype(str)
+        position = np.minimum(np.searchsorted(refs, values), len(refs) - 1)
+        missing = np.ones(len(cat), dtype=bool)
+        if len(refs) > 0:
+            missing = refs[position] != values
+        para_source_ids = np.zeros(len(cat), dtype=source_ids.dtype)
+        para_source_ids[~missing] = source_ids[position[~missing]]
 
         # Handle masked values in parameter column: assign 999999 to ref ID
+        mask = missing.copy()
         if value_column in cat.colnames:
             if isinstance(cat[value_column], column.MaskedColumn):
-                for i in cat[value_column].mask.nonzero()[0]:
-                    cat[source_id_col][i] = 999999
+                no_value = np.ma.getmaskarray(cat[value_column])
+                para_source_ids[no_value] = 999999
+                mask &= np.invert(no_value)
 
+        if missing.any():
+            cat[source_id_col] = MaskedColumn(para_source_ids, mask=mask)
+        else:
+            cat[source_id_col] = Column(para_source_ids)
+        sort_keys.append(np.unique(values, return_inverse=True)[1])
+
+    if sort_keys:
+        cat = cat[np.lexsort(sort_keys)]
     return cat
 
 
@@ -200,46 +308,46 @@ def merge_table(cat1: Table, cat2: Table) -> Table:
     return join(cat1, cat2)
 
 
-def best_para_id(mes_table: Table) -> Table:
+def best_para_id(mes_table: Table, provider_table: Table) -> Table:
     """
     Selects the best identifier for each object based on reference priority.
 
+    The identifier references are the bibcodes of the providers, ranked
+    in the order of id_priority_providers. For each identifier all rows
+    with the highest ranked reference are kept, ordered by the rank and
+    then by their original order. Identifiers with other references are
+    dropped.
+
     :param mes_table: Measurement table for identifiers.
     :type mes_table: Table
+    :param provider_table: Provider table containing the provider_name and
+        provider_bibcode columns.
+    :type provider_table: Table
     :returns: Table with prioritized identifier rows.
     :rtype: Table
     """
-    grouped_mes_table = mes_table.group_by("id_ref")
-
-    # 1. Making simbad identifiers the default best parameters
-    simbad_ref = "2000A&AS..143....9W"
-    mask = grouped_mes_table.groups.keys["id_ref"] == simbad_ref
-    best_para_table = grouped_mes_table.groups[mask]
-
-    # 2. Adding identifiers that are not in the best_para_table yet.
-    # Higher quality priority order for provider identifier references.
-    # TBD: use id_ref as variable from provider_bibcode
-    #        instad of constant""")
+    bibcodes = dict(
+        zip(provider_table["provider_name"], provider_table["provider_bibcode"])
+    )
     priority_refs = [
-        "2022A&A...664A..21Q",
-        "2016A&A...595A...1G",
-        "priv. comm.",
-        "2020A&C....3100370A",
-        "2001AJ....122.3466M",
+        bibcodes[name] for name in id_priority_providers if name in bibcodes
     ]
 
-    for ref in priority_refs:
-        mask = grouped_mes_table.groups.keys["id_ref"] == ref
-        all_ref_ids = grouped_mes_table.groups[mask]
+    id_ref = np.ma.getdata(mes_table["id_ref"])
+    rank = np.full(len(mes_table), len(priority_refs))
+    for i, ref in reversed(list(enumerate(priority_refs))):
+        rank[id_ref == ref] = i
 
-        # removing those already in best_para_table
-        new_ids = all_ref_ids[
-            np.where(
-                np.invert(np.isin(all_ref_ids["id"], best_para_table["id"]))
-            )
-        ]
-        best_para_table = vstack([best_para_table, new_ids])
+    # best rank of each identifier, missing identifiers are dropped
+    categories, [id_codes] = encode_strings(mes_table["id"])
+    rank[id_codes < 0] = len(priority_refs)
+    best_rank = np.full(len(categories), len(priority_refs))
+    np.minimum.at(best_rank, id_codes[id_codes >= 0], rank[id_codes >= 0])
 
+    keep = np.flatnonzero(
+        (rank < len(priority_refs)) & (rank == best_rank[id_codes])
+    )
+    best_para_table = mes_table[keep[np.argsort(rank[keep], kind="stable")]]
     best_para_table.remove_column("id_ref")
     return best_para_table
 
@@ -248,42 +356,28 @@ def best_para_membership(mes_table: Table) -> Table:
     """
     Selects the best membership measurement for parent-child pairs.
 
-    Chooses the row with the maximum membership value.
+    Chooses the first row with the maximum membership value, ignoring
+    the null value 999999. Pairs without membership value keep their
+    first row.
 
     :param mes_table: Measurement table for membership.
     :type mes_table: Table
-    :returns: Table with best membership entries.
+    :returns: Table with best membership entries, sorted by child and
+        parent.
     :rtype: Table
     """
     para = "membership"
-    best_para_table = mes_table[:0].copy()
-    grouped_mes_table = mes_table.group_by(
-        ["child_object_idref", "parent_object_idref"]
-    )
-    indices = grouped_mes_table.groups.indices
-
-    for i in range(len(indices) - 1):
-        idx_start, idx_end = indices[i], indices[i + 1]
-        group = grouped_mes_table[idx_start:idx_end]
+    keys = [
+        np.unique(np.ma.getdata(mes_table[colname]), return_inverse=True)[1]
+        for colname in ["child_object_idref", "parent_object_idref"]
+    ]
 
-        if len(group) == 1:
-            best_para_table.add_row(group[0])
-        else:
-            with_value = group[np.where(group[para] != 999999)]
-            if len(with_value) > 0:
-                max_val = max(with_value[para])
-                # Add first row matching the max value
-                for row in group:
-                    if row[para] == max_val:
-                        best_para_table.add_row(row)
-                        break  # make sure not multiple of same max
-                        # value are added
-            else:
-                # if none of the objects has a membership entry
-                # then pick just first one
-                best_para_table.add_row(group[0])
+    # highest membership first, missing values last
+    membership = np.ma.getdata(mes_table[para]).astype(float)
+    missing = np.ma.getmaskarray(mes_table[para]) | (membership == 999999)
+    rank = np.where(missing, np.inf, -membership)
 
-    return best_para_table
+    return mes_table[_best_rows(keys, rank)]
 
 
 def _get_parameter_columns(para: str) -> list[str]:
@@ -332,62 +426,251 @@ def _get_parameter_columns(para: str) -> list[str]:
     return cols
 
 
-def _find_best_quality_measurement(group: Table, para: str) -> Row | None:
+def _best_rows(keys: list[np.ndarray], rank: np.ndarray) -> np.ndarray:
     """
-    Helper function to find the highest quality measurement in a group.
+    Helper function to find the best ranked row of each group.
+
+    Rows are sorted by the group keys, then by rank and then by their
+    original order, and the first row of each group is taken. Thus for
+    equal ranks the earlier row wins.
+
+    :param keys: Integer arrays identifying the groups, the first one
+        being the primary sort key.
+    :type keys: list[np.ndarray]
+    :param rank: Rank of each row, lower is better.
+    :type rank: np.ndarray
+    :returns: Indices of the best rows, sorted by the group keys.
+    :rtype: np.ndarray
+    """
+    # np.lexsort is stable and uses the last key as primary key
+    order = np.lexsort([rank] + keys[::-1])
+    head = np.ones(len(order), dtype=bool)
+    if len(order) > 1:
+        head[1:] = False
+        for key in keys:
+            sorted_key = key[order]
+            head[1:] |= sorted_key[1:] != sorted_key[:-1]
+    return order[head]
+
+
+def _quality_rank(qual: Column) -> np.ndarray:
+    """
+    Helper function to map quality flags to integer ranks.
 
-    Quality levels: A > B > C > D > E > ?.
+    Quality levels: A > B > C > D > E > ?. Masked entries and other
+    values get rank -1.
 
-    :param group: Group of measurements for a single object.
-    :type group: Table
-    :param para: Parameter name.
-    :type para: str
-    :returns: Row with highest quality measurement or None.
-    :rtype: Row or None
+    :param qual: Quality column.
+    :type qual: Column
+    :returns: Rank of each quality flag, lower is better.
+    :rtype: np.ndarray
     """
     quality_levels = ["A", "B", "C", "D", "E", "?"]
-    qual_column = f"{para}_qual"
-
-    for quality in quality_levels:
-        for row in group:
-            if row[qual_column] == quality:
-                return row
-    return None
+    data = np.ma.getdata(qual)
+    valid = np.invert(np.ma.getmaskarray(qual))
+    rank = np.full(len(qual), -1)
+    for i, quality in enumerate(quality_levels):
+        rank[(data == quality) & valid] = i
+    return rank
 
 
-def best_para(para: str, mes_table: Table) -> Table:
+def best_para(
+    para: str, mes_table: Table, provider_table: Table | None = None
+) -> Table:
     """
     Selects the highest quality measurement for each object in the table.
 
+    For equal quality the first measurement is selected. Measurements
+    without a valid quality are ignored.
+
     :param para: Parameter name (e.g., 'mass', 'id').
     :type para: str
     :param mes_table: Table containing measurements.
     :type mes_table: Table
-    :returns: Table with highest quality rows for each unique object.
+    :param provider_table: Provider table, needed for para 'id'.
+    :type provider_table: Table or None
+    :returns: Table with highest quality rows for each unique object,
+        sorted by main_id.
     :rtype: Table
     """
     # Special case handlers
     if para == "id":
-        return best_para_id(mes_table)
+        return best_para_id(mes_table, provider_table)
     if para == "membership":
         return best_para_membership(mes_table)
 
     # Define columns based on parameter type
     columns = _get_parameter_columns(para)
 
-    # Select only needed columns and create empty result table
+    # Select only needed columns and drop rows without valid quality
     mes_table = mes_table[columns]
-    best_para_table = mes_table[:0].copy()
+    rank = _quality_rank(mes_table[f"{para}_qual"])
+    with_quality = np.flatnonzero(rank >= 0)
+    _, [main_id_codes] = encode_strings(mes_table["main_id"][with_quality])
 
-    # Group by main_id and process each group
-    grouped_mes_table = mes_table.group_by("main_id")
+    best_rows = _best_rows([main_id_codes], rank[with_quality])
+    return mes_table[with_quality[best_rows]]
 
-    for group in grouped_mes_table.groups:
-        best_measurement = _find_best_quality_measurement(group, para)
-        if best_measurement is not None:
-            best_para_table.add_row(best_measurement)
 
-    return best_para_table
+class ObjectIndex:
+    """
+    Index of the objects table for lookups by main_id and type.
+
+    Built once after build_objects_table and used by the later building
+    stages instead of joins against objects["object_id", "main_id"], which
+    sort both tables each time. Main identifiers are looked up as codes,
+    their positions in the sorted main identifiers of the objects, so that
+    sorting by code is sorting by main identifier.
+    """
+
+    def __init__(self, objects: Table) -> None:
+        """
+        :param objects: Objects table with main_id, object_id and type
+            columns.
+        :type objects: Table
+        """
+        main_ids = np.ma.getdata(objects["main_id"]).astype(str)
+        order = np.argsort(main_ids, kind="stable")
+        self.main_ids = main_ids[order]
+        self.object_ids = np.asarray(objects["object_id"])[order]
+        self.unique = bool(np.all(self.main_ids[1:] != self.main_ids[:-1]))
+
+        types = np.ma.getdata(objects["type"])
+        self.type_rows = {
+            str(object_type): np.flatnonzero(types == object_type)
+            for object_type in np.unique(types.astype(str))
+        }
+
+    def codes(self, main_ids: Column) -> np.ndarray:
+        """
+        Looks up main identifiers in the index.
+
+        :param main_ids: Main identifiers.
+        :type main_ids: Column
+        :returns: Codes of the main identifiers, -1 if not in the objects
+            table.
+        :rtype: np.ndarray
+        """
+        values = np.ma.getdata(main_ids).astype(str)
+        if len(self.main_ids) == 0:
+            return np.full(len(values), -1)
+        position = np.minimum(
+            np.searchsorted(self.main_ids, values), len(self.main_ids) - 1
+        )
+        return np.where(self.main_ids[position] == values, position, -1)
+
+    def rows_of_type(self, object_types: list[str]) -> np.ndarray:
+        """
+        Gets the rows of the objects table with the given types.
+
+        :param object_types: Object types, e.g. ['st', 'sy'].
+        :type object_types: list[str]
+        :returns: Rows, grouped by type in the given order.
+        :rtype: np.ndarray
+        """
+        empty = np.array([], dtype=int)
+        return np.concatenate(
+            [empty]
+            + [
+                self.type_rows.get(object_type, empty)
+                for object_type in object_types
+            ]
+        )
+
+    def link_object_ids(
+        self, table: Table, key: str, colname: str, inner: bool = False
+    ) -> Table:
+        """
+        Adds the object_id of the main identifiers in a column to a table.
+
+        Gives the same result as a left join (inner join if inner) with
+        objects["object_id", "main_id"] on key, i.e. rows sorted by key
+        and object ids of main identifiers not in the objects table masked.
+        Rows with equal keys keep their original order, which join leaves
+        unspecified.
+
+        :param table: Table to add the object ids to.
+        :type table: Table
+        :param key: Column of table containing main identifiers.
+        :type key: str
+        :param colname: Name of the new object id column.
+        :type colname: str
+        :param inner: If True, rows not in the objects table are dropped.
+        :type inner: bool
+        :returns: Table sorted by key with the object id column.
+        :rtype: Table
+        """
+        codes = self.codes(table[key])
+        if inner:
+            table = table[codes >= 0]
+            codes = codes[codes >= 0]
+        if (codes < 0).any() or not self.unique:
+            objects = Table(
+                {
+                    "main_id": self.main_ids.astype(object),
+                    colname: self.object_ids,
+                }
+            )
+            return join_on_codes(table, objects, key, "main_id", colname)
+
+        order = np.argsort(codes, kind="stable")
+        table = table[order]
+        table[colname] = self.object_ids[codes[order]]
+        return table
+
+    def left_join(self, cat: Table, other: Table) -> Table:
+        """
+        Left joins a table with unique main identifiers on main_id.
+
+        Gives the same result as astropy.table.join with join_type 'left'
+        on the main_id column, i.e. rows sorted by main_id and the columns
+        of other masked for rows without match. Falls back to join if the
+        tables share other columns, the main identifiers of other are not
+        unique or not all main identifiers are in the objects table.
+
+        :param cat: Left table.
+        :type cat: Table
+        :param other: Right table.
+        :type other: Table
+        :returns: Joined table.
+        :rtype: Table
+        """
+        left = self.codes(cat["main_id"])
+        right = self.codes(other["main_id"])
+        common = set(cat.colnames) & set(other.colnames)
+        if (
+            common != {"main_id"}
+            or (left < 0).any()
+            or (right < 0).any()
+            or len(np.unique(right)) != len(right)
+            or not self.unique
+        ):
+            return join(cat, other, join_type="left")
+
+        order = np.argsort(left, kind="stable")
+        cat = cat[order]
+        lookup = np.full(len(self.main_ids), -1)
+        lookup[right] = np.arange(len(right))
+        index = lookup[left[order]]
+        missing = index < 0
+        for colname in other.colnames:
+            if colname == "main_id":
+                continue
+            if len(other) == 0:
+                cat[colname] = MaskedColumn(
+                    np.zeros(len(cat), dtype=other[colname].dtype),
+                    mask=True,
+                    unit=other[colname].unit,
+                    description=other[colname].description,
+                )
+                continue
+            values = other[colname][np.maximum(index, 0)]
+            if missing.any():
+                values = MaskedColumn(
+                    values, mask=np.ma.getmaskarray(values) | missing
+                )
+            cat[colname] = values
+        return cat
 
 
 def best_parameters_ingestion(
@@ -395,6 +678,7 @@ def best_parameters_ingestion(
     cat_basic: Table,
     para: str,
     columns: list[str] | None = None,
+    objects_index: ObjectIndex | None = None,
 ) -> Table:
     """
     Updates a basic table with the best measurements from a measurement table.
@@ -407,13 +691,18 @@ def best_parameters_ingestion(
     :type para: str
     :param columns: Columns to remove from cat_basic before joining.
     :type columns: list[str] or None
+    :param objects_index: Index of the main objects table used for the
+        join on main_id, astropy join is used if not given.
+    :type objects_index: ObjectIndex or None
     :returns: Updated basic table.
     :rtype: Table
     """
     best_para_cat_mes = best_para(para, cat_mes)
     if columns:
         cat_basic.remove_columns(columns)
-    return join(cat_basic, best_para_cat_mes, join_type="left")
+    if objects_index is None:
+        return join(cat_basic, best_para_cat_mes, join_type="left")
+    return objects_index.left_join(cat_basic, best_para_cat_mes)
 
 
 def provider_data_merging(
@@ -422,6 +711,7 @@ def provider_data_merging(
     prov_tables_dict: dict[str, dict[str, Table]],
     o_merging: bool = False,
     para_match: bool = False,
+    source_index: dict[str, tuple[np.ndarray, np.ndarray]] | None = None,
 ) -> dict[str, Table]:
     """
     Merges the data from the different providers for a specific table.
@@ -436,25 +726,189 @@ def provider_data_merging(
     :type o_merging: bool
     :param para_match: Whether to perform source ID matching.
     :type para_match: bool
+    :param source_index: Lookup from build_source_index for the source ID
+        matching, built from the sources table if not given.
+    :type source_index: dict[str, tuple[np.ndarray, np.ndarray]] or None
     :returns: Updated dictionary of cumulative tables.
     :rtype: dict[str, Table]
     """
     print(f"Building {table_name} table ...")
-    for prov_name, prov_data in prov_tables_dict.items():
+    if para_match and source_index is None:
+        source_index = build_source_index(cat["sources"])
+    if o_merging:
+        for prov_name, prov_data in prov_tables_dict.items():
+            if para_match:
+                cat = matching_parameters(
+                    cat, prov_name, prov_tables_dict, table_name, source_index
+                )
+
+            if table_name not in cat or len(cat[table_name]) == 0:
+                cat[table_name] = prov_data[table_name]
+            else:
+                cat = join_different_provider_data(
+                    cat, o_merging, prov_name, prov_tables_dict, table_name
+                )
+    else:
         if para_match:
-            cat = matching_parameters(
-                cat, prov_name, prov_tables_dict, table_name
-            )
+            for prov_name in prov_tables_dict:
+                cat = matching_parameters(
+                    cat, prov_name, prov_tables_dict, table_name, source_index
+                )
+        tables = [
+            prov_data[table_name] for prov_data in prov_tables_dict.values()
+        ]
+        if table_name in cat:
+            tables.insert(0, cat[table_name])
+        non_empty = [cat_prov for cat_prov in tables if len(cat_prov) > 0]
+        if non_empty:
+            cat[table_name] = merge_provider_tables(non_empty)
+        elif tables:
+            # like the successive joins, keep the last of the empty tables
+            cat[table_name] = tables[-1]
 
-        if table_name not in cat or len(cat[table_name]) == 0:
-            cat[table_name] = prov_data[table_name]
-        else:
-            cat = join_different_provider_data(
-                cat, o_merging, prov_name, prov_tables_dict, table_name
-            )
     return cat
 
 
+def merge_provider_tables(tables: list[Table]) -> Table:
+    """
+    Outer joins the tables of the different providers on all common columns.
+
+    Gives the same rows and columns as joining the tables one after the
+    other, each join using the columns the two tables have in common as
+    keys. Following tables that share the same key columns with the
+    merged table are merged in a single pass, see _merge_on_keys. This
+    covers providers with identical columns, providers adding their own
+    columns to the same keys, e.g. their parameters to the main_id of
+    star_basic, and providers without some of the columns of the others,
+    e.g. measurements without errors. Only where the key columns change
+    between two providers a new pass starts, instead of sorting and
+    copying the growing table again for each provider.
+
+    Unlike in astropy's join, key columns may contain masked values. A
+    masked value matches other masked values of the same column but no
+    value, e.g. a missing error matches only other missing errors.
+
+    :param tables: Non-empty provider tables, in provider order.
+    :type tables: list[Table]
+    :returns: Merged table.
+    :rtype: Table
+    """
+    merged = tables[0]
+    start = 1
+    while start < len(tables):
+        keys = [
+            colname
+            for colname in merged.colnames
+            if colname in tables[start].colnames
+        ]
+        if not keys:
+            # leaves the error for tables without common columns to astropy
+            return join(merged, tables[start], join_type="outer")
+        colnames = set(merged.colnames) | set(tables[start].colnames)
+        stop = start + 1
+        while stop < len(tables) and colnames & set(
+            tables[stop].colnames
+        ) == set(keys):
+            colnames |= set(tables[stop].colnames)
+            stop += 1
+        merged = _merge_on_keys([merged, *tables[start:stop]], keys)
+        start = stop
+    return merged
+
+
+def _merge_on_keys(tables: list[Table], keys: list[str]) -> Table:
+    """
+    Outer joins tables that have the key columns in common in one pass.
+
+    Each of the other columns belongs to only one of the tables. The key
+    columns of all tables are stacked once and rows with equal keys are
+    grouped in a single sort. Like in successive joins each group shows
+    up as often as the product of its numbers of rows in the tables
+    containing it, combining the rows of the different tables. The
+    columns of tables without rows in a group are masked. The groups are
+    sorted by the key columns with masked values first, rows of the same
+    group by table and row order.
+
+    :param tables: Non-empty tables containing the key columns.
+    :type tables: list[Table]
+    :param keys: Names of the key columns.
+    :type keys: list[str]
+    :returns: Merged table with the columns of the first table followed
+        by the other columns of the following tables.
+    :rtype: Table
+    """
+    stacked = vstack([cat_prov[keys] for cat_prov in tables])
+    codes = []
+    missing = np.zeros(len(stacked), dtype=bool)
+    for colname in keys:
+        data = np.ma.getdata(stacked[colname])
+        mask = np.ma.getmaskarray(stacked[colname])
+        if data.dtype == object:
+            # None entries get code 1, sorted after the masked values
+            code = encode_strings(data)[1][0] + 2
+        else:
+            code = np.unique(data, return_inverse=True)[1] + 1
+            if data.dtype.kind in "fc":
+                missing |= np.isnan(data) & np.invert(mask)
+        # masked values get code 0 and sort before all values
+        code[mask] = 0
+        codes.append(code)
+    order = np.lexsort(codes[::-1])
+    same = np.ones(len(order) - 1, dtype=bool)
+    for code in codes:
+        same &= code[order][1:] == code[order][:-1]
+    # nan values are sorted like equal values but never match in a join,
+    # so rows containing them stay on their own
+    heads = np.concatenate([[True], ~same | missing[order][1:]])
+    groups = np.empty(len(order), dtype=np.intp)
+    groups[order] = np.cumsum(heads) - 1
+    n_groups = np.count_nonzero(heads)
+
+    lengths = np.array([len(cat_prov) for cat_prov in tables])
+    table_index = np.repeat(np.arange(len(tables)), lengths)
+    counts = np.bincount(
+        groups * len(tables) + table_index,
+        minlength=n_groups * len(tables),
+    ).reshape(n_groups, len(tables))
+    sizes = np.maximum(counts, 1)
+    multiplicity = sizes.prod(axis=1)
+    out_group = np.repeat(np.arange(n_groups), multiplicity)
+    position = np.arange(len(out_group)) - np.repeat(
+        np.cumsum(multiplicity) - multiplicity, multiplicity
+    )
+
+    columns = {
+        colname: stacked[colname][order[heads][out_group]] for colname in keys
+    }
+    # the rows of a group combine the rows of the tables like nested
+    # loops, the first table varying slowest
+    stride = np.ones(n_groups, dtype=np.intp)
+    offsets = np.cumsum(lengths) - lengths
+    for i in reversed(range(len(tables))):
+        rows = order[table_index[order] == i] - offsets[i]
+        starts = np.cumsum(counts[:, i]) - counts[:, i]
+        present = counts[out_group, i] > 0
+        local = (position // stride[out_group]) % sizes[out_group, i]
+        index = rows[np.where(present, starts[out_group] + local, 0)]
+        stride = stride * sizes[:, i]
+        for colname in tables[i].colnames:
+            if colname in keys:
+                continue
+            col = tables[i][colname][index]
+            if not present.all():
+                col = MaskedColumn(
+                    col, mask=np.ma.getmaskarray(col) | np.invert(present)
+                )
+            columns[colname] = col
+    names = tables[0].colnames + [
+        colname
+        for cat_prov in tables[1:]
+        for colname in cat_prov.colnames
+        if colname not in keys
+    ]
+    return Table([columns[colname] for colname in names], meta=stacked.meta)
+
+
 def join_different_provider_data(
     cat: dict[str, Table],
     o_merging: bool,
@@ -502,6 +956,7 @@ def matching_parameters(
     prov_name: str,
     prov_tables_dict: dict[str, dict[str, Table]],
     table_name: str,
+    source_index: dict[str, tuple[np.ndarray, np.ndarray]] | None = None,
 ) -> dict[str, Table]:
     """
     Redefines source reference columns with their corresponding IDs.
@@ -514,6 +969,9 @@ def matching_parameters(
     :type prov_tables_dict: dict[str, dict[str, Table]]
     :param table_name: Name of the table to process.
     :type table_name: str
+    :param source_index: Lookup from build_source_index, built from the
+        sources table if not given.
+    :type source_index: dict[str, tuple[np.ndarray, np.ndarray]] or None
     :returns: Updated dictionary of cumulative tables.
     :rtype: dict[str, Table]
     """
@@ -524,66 +982,42 @@ def matching_parameters(
             "provider_name"
         ][0]
         prov_tables_dict[prov_name][table_name] = assign_source_idref(
-            prov_table, cat["sources"], paras[table_name], provider_name
+            prov_table,
+            cat["sources"],
+            paras[table_name],
+            provider_name,
+            source_index,
         )
     return cat
 
 
-def unify_null_values(cat: dict[str, Table]) -> dict[str, Table]:
+def unify_null_values(
+    cat: dict[str, Table],
+    columns_map: dict[str, list[str]] | None = None,
+    tokens: list[str] | None = None,
+) -> dict[str, Table]:
     """
     Unifies null values ('N', 'N/A', '') to '?' across specific tables/columns.
 
     :param cat: Dictionary of cumulative tables.
     :type cat: dict[str, Table]
+    :param columns_map: Dictionary of table names and the columns to unify,
+        defaults to null_value_columns.
+    :type columns_map: dict[str, list[str]] or None
+    :param tokens: Null values to replace, defaults to null_tokens.
+    :type tokens: list[str] or None
     :returns: Updated dictionary of cumulative tables.
     :rtype: dict[str, Table]
     """
     print("Unifying null values...")
-    table_keys = [
-        "star_basic",
-        "planet_basic",
-        "disk_basic",
-        "mes_mass_pl",
-        "mes_teff_st",
-        "mes_radius_st",
-        "mes_mass_st",
-        "mes_binary",
-    ]
-    columns_map = [
-        [
-            "coo_qual",
-            "coo_gal_qual",
-            "plx_qual",
-            "dist_st_qual",
-            "sep_ang_qual",
-            "teff_st_qual",
-            "radius_st_qual",
-            "binary_flag",
-            "binary_qual",
-            "mass_st_qual",
-            "sptype_qual",
-            "class_temp",
-            "class_temp_nr",
-            "sptype_ref",
-            "mag_i_ref",
-            "mag_j_ref",
-            "mag_k_ref",
-            "mag_u_ref",
-        ],
-        ["mass_pl_qual"],
-        ["rad_qual", "rad_rel"],
-        ["mass_pl_qual"],
-        ["teff_st_qual"],
-        ["radius_st_qual"],
-        ["mass_st_qual"],
-        ["binary_qual"],
-    ]
-    for key, cols in zip(table_keys, columns_map):
+    if columns_map is None:
+        columns_map = null_value_columns
+    if tokens is None:
+        tokens = null_tokens
+    for key, cols in columns_map.items():
         if key in cat:
             for col in cols:
-                cat[key] = replace_value(cat[key], col, "N", "?")
-                cat[key] = replace_value(cat[key], col, "N/A", "?")
-                cat[key] = replace_value(cat[key], col, "", "?")
+                cat[key] = replace_values(cat[key], col, tokens, "?")
     return cat
 
 
@@ -656,82 +1090,79 @@ def build_provider_table(
     return cat
 
 
-def _handle_object_id_linking(table: Table, objects: Table) -> Table:
+def _handle_object_id_linking(
+    table: Table, objects_index: ObjectIndex
+) -> Table:
     """
     Helper to join object_id from objects table into another table.
 
     :param table: Table needing object_idref.
     :type table: Table
-    :param objects: Main objects table.
-    :type objects: Table
+    :param objects_index: Index of the main objects table.
+    :type objects_index: ObjectIndex
     :returns: Table with object_idref added.
     :rtype: Table
     """
     if "object_idref" in table.colnames:
         table.remove_column("object_idref")
-    table = join(table, objects["object_id", "main_id"], join_type="left")
-    table.rename_column("object_id", "object_idref")
-    return table
+    return objects_index.link_object_ids(table, "main_id", "object_idref")
 
 
-def _process_h_link(cat: dict[str, Table]) -> dict[str, Table]:
+def _process_h_link(
+    cat: dict[str, Table], objects_index: ObjectIndex
+) -> dict[str, Table]:
     """
     Processes h_link table to link parent/child IDs and find best memberships.
 
     :param cat: Dictionary of cumulative tables.
     :type cat: dict[str, Table]
+    :param objects_index: Index of the main objects table.
+    :type objects_index: ObjectIndex
     :returns: Updated dictionary of cumulative tables.
     :rtype: dict[str, Table]
     """
     h_link = cat["h_link"]
-    objects = cat["objects"]
 
     # Link child_object_idref
     if "child_object_idref" in h_link.colnames:
         h_link.remove_column("child_object_idref")
-    h_link = join(
-        h_link,
-        objects["object_id", "main_id"],
-        keys="main_id",
-        join_type="left",
-    )
-    h_link.rename_columns(
-        ["object_id", "main_id"], ["child_object_idref", "child_main_id"]
+    h_link = objects_index.link_object_ids(
+        h_link, "main_id", "child_object_idref"
     )
+    h_link.rename_column("main_id", "child_main_id")
 
     # Link parent_object_idref
     if "parent_object_idref" in h_link.colnames:
         h_link.remove_column("parent_object_idref")
     # Only keep links where parent is also in our objects table
-    h_link = join(
-        h_link,
-        objects["object_id", "main_id"],
-        keys_left="parent_main_id",
-        keys_right="main_id",
+    h_link = objects_index.link_object_ids(
+        h_link, "parent_main_id", "parent_object_idref", inner=True
     )
-    h_link.remove_column("main_id")
-    h_link.rename_column("object_id", "parent_object_idref")
 
     cat["h_link"] = h_link
     cat["best_h_link"] = best_para("membership", h_link)
     return cat
 
 
-def _process_basic_tables(cat: dict[str, Table]) -> dict[str, Table]:
+def _process_basic_tables(
+    cat: dict[str, Table], objects_index: ObjectIndex
+) -> dict[str, Table]:
     """
     Specialized processing for star_basic and planet_basic.
 
     :param cat: Dictionary of cumulative tables.
     :type cat: dict[str, Table]
+    :param objects_index: Index of the main objects table.
+    :type objects_index: ObjectIndex
     :returns: Updated dictionary of cumulative tables.
     :rtype: dict[str, Table]
     """
     objects = cat["objects"]
 
     # Star basic: include all objects typed as stars or systems
-    stars = objects["object_id", "main_id"][np.where(objects["type"] == "st")]
-    systems = objects["object_id", "main_id"][np.where(objects["type"] == "sy")]
-    temp = vstack([stars, systems])
+    temp = objects["object_id", "main_id"][
+        objects_index.rows_of_type(["st", "sy"])
+    ]
     temp.rename_column("object_id", "object_idref")
 
     cat["star_basic"] = join(
@@ -742,14 +1173,18 @@ def _process_basic_tables(cat: dict[str, Table]) -> dict[str, Table]:
     )
 
     # Planet basic: include all objects typed as planets
-    planets = objects["object_id", "main_id"][np.where(objects["type"] == "pl")]
+    planets = objects["object_id", "main_id"][
+        objects_index.rows_of_type(["pl"])
+    ]
     planets.rename_column("object_id", "object_idref")
     cat["planet_basic"] = planets
     return cat
 
 
 def build_rest_of_tables(
-    cat: dict[str, Table], prov_tables_dict: dict[str, dict[str, Table]]
+    cat: dict[str, Table],
+    prov_tables_dict: dict[str, dict[str, Table]],
+    report: StageReport | None = None,
 ) -> dict[str, Table]:
     """
     Builds all remaining tables (basic, measurements, etc.) and performs links.
@@ -758,130 +1193,167 @@ def build_rest_of_tables(
     :type cat: dict[str, Table]
     :param prov_tables_dict: Dictionary of provider tables.
     :type prov_tables_dict: dict[str, dict[str, Table]]
+    :param report: Report recording each table as a stage.
+    :type report: StageReport or None
     :returns: Updated dictionary of cumulative tables.
     :rtype: dict[str, Table]
     """
+    if report is None:
+        report = StageReport()
     empty_dict_cols = empty_dict_wit_columns.copy()
+    # the sources and objects tables are complete, so their lookups are
+    # built only once
+    source_index = build_source_index(cat["sources"])
+    objects_index = ObjectIndex(cat["objects"])
 
     # Skip first 3 tables (sources, objects, provider)
     for table_name in islice(cat, 3, None):
-        cat = provider_data_merging(
-            cat, table_name, prov_tables_dict, para_match=True
-        )
-
-        cat[table_name] = vstack([cat[table_name], empty_dict_cols[table_name]])
-        cat[table_name] = cat[table_name].filled()
-
-        # Link object_idrefs if applicable
-        if (
-            "object_idref" in cat[table_name].colnames
-            and len(cat[table_name]) > 0
-        ):
-            cat[table_name] = _handle_object_id_linking(
-                cat[table_name], cat["objects"]
+        with report.stage(f"build_rest_of_tables: {table_name}") as record:
+            cat = provider_data_merging(
+                cat,
+                table_name,
+                prov_tables_dict,
+                para_match=True,
+                source_index=source_index,
             )
 
-        # Specialized handling by table name
-        if table_name == "ident":
-            cat[table_name] = best_para("id", cat[table_name])
-        elif table_name == "h_link":
-            cat = _process_h_link(cat)
-        elif table_name == "planet_basic":
-            cat = _process_basic_tables(cat)
-        elif table_name == "mes_teff_st":
-            cat["star_basic"] = best_parameters_ingestion(
-                cat[table_name],
-                cat["star_basic"],
-                "teff_st",
-                [
-                    "teff_st_value",
-                    "teff_st_err",
-                    "teff_st_qual",
-                    "teff_st_source_idref",
-                    "teff_st_ref",
-                ],
-            )
-        elif table_name == "mes_radius_st":
-            cat["star_basic"] = best_parameters_ingestion(
-                cat[table_name],
-                cat["star_basic"],
-                "radius_st",
-                [
-                    "radius_st_value",
-                    "radius_st_err",
-                    "radius_st_qual",
-                    "radius_st_source_idref",
-                    "radius_st_ref",
-                ],
-            )
-        elif table_name == "mes_mass_st":
-            cat["star_basic"] = best_parameters_ingestion(
-                cat[table_name],
-                cat["star_basic"],
-                "mass_st",
-                [
-                    "mass_st_value",
-                    "mass_st_err",
-                    "mass_st_qual",
-                    "mass_st_source_idref",
-                    "mass_st_ref",
-                ],
-            )
-        elif table_name == "mes_mass_pl":
-            cat["planet_basic"] = best_parameters_ingestion(
-                cat[table_name], cat["planet_basic"], "mass_pl"
-            )
-        elif table_name == "mes_binary":
-            cat["star_basic"] = best_parameters_ingestion(
-                cat[table_name],
-                cat["star_basic"],
-                "binary",
-                [
-                    "binary_flag",
-                    "binary_qual",
-                    "binary_source_idref",
-                    "binary_ref",
-                ],
-            )
-        elif table_name == "mes_sep_ang":
-            cat["star_basic"] = best_parameters_ingestion(
-                cat[table_name],
-                cat["star_basic"],
-                "sep_ang",
-                [
-                    "sep_ang_value",
-                    "sep_ang_err",
-                    "sep_ang_obs_date",
-                    "sep_ang_qual",
-                    "sep_ang_source_idref",
-                    "sep_ang_ref",
-                ],
+            cat[table_name] = vstack(
+                [cat[table_name], empty_dict_cols[table_name]]
             )
+            cat[table_name] = cat[table_name].filled()
+
+            # Link object_idrefs if applicable
+            if (
+                "object_idref" in cat[table_name].colnames
+                and len(cat[table_name]) > 0
+            ):
+                cat[table_name] = _handle_object_id_linking(
+                    cat[table_name], objects_index
+                )
+
+            # Specialized handling by table name
+            if table_name == "ident":
+                cat[table_name] = best_para(
+                    "id", cat[table_name], cat["provider"]
+                )
+            elif table_name == "h_link":
+                cat = _process_h_link(cat, objects_index)
+            elif table_name == "planet_basic":
+                cat = _process_basic_tables(cat, objects_index)
+            elif table_name == "mes_teff_st":
+                cat["star_basic"] = best_parameters_ingestion(
+                    cat[table_name],
+                    cat["star_basic"],
+                    "teff_st",
+                    [
+                        "teff_st_value",
+                        "teff_st_err",
+                        "teff_st_qual",
+                        "teff_st_source_idref",
+                        "teff_st_ref",
+                    ],
+                    objects_index=objects_index,
+                )
+            elif table_name == "mes_radius_st":
+                cat["star_basic"] = best_parameters_ingestion(
+                    cat[table_name],
+                    cat["star_basic"],
+                    "radius_st",
+                    [
+                        "radius_st_value",
+                        "radius_st_err",
+                        "radius_st_qual",
+                        "radius_st_source_idref",
+                        "radius_st_ref",
+                    ],
+                    objects_index=objects_index,
+                )
+            elif table_name == "mes_mass_st":
+                cat["star_basic"] = best_parameters_ingestion(
+                    cat[table_name],
+                    cat["star_basic"],
+                    "mass_st",
+                    [
+                        "mass_st_value",
+                        "mass_st_err",
+                        "mass_st_qual",
+                        "mass_st_source_idref",
+                        "mass_st_ref",
+                    ],
+                    objects_index=objects_index,
+                )
+            elif table_name == "mes_mass_pl":
+                cat["planet_basic"] = best_parameters_ingestion(
+                    cat[table_name],
+                    cat["planet_basic"],
+                    "mass_pl",
+                    objects_index=objects_index,
+                )
+            elif table_name == "mes_binary":
+                cat["star_basic"] = best_parameters_ingestion(
+                    cat[table_name],
+                    cat["star_basic"],
+                    "binary",
+                    [
+                        "binary_flag",
+                        "binary_qual",
+                        "binary_source_idref",
+                        "binary_ref",
+                    ],
+                    objects_index=objects_index,
+                )
+            elif table_name == "mes_sep_ang":
+                cat["star_basic"] = best_parameters_ingestion(
+                    cat[table_name],
+                    cat["star_basic"],
+                    "sep_ang",
+                    [
+                        "sep_ang_value",
+                        "sep_ang_err",
+                        "sep_ang_obs_date",
+                        "sep_ang_qual",
+                        "sep_ang_source_idref",
+                        "sep_ang_ref",
+                    ],
+                    objects_index=objects_index,
+                )
+
+            cat[table_name] = cat[table_name].filled()
+            if len(cat[table_name]) == 0:
+                print(f"warning: empty table {table_name}")
+            else:
+                cat[table_name] = unique(cat[table_name], silent=True)
 
-        cat[table_name] = cat[table_name].filled()
-        if len(cat[table_name]) == 0:
-            print(f"warning: empty table {table_name}")
-        else:
-            cat[table_name] = unique(cat[table_name], silent=True)
-
+            record["rows"] = row_counts(cat, [table_name])
     return cat
 
 
 def build_tables(
     prov_tables_dict: dict[str, dict[str, Table]],
+    report: StageReport | None = None,
 ) -> dict[str, Table]:
     """
     Orchestrates the building of all database tables.
 
     :param prov_tables_dict: Dictionary of provider tables.
     :type prov_tables_dict: dict[str, dict[str, Table]]
+    :param report: Report recording the building steps as stages.
+    :type report: StageReport or None
     :returns: Dictionary of built tables.
     :rtype: dict[str, Table]
     """
-    cat = build_sources_table(prov_tables_dict)
-    cat = build_objects_table(cat, prov_tables_dict)
-    cat = build_provider_table(cat, prov_tables_dict)
-    cat = build_rest_of_tables(cat, prov_tables_dict)
+    if report is None:
+        report = StageReport()
+    with report.stage("build_sources_table") as record:
+        cat = build_sources_table(prov_tables_dict)
+        record["rows"] = row_counts(cat, ["sources"])
+    with report.stage("build_objects_table") as record:
+        cat = build_objects_table(cat, prov_tables_dict)
+        record["rows"] = row_counts(cat, ["objects"])
+    with report.stage("build_provider_table") as record:
+        cat = build_provider_table(cat, prov_tables_dict)
+        record["rows"] = row_counts(cat, ["provider"])
+    cat = build_rest_of_tables(cat, prov_tables_dict, report)
     return cat
 
 
@@ -889,26 +1361,39 @@ def building(prov_tables_dict: dict[str, dict[str, Table]]) -> dict[str, Table]:
     """
     Builds the complete LIFE database from provider tables and saves it.
 
+    Wall time, CPU time, peak memory and row counts of the building steps
+    are written to building_report.json next to the saved tables.
+
     :param prov_tables_dict: Dictionary containing data from providers
         Simbad, Grant Kennedy, Exo-MerCat, Gaia and WDS.
     :type prov_tables_dict: dict[str, dict[str, Table]]
     :returns: Dictionary of processed tables.
     :rtype: dict[str, Table]
     """
-    cat = build_tables(prov_tables_dict)
+    report = StageReport()
+    cat = build_tables(prov_tables_dict, report)
 
     # Ensure star_basic has no masked entries after multi-measurement ingestions
     cat["star_basic"] = cat["star_basic"].filled()
 
-    cat = unify_null_values(cat)
+    with report.stage("unify_null_values") as record:
+        cat = unify_null_values(cat)
+        record["rows"] = row_counts(cat, list(null_value_columns))
 
     # TBD: Add exact object distance cut. So far for correct treatment
     #       of boundary objects 10% additional distance cut used""")
 
     print("Saving data...")
-    save(
-        list(cat.values()),
-        list(cat.keys()),
-        location=Path().data,
-    )
+    # VOTable xml is the export ingested by DaCHS, the columnar binary
+    # copy is what load_life_td reads back.
+    for fmt in ["xml", "npy"]:
+        with report.stage(f"save: {fmt}") as record:
+            save(
+                list(cat.values()),
+                list(cat.keys()),
+                location=Path().data,
+                fmt=fmt,
+            )
+            record["rows"] = row_counts(cat)
+    report.write(Path().data + "building_report.json")
     return cat
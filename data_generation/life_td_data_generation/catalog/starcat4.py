@@ -254,6 +254,7 @@ def starcat_creation(
         [StarCat4],
         ["integration_test_StarCat4"],
         location=path,
+        fmt="xml",
     )
     StarCat4 = objecttostring(StarCat4)
     StarCat4.write(
@@ -539,7 +539,9 @@ def save_catalog(starcat5: Table) -> None:
     out_path = catalogs_dir / "StarCat5.ecsv"
     starcat5.write(str(out_path), delimiter=",", overwrite=True)
 
-    save([starcat5], ["StarCat5"], location=str(catalogs_dir) + "/")
+    save(
+        [starcat5], ["StarCat5"], location=str(catalogs_dir) + "/", fmt="xml"
+    )
 
 
 def main(distance_cut = 30.0, service_type = "") -> int:
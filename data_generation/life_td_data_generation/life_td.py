@@ -3,6 +3,18 @@ Generates the data for the LIFE Target Database.
 
 """
 
+import hashlib
+import json
+import multiprocessing
+import os
+from collections.abc import Mapping
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+
 from astropy import io
 from building import building
 from provider.exo import provider_exo
@@ -10,46 +22,151 @@ from provider.gaia import provider_gaia
 from provider.life import provider_life
 from provider.sdb import provider_sdb
 from provider.simbad import provider_simbad
+from provider.utils import intern_strings, intern_tables
 from provider.wds import provider_wds
 
 # self created modules
 from sdata import empty_dict, empty_provider_tables_dict
-from utils.io import Path, load, string_to_object_whole_dict
+from utils.io import (
+    Path,
+    file_hash,
+    load,
+    string_to_object_whole_dict,
+    table_hash,
+)
 
 
 # tbd change provider to provider_info to minimize confusion in building function with providers list
-def load_cat(provider_name="", path_prefix=""):
+def load_cat(provider_name="", path_prefix="", mmap=False):
+    """
+    Loads the tables of one provider or the database tables.
+
+    :param str provider_name: Provider whose intermediate tables are
+        loaded, e.g. 'sim'. Defaults to '', loading the database tables.
+    :param str path_prefix: Prefix to the default data locations.
+    :param bool mmap: Whether tables in the columnar binary format are
+        memory mapped instead of read into memory, keeping their string
+        columns fixed width, see utils.io.load_npy. Defaults to False.
+    :return: Dictionary of table names and tables.
+    :rtype: dict(str,astropy.table.table.Table)
+    """
     cat = empty_dict.copy()
     if provider_name == "":
         prov = load(
             [direction for direction in list(cat.keys())],
             location=path_prefix + Path().data,
+            mmap=mmap,
         )
     else:
         prov = load(
             [provider_name + "_" + direction for direction in list(cat.keys())],
             location=path_prefix + Path().additional_data,
+            mmap=mmap,
         )
     for i, table in enumerate(list(cat.keys())):
         cat[table] = prov[i]
     return cat
 
 
-def load_life_td(path_prefix=""):
+class LazyCat(Mapping):
+    """
+    Dictionary of table names and tables loading each table on first access.
+
+    Has the same keys as sdata.empty_dict. Loaded tables are kept and
+    their identifier and reference strings interned like in
+    load_life_td. With mmap, string columns of tables in the columnar
+    binary format stay memory mapped fixed width strings, see
+    utils.io.load_npy, otherwise they are transformed into object type
+    ones.
+    """
+
+    def __init__(self, provider_name="", path_prefix="", mmap=True):
+        """
+        :param str provider_name: Provider whose intermediate tables are
+            loaded, e.g. 'sim'. Defaults to '', loading the database tables.
+        :param str path_prefix: Prefix to the default data locations.
+        :param bool mmap: Whether tables in the columnar binary format are
+            memory mapped instead of read into memory. Defaults to True.
+        """
+        self.provider_name = provider_name
+        self.path_prefix = path_prefix
+        self.mmap = mmap
+        self.tables = {}
+
+    def __getitem__(self, table_name):
+        if table_name not in empty_dict:
+            raise KeyError(table_name)
+        if table_name not in self.tables:
+            self.tables[table_name] = self.load_columns(table_name)
+        return self.tables[table_name]
+
+    def __iter__(self):
+        return iter(empty_dict)
+
+    def __len__(self):
+        return len(empty_dict)
+
+    def load_columns(self, table_name, columns=None):
+        """
+        Loads a table or a subset of its columns.
+
+        Only the full table is kept for later access, a column subset is
+        loaded anew for each call unless the full table is already loaded.
+
+        :param str table_name: Name of the table, e.g. 'star_basic'.
+        :param columns: Names of the columns to load, all if None.
+        :type columns: list(str) or None
+        :returns: Table with the requested columns.
+        :rtype: astropy.table.table.Table
+        """
+        if table_name not in empty_dict:
+            raise KeyError(table_name)
+        if table_name in self.tables:
+            if columns is None:
+                return self.tables[table_name]
+            return self.tables[table_name][columns]
+        if self.provider_name == "":
+            path = table_name
+            location = self.path_prefix + Path().data
+        else:
+            path = self.provider_name + "_" + table_name
+            location = self.path_prefix + Path().additional_data
+        [table] = load(
+            [path], location=location, mmap=self.mmap, columns=columns
+        )
+        return intern_strings(table)
+
+
+def load_life_td(path_prefix="", lazy=False):
     """
     Loads previously created life_td data.
 
+    :param str path_prefix: Prefix to the default data locations.
+    :param bool lazy: If True, tables are only loaded on first access,
+        see LazyCat, and memory mapped provider tables keep fixed width
+        string columns. Defaults to False.
     :return: life_td data in different tables
     :rtype: list(astropy.table.table.Table)
     """
+    if lazy:
+        provider_tables_dict = {
+            prov: LazyCat(prov, path_prefix)
+            for prov in empty_provider_tables_dict
+        }
+        return provider_tables_dict, LazyCat("", path_prefix)
+
     print("Loading life_td generated data")
 
     provider_tables_dict = empty_provider_tables_dict.copy()
 
     for i, prov in enumerate(list(provider_tables_dict.keys())):
         print(f"Loading {prov} data")
-        cat = load_cat(prov, path_prefix)
-        provider_tables_dict[prov] = string_to_object_whole_dict(cat)
+        cat = load_cat(prov, path_prefix, mmap=True)
+        # variable length strings like those of the created tables, only
+        # the other columns stay memory mapped
+        provider_tables_dict[prov] = intern_tables(
+            string_to_object_whole_dict(cat, 3000)
+        )
 
     db = load_cat("", path_prefix)
     database_tables = string_to_object_whole_dict(db)
@@ -57,12 +174,226 @@ def load_life_td(path_prefix=""):
     return provider_tables_dict, database_tables
 
 
-def partial_create(distance_cut_in_pc, create=[]):
+# Inputs each provider's tables are generated from: whether the distance
+# cut is used, saved tables of other providers it loads, its provider
+# module containing the queries, and local data snapshots.
+provider_inputs = {
+    "sim": {
+        "distance_cut": True,
+        "tables": [],
+        "modules": ["provider/simbad.py"],
+        "snapshots": [],
+    },
+    "sdb": {
+        "distance_cut": True,
+        "tables": [],
+        "modules": ["provider/sdb.py"],
+        "snapshots": ["sdb_200pc_28_04_2026.xml"],
+    },
+    "wds": {
+        "distance_cut": False,
+        "tables": ["sim_objects", "sim_ident", "sim_h_link"],
+        "modules": ["provider/wds.py"],
+        "snapshots": [],
+    },
+    "exo": {
+        "distance_cut": False,
+        "tables": ["sim_objects", "sim_provider"],
+        "modules": ["provider/exo.py"],
+        "snapshots": ["exo-mercat13-12-2024_v2.0.csv"],
+    },
+    "life": {
+        "distance_cut": False,
+        "tables": ["sim_objects", "sim_star_basic"],
+        "modules": ["provider/life.py"],
+        "snapshots": ["Mamajek2022-04-16.csv"],
+    },
+    "gaia": {
+        "distance_cut": True,
+        "tables": [],
+        "modules": ["provider/gaia.py"],
+        "snapshots": [],
+    },
+}
+
+# Modules all providers run through: TAP queries, caching and uploads,
+# quality assignment, the table schemas and saving. They are hashed as
+# inputs of every provider.
+shared_provider_modules = [
+    "provider/utils.py",
+    "provider/assign_quality_funcs.py",
+    "sdata.py",
+    "utils/io.py",
+]
+
+# Providers whose saved tables are loaded by another provider, e.g. wds
+# matches its objects against sim_objects, sim_ident and sim_h_link.
+provider_dependencies = {
+    prov: sorted({table.split("_")[0] for table in inputs["tables"]})
+    for prov, inputs in provider_inputs.items()
+}
+
+# Providers without TAP queries, these are run in a separate process
+# instead of a thread as they are bound by computation.
+cpu_bound_providers = ["life"]
+
+
+def run_providers(tasks, dependencies=provider_dependencies, max_workers=None):
+    """
+    Runs provider functions concurrently.
+
+    A provider is started once all providers it depends on and that are
+    part of tasks have finished. Dependencies not part of tasks are
+    assumed to have their tables saved already. Providers in
+    cpu_bound_providers are run in a process, the others in threads as
+    they mostly wait for TAP services.
+
+    :param tasks: Provider names and tuples of the provider function and
+        its arguments.
+    :type tasks: dict(str,tuple(callable,tuple))
+    :param dependencies: Provider names and lists of the providers they
+        depend on. Defaults to provider_dependencies.
+    :type dependencies: dict(str,list(str))
+    :param max_workers: Maximum number of providers run at the same time,
+        no limit beyond the executor defaults if None.
+    :type max_workers: int or None
+    :returns: Provider names and returned dictionaries of tables.
+    :rtype: dict(str,dict(str,astropy.table.table.Table))
+    """
+    results = {}
+    pending = dict(tasks)
+    running = {}
+    with (
+        ThreadPoolExecutor(max_workers=max_workers) as thread_executor,
+        ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context("spawn")
+        ) as process_executor,
+    ):
+        while pending or running:
+            for prov in list(pending):
+                waiting_for = [
+                    dep
+                    for dep in dependencies.get(prov, [])
+                    if dep in tasks and dep not in results
+                ]
+                if waiting_for:
+                    continue
+                function, arguments = pending.pop(prov)
+                if prov in cpu_bound_providers:
+                    executor = process_executor
+                else:
+                    executor = thread_executor
+                running[executor.submit(function, *arguments)] = prov
+            if not running:
+                raise ValueError(
+                    f"Circular provider dependencies among {list(pending)}"
+                )
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+    return results
+
+
+def provider_input_hash(prov, distance_cut_in_pc):
+    """
+    Computes a hash over all inputs of a provider.
+
+    Covers the inputs declared in provider_inputs and the
+    shared_provider_modules. Data obtained from TAP services is not
+    covered, regenerate the provider explicitly to update it.
+
+    :param str prov: Provider name, e.g. 'wds'.
+    :param float distance_cut_in_pc: Distance cut of the objects in parsec.
+    :returns: Hexadecimal sha256 digest.
+    :rtype: str
+    """
+    inputs = provider_inputs[prov]
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    hashes = {
+        "distance_cut": distance_cut_in_pc if inputs["distance_cut"] else None,
+        "tables": {table: table_hash(table) for table in inputs["tables"]},
+        "modules": {
+            module: file_hash(os.path.join(package_dir, module))
+            for module in inputs["modules"] + shared_provider_modules
+        },
+        "snapshots": {
+            snapshot: file_hash(Path().additional_data + snapshot)
+            for snapshot in inputs["snapshots"]
+        },
+    }
+    return hashlib.sha256(
+        json.dumps(hashes, sort_keys=True).encode()
+    ).hexdigest()
+
+
+def read_manifest(prov):
+    """
+    Reads the hashes stored when the provider tables were last generated.
+
+    :param str prov: Provider name, e.g. 'wds'.
+    :returns: Input hash and table hashes, empty if there is no manifest.
+    :rtype: dict
+    """
+    filename = Path().additional_data + f"{prov}_manifest.json"
+    if not os.path.isfile(filename):
+        return {}
+    with open(filename) as f:
+        return json.load(f)
+
+
+def write_manifest(prov, input_hash):
+    """
+    Stores the input hash and the hashes of the saved provider tables.
+
+    :param str prov: Provider name, e.g. 'wds'.
+    :param str input_hash: Hash from provider_input_hash.
+    """
+    manifest = {
+        "inputs": input_hash,
+        "tables": {
+            table: table_hash(f"{prov}_{table}") for table in empty_dict
+        },
+    }
+    with open(Path().additional_data + f"{prov}_manifest.json", "w") as f:
+        json.dump(manifest, f, indent=4)
+    return
+
+
+def create_provider(
+    prov, function, arguments, distance_cut_in_pc, only_if_changed=False
+):
+    """
+    Generates the tables of one provider and records their inputs.
+
+    :param str prov: Provider name, e.g. 'wds'.
+    :param function: Provider function, e.g. provider_wds.
+    :type function: callable
+    :param arguments: Arguments of the provider function.
+    :type arguments: tuple
+    :param float distance_cut_in_pc: Distance cut of the objects in parsec.
+    :param bool only_if_changed: If True, the tables are only generated
+        if the inputs changed since they were last generated.
+    :returns: Provider tables, None if they were up to date.
+    :rtype: dict(str,astropy.table.table.Table) or None
+    """
+    input_hash = provider_input_hash(prov, distance_cut_in_pc)
+    if only_if_changed and read_manifest(prov).get("inputs") == input_hash:
+        print(f"{prov} data up to date")
+        return None
+    cat = function(*arguments)
+    write_manifest(prov, input_hash)
+    return cat
+
+
+def partial_create(
+    distance_cut_in_pc, create=[], max_workers=None, incremental=False
+):
     """
     Partially generates, partially loads life_td data.
 
     Generates the in the create list specified life_td data, loads the
-    rest and builds everything together.
+    rest and builds everything together. Independent providers are
+    generated concurrently, see run_providers.
 
     :param distance_cut_in_pc: Distance cut of the objects in parsec.
     :type distance_cut_in_pc: float
@@ -70,6 +401,13 @@ def partial_create(distance_cut_in_pc, create=[]):
         and 'gaia'  are present, generates those tables, the missing
         ones are loaded.
     :type create: list(str)
+    :param max_workers: Maximum number of providers generated at the same
+        time, passed on to run_providers.
+    :type max_workers: int or None
+    :param incremental: If True, also generates the providers not in
+        create whose inputs changed since their tables were last
+        generated, see provider_inputs.
+    :type incremental: bool
     :return: life_td data in different tables
     :rtype: list(astropy.table.table.Table)
     """
@@ -87,37 +425,35 @@ def partial_create(distance_cut_in_pc, create=[]):
     data = io.votable.parse_single_table(
         Path().additional_data + "sdb_200pc_28_04_2026.xml"
     ).to_table()
-    functions = [
-        provider_simbad,
-        provider_sdb,
-        provider_wds,
-        provider_exo,
-        provider_life,
-        provider_gaia,
-    ]
-    arguments = [
-        (distance_cut_in_pc,),  # Add comma to make it a tuple
-        (distance_cut_in_pc, data),
-        (),
-        (),
-        (),
-        (distance_cut_in_pc,),  # Add comma to make it a tuple
-    ]
+    provider_functions = {
+        "sim": (provider_simbad, (distance_cut_in_pc,)),
+        "sdb": (provider_sdb, (distance_cut_in_pc, data)),
+        "wds": (provider_wds, ()),
+        "exo": (provider_exo, ()),
+        "life": (provider_life, ()),
+        "gaia": (provider_gaia, (distance_cut_in_pc,)),
+    }
+    tasks = {
+        prov: (
+            create_provider,
+            (prov, function, arguments, distance_cut_in_pc, prov not in create),
+        )
+        for prov, (function, arguments) in provider_functions.items()
+        if prov in create or incremental
+    }
+    created = run_providers(tasks, max_workers=max_workers)
 
-    for i, prov in enumerate(list(provider_tables_dict.keys())):
-        # provider_tables_dict[prov]=string_to_object_whole_dict(provider_tables_dict[prov])
-        if prov in create:
-            if arguments[i] != ():
-                try:
-                    cat = functions[i](arguments[i])
-                except:
-                    cat = functions[i](*arguments[i])
-            else:
-                cat = functions[i]()
+    for prov in list(provider_tables_dict.keys()):
+        if created.get(prov) is not None:
+            cat = created[prov]
         else:
             print(f"Loading {prov} data")
-            cat = load_cat(prov)
-        provider_tables_dict[prov] = string_to_object_whole_dict(cat)
+            cat = load_cat(prov, mmap=True)
+        # building needs variable length strings like those of the created
+        # tables, only the other columns stay memory mapped
+        provider_tables_dict[prov] = intern_tables(
+            string_to_object_whole_dict(cat, 3000)
+        )
 
     # ------------------------combine data from external sources---------
     database_tables = building(provider_tables_dict)
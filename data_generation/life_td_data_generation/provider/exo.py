@@ -14,6 +14,7 @@ from provider.utils import (
     distance_cut,
     fetch_main_id,
     ids_from_ident,
+    intern_tables,
     lower_quality,
     nullvalues,
     query,
@@ -629,5 +630,10 @@ def provider_exo() -> dict[str, Table]:
     exo["h_link"] = create_h_link_table(exo_helptab, exo)
     exo["sources"] = create_exo_sources_table(exo)
 
-    save(list(exo.values()), ["exo_" + element for element in list(exo.keys())])
+    exo = intern_tables(exo)
+    save(
+        list(exo.values()),
+        ["exo_" + element for element in list(exo.keys())],
+        fmt="npy",
+    )
     return exo
@@ -11,6 +11,7 @@ from provider.utils import (
     create_sources_table,
     fetch_main_id,
     ids_from_ident,
+    intern_tables,
     query,
     replace_value,
 )
@@ -58,7 +59,7 @@ def create_gaia_helpertable(distance_cut_in_pc):
         if len(gaia_helptab) > 1500000:
             print("query might be truncated", len(gaia_helptab))
 
-    except:
+    except RuntimeError:
         # because of bug in gaia server where async not working currently
         service = TAPService(gaia["provider"]["provider_url"][0])
         result = service.run_sync(adql_query.format(**locals()), maxrec=160000)
@@ -344,8 +345,10 @@ def provider_gaia(distance_cut_in_pc):
     gaia["mes_mass_st"] = create_mes_mass_st_table(gaia_helptab)
     gaia["sources"] = create_gaia_sources_table(gaia)
 
+    gaia = intern_tables(gaia)
     save(
         list(gaia.values()),
         ["gaia_" + element for element in list(gaia.keys())],
+        fmt="npy",
     )
     return gaia
@@ -2,21 +2,31 @@
 Generates the data for the database for the provider LIFE.
 """
 
+import functools
+import re
+
 import numpy as np  # arrays
 from astropy import coordinates, units
 from astropy.io import ascii, votable
-from astropy.table import Column, MaskedColumn, join, unique
+from astropy.table import MaskedColumn, join, unique
 from provider.assign_quality_funcs import assign_quality
 from provider.utils import (
     create_provider_table,
     create_sources_table,
     initiate_columns,
+    intern_tables,
     replace_value,
     sorting_number_of_id,
 )
 from sdata import empty_dict
 from utils.io import Path, load, save, stringtoobject
 
+# Rows of the star_basic table transformed at once by derive_astrometry.
+astrometry_settings = {"chunk_size": 100000}
+
+# Luminocity class at the given position, as in extract_lum_class.
+lum_class_pattern = re.compile(r"[IV]{1,3}")
+
 
 def extract_lum_class(nr, sptype):
     """
@@ -128,6 +138,44 @@ def assign_diff_lum_classes(i, sptype, table):
     return table
 
 
+def parse_sptype(sptype):
+    """
+    Splits a spectral type string into its classes.
+
+    Gives the same results as deal_with_leading_d_sptype,
+    deal_with_middle_minus and assign_diff_lum_classes for one string,
+    without writing into a table.
+
+    :param str sptype: Spectral type.
+    :returns: Cleaned spectral type, temperature class, temperature class
+        number (None if not given) and luminocity class. The classes are
+        '?' for spectral types that are not processed.
+    :rtype: tuple(str,str,str,str)
+    """
+    # leading d of old annotation for dwarf stars and middle minus
+    if sptype.startswith("d"):
+        sptype = sptype.strip("d")
+    sptype = sptype.replace("-", "")
+    # sorting out objects like M5V+K7V, entries like '' and brown dwarfs
+    if "+" in sptype or sptype == "" or sptype[0] not in "OBAFGKM":
+        return sptype, "?", "?", "?"
+
+    class_temp_nr = None
+    lum_class = None
+    if len(sptype) > 1 and sptype[1] in "0123456789":
+        # distinguishing between objects like K5V and K5.5V
+        if len(sptype) > 2 and sptype[2] == ".":
+            class_temp_nr = sptype[1:4]
+            lum_class = lum_class_pattern.match(sptype, 4)
+        else:
+            class_temp_nr = sptype[1]
+            lum_class = lum_class_pattern.match(sptype, 2)
+    # V is assumed if no luminocity class is given, see
+    # assign_diff_lum_classes
+    lum_class = lum_class.group() if lum_class else "V"
+    return sptype, sptype[0], class_temp_nr, lum_class
+
+
 def sptype_string_to_class(table, ref):
     """
     Extracts stellar parameters from spectral type string one.
@@ -153,28 +201,26 @@ def sptype_string_to_class(table, ref):
         [object, object, object, object],
         [True, True, True, True],
     )
+    if len(table) == 0:
+        return table
+
+    # far fewer distinct spectral types than stars, so each one is parsed
+    # only once
+    sptypes, inverse = np.unique(
+        np.asarray(np.ma.getdata(table["sptype_string"]), dtype=str),
+        return_inverse=True,
+    )
+    parsed = [parse_sptype(sptype) for sptype in sptypes.tolist()]
+    sptype, class_temp, class_temp_nr, class_lum = (
+        np.array(values, dtype=object)[inverse] for values in zip(*parsed)
+    )
 
-    for i in range(len(table)):
-        # sorting out objects like M5V+K7V
-        sptype = deal_with_leading_d_sptype(table, i)
-        sptype = deal_with_middle_minus(sptype)
-
-        if (
-            len(sptype.split("+")) == 1
-            and
-            # sorting out entries like ''
-            len(sptype) > 0
-            and
-            # sorting out brown dwarfs i.e. T1V
-            sptype[0] in ["O", "B", "A", "F", "G", "K", "M"]
-        ):
-            # assigning temperature class and reference
-            table["class_temp"][i] = sptype[0]
-            table["class_ref"][i] = ref
-            table = assign_diff_lum_classes(i, sptype, table)
-        else:
-            table = assign_null_values(table, i)
-        table["sptype_string"][i] = sptype
+    table["sptype_string"][:] = sptype
+    table["class_temp"][:] = class_temp
+    table["class_lum"][:] = class_lum
+    table["class_ref"][:] = np.where(class_temp == "?", "?", ref)
+    has_nr = class_temp_nr != None  # noqa: E711
+    table["class_temp_nr"][has_nr] = class_temp_nr[has_nr]
     return table
 
 
@@ -200,7 +246,7 @@ def realspectype(cat):
     return ms
 
 
-def modeled_param():
+def modeled_param(save_votable=True):
     """
     Loads and cleans up model file.
 
@@ -208,6 +254,8 @@ def modeled_param():
     modeled from spectral types. Cleans up the columns for spectral
     type, effective temperature radius and mass.
 
+    :param bool save_votable: If True, the table is also saved as
+        model_param.xml.
     :returns: Table of the 4 parameters as columns
     :rtype: astropy.table.table.Table
     """
@@ -222,13 +270,66 @@ def modeled_param():
     eem_table["Teff"].unit = units.K
     eem_table["Radius"].unit = units.R_sun
     eem_table["Mass"].unit = units.M_sun
-    votable.writeto(
-        votable.from_table(eem_table),
-        f"{Path().additional_data}model_param.xml",
-    )  # saving votable
+    if save_votable:
+        votable.writeto(
+            votable.from_table(eem_table),
+            f"{Path().additional_data}model_param.xml",
+        )  # saving votable
     return eem_table
 
 
+@functools.cache
+def model_param_index():
+    """
+    Indexes Mamajek's model table by spectral type prefix.
+
+    The model file is read only once per session. As in a search through
+    the rows from the top, the first model row wins for each prefix.
+    Besides the first 3 characters of the model spectral types (e.g.
+    'G2V'), the index holds the matches of the half-subtypes (e.g.
+    'K2.5V'). Those are the model rows of the half-subtype where the
+    model covers it and the integer subtype otherwise (e.g. 'K2V'). The
+    fallback depends on the character after '.5' only if it is one of
+    the characters that end a 3 character prefix, then it is part of
+    the key.
+
+    :returns: Dictionary of the prefixes and the modeled effective
+        temperature, radius and mass, and the characters that end a 3
+        character prefix.
+    :rtype: tuple(dict(str,tuple(float,float,float)),set(str))
+    """
+    model_param = modeled_param(save_votable=False)
+    # brown dwarf rows without radius or mass, never matched by main
+    # sequence stars
+    model_param = replace_value(model_param, "Radius", "...", "nan")
+    model_param = replace_value(model_param, "Mass", "...", "nan")
+    values = zip(
+        model_param["Teff"].astype(float),
+        model_param["Radius"].astype(float),
+        model_param["Mass"].astype(float),
+    )
+    index_3 = {}
+    index_4 = {}
+    for sptype, value in zip(model_param["SpT"].tolist(), values):
+        index_3.setdefault(sptype[:3], value)
+        index_4.setdefault(sptype[:4], value)
+
+    index = dict(index_3)
+    suffixes = {prefix[2:] for prefix in index_3}
+    for subtype in {prefix[:2] for prefix in index_3}:
+        half = subtype + ".5"
+        model_half = index_3.get(subtype + ".") or index_4.get(half)
+        if model_half is not None:
+            index[half] = model_half
+        for suffix in suffixes:
+            # If no .5 match found, fall back to the integer value
+            # (e.g., K2.5V -> K2V)
+            match = model_half or index_3.get(subtype + suffix)
+            if match is not None:
+                index[half + suffix] = match
+    return index, suffixes
+
+
 def match_sptype(
     cat,
     sptypestring="mp_specmatch",
@@ -255,7 +356,7 @@ def match_sptype(
         effective temperature, radius and mass filled with model values
     :rtype: astropy.table.table.Table
     """
-    model_param = modeled_param()  # Load Mamajek's model table
+    model_index = model_param_index()  # Mamajek's model table
 
     # Initialize columns with proper units and masked arrays
     num_rows = len(cat)
@@ -268,74 +369,60 @@ def match_sptype(
     cat[mstring] = MaskedColumn(
         mask=np.full(num_rows, True), length=num_rows, unit=units.M_sun
     )
+    if num_rows == 0:
+        return cat
 
-    # Process each spectral type in the catalog
-    for j in range(num_rows):
-        sptype = cat[sptypestring][j]
-
+    # Each distinct spectral type is looked up only once
+    sptypes, inverse = np.unique(
+        np.asarray(np.ma.getdata(cat[sptypestring]), dtype=str),
+        return_inverse=True,
+    )
+    cleaned = []
+    matched = []
+    for sptype in sptypes.tolist():
         # Handle empty spectral types
         if sptype == "":
-            cat[sptypestring][j] = "None"
+            cleaned.append("None")
+            matched.append(None)
             continue
-
         # Remove old 'd' notation (dwarf = main sequence star)
         sptype = sptype.strip("d")
-        cat[sptypestring][j] = sptype
-
-        # Try to match spectral type with model
-        matched = _match_spectral_type_to_model(sptype, model_param)
-
-        if matched:
-            cat[teffstring][j] = matched["Teff"]
-            cat[rstring][j] = matched["Radius"]
-            cat[mstring][j] = matched["Mass"]
-
+        cleaned.append(sptype)
+        matched.append(_match_spectral_type_to_model(sptype, model_index))
+
+    cat[sptypestring][:] = np.array(cleaned, dtype=object)[inverse]
+    has_match = np.array([values is not None for values in matched])[inverse]
+    values = np.array(
+        [values or (np.nan, np.nan, np.nan) for values in matched]
+    )[inverse]
+    cat[teffstring][has_match] = values[has_match, 0]
+    cat[rstring][has_match] = values[has_match, 1]
+    cat[mstring][has_match] = values[has_match, 2]
     return cat
 
 
-def _match_spectral_type_to_model(sptype, model_param):
+def _match_spectral_type_to_model(sptype, model_index):
     """
     Helper function to match a spectral type string to Mamajek's model.
 
     :param str sptype: Spectral type string (e.g., 'G2V', 'K5.5V')
-    :param model_param: Model parameter table from Mamajek
-    :returns: Dictionary with matched parameters or None if no match found
-    :rtype: dict or None
-    """
-    # First try exact match on first 3 characters (e.g., 'G2V')
-    for i in range(len(model_param["SpT"])):
-        if model_param["SpT"][i][:3] == sptype[:3]:
-            return {
-                "Teff": model_param["Teff"][i],
-                "Radius": model_param["Radius"][i],
-                "Mass": model_param["Mass"][i],
-            }
-
-    # For half-subtypes (e.g., 'K5.5V'), try matching first 4 characters
-    # The model doesn't cover all spectral types with .5 accuracy
-    if len(sptype) >= 4 and sptype[2:4] == ".5":
-        for i in range(len(model_param["SpT"])):
-            if model_param["SpT"][i][:4] == sptype[:4]:
-                return {
-                    "Teff": model_param["Teff"][i],
-                    "Radius": model_param["Radius"][i],
-                    "Mass": model_param["Mass"][i],
-                }
-
-        # If no .5 match found, fall back to the integer value (e.g., K2.5V -> K2V)
-        fallback_sptype = (
-            sptype[0] + sptype[1] + sptype[4:]
-        )  # e.g., 'K' + '2' + 'V'
-        for i in range(len(model_param["SpT"])):
-            if model_param["SpT"][i][:3] == fallback_sptype[:3]:
-                return {
-                    "Teff": model_param["Teff"][i],
-                    "Radius": model_param["Radius"][i],
-                    "Mass": model_param["Mass"][i],
-                }
-
-    # No match found
-    return None
+    :param model_index: Prefix dictionary of Mamajek's model table and the
+        characters that end a prefix, as returned by model_param_index
+    :type model_index: tuple(dict,set)
+    :returns: Modeled effective temperature, radius and mass or None if no
+        match found
+    :rtype: tuple(float,float,float) or None
+    """
+    index, suffixes = model_index
+    if sptype[2:4] != ".5":
+        # First 3 characters (e.g., 'G2V')
+        key = sptype[:3]
+    elif sptype[4:5] in suffixes:
+        # Half-subtypes (e.g., 'K5.5V') with their integer fallback
+        key = sptype[:5]
+    else:
+        key = sptype[:4]
+    return index.get(key)
 
 
 def spec(cat):
@@ -372,6 +459,67 @@ def spec(cat):
     return cat
 
 
+def derive_astrometry(star_basic, ref, chunk_size=None):
+    """
+    Derives galactic coordinates and distances from SIMBAD astrometry.
+
+    The galactic coordinates are transformed from the icrs coordinates
+    using astropy, the distance and its error are derived from the
+    parallax. The coordinate transformation runs on chunks of chunk_size
+    rows to bound the memory needed for large samples.
+
+    :param star_basic: Table containing columns coo_ra, coo_dec,
+        plx_value and plx_err.
+    :type star_basic: astropy.table.table.Table
+    :param str ref: Reference of the derived parameters.
+    :param chunk_size: Number of rows transformed at once, defaults to
+        astrometry_settings['chunk_size'].
+    :type chunk_size: int or None
+    :returns: Table star_basic with added columns coo_gal_l, coo_gal_b,
+        coo_gal_err_angle, coo_gal_err_maj, coo_gal_err_min, coo_gal_ref,
+        dist_st_value, dist_st_err and dist_st_ref.
+    :rtype: astropy.table.table.Table
+    """
+    if chunk_size is None:
+        chunk_size = astrometry_settings["chunk_size"]
+    num_rows = len(star_basic)
+
+    # galactic coordinates: transformed from simbad icrs coordinates
+    gal_l = np.empty(num_rows)
+    gal_b = np.empty(num_rows)
+    for start in range(0, num_rows, chunk_size):
+        chunk = slice(start, start + chunk_size)
+        gal_coord = coordinates.SkyCoord(
+            ra=star_basic["coo_ra"][chunk],
+            dec=star_basic["coo_dec"][chunk],
+            frame="icrs",
+        ).galactic
+        gal_l[chunk] = gal_coord.l.deg
+        gal_b[chunk] = gal_coord.b.deg
+    star_basic["coo_gal_l"] = gal_l * units.degree
+    star_basic["coo_gal_b"] = gal_b * units.degree
+    # can I do the same transformation with the errors? -> try on some
+    # examples and compare to simbad ones
+    for colname in ["coo_gal_err_angle", "coo_gal_err_maj", "coo_gal_err_min"]:
+        star_basic[colname] = np.full(num_rows, -1)
+    # for all entries since coo_gal column not masked column
+    star_basic["coo_gal_ref"] = np.full(num_rows, ref)
+
+    # distance and error propagated from the parallax in mas
+    plx_value = star_basic["plx_value"]
+    star_basic["dist_st_value"] = np.round(1000.0 / plx_value, 2)
+    star_basic["dist_st_err"] = np.round(
+        1000.0 * star_basic["plx_err"] / plx_value**2, 2
+    )
+    # null value treatment: plx_value has masked entries therefore
+    # distance values too
+    star_basic["dist_st_ref"] = MaskedColumn(
+        np.full(num_rows, ref, dtype=object),
+        mask=np.ma.getmaskarray(star_basic["dist_st_value"]),
+    )
+    return star_basic
+
+
 def create_star_basic_table():
     """
     Creates basic stellar data table.
@@ -385,60 +533,12 @@ def create_star_basic_table():
         "LIFE", "www.life-space-mission.com", "2022A&A...664A..21Q"
     )
 
-    # galactic coordinates:  transformed from simbad ircs coordinates using astropy
     [life_star_basic] = load(["sim_star_basic"])
-    ircs_coord = coordinates.SkyCoord(
-        ra=life_star_basic["coo_ra"],
-        dec=life_star_basic["coo_dec"],
-        frame="icrs",
-    )
-    gal_coord = ircs_coord.galactic
-    life_star_basic["coo_gal_l"] = gal_coord.l.deg * units.degree
-    life_star_basic["coo_gal_b"] = gal_coord.b.deg * units.degree
-    life_star_basic["dist_st_value"] = 1000.0 / life_star_basic["plx_value"]
-    life_star_basic["dist_st_value"] = np.round(
-        life_star_basic["dist_st_value"], 2
-    )
-    # null value treatment: plx_value has masked entries therefore distance_values too
-    # ref:
-    life_star_basic["dist_st_ref"] = MaskedColumn(
-        dtype=object,
-        length=len(life_star_basic),
-        mask=[True for j in range(len(life_star_basic))],
+    life_star_basic = derive_astrometry(
+        life_star_basic, life["provider"]["provider_name"][0]
     )
-    life_star_basic["dist_st_ref"][
-        np.where(life_star_basic["dist_st_value"].mask == False)
-    ] = [
-        life["provider"]["provider_name"][0]
-        for j in range(
-            len(
-                life_star_basic["dist_st_ref"][
-                    np.where(life_star_basic["dist_st_value"].mask == False)
-                ]
-            )
-        )
-    ]
-    # can I do the same transformation with the errors? -> try on some examples and compare to simbad ones
-    life_star_basic["coo_gal_err_angle"] = [
-        -1 for j in range(len(life_star_basic))
-    ]
-    life_star_basic["coo_gal_err_maj"] = [
-        -1 for j in range(len(life_star_basic))
-    ]
-    life_star_basic["coo_gal_err_min"] = [
-        -1 for j in range(len(life_star_basic))
-    ]
     life_star_basic = assign_quality(life_star_basic, "coo_gal_qual")
     life_star_basic["main_id"] = life_star_basic["main_id"].astype(str)
-    # source
-    # transformed from simbad ircs coordinates using astropy
-    life_star_basic["coo_gal_ref"] = Column(
-        dtype=object, length=len(life_star_basic)
-    )
-    life_star_basic["coo_gal_ref"] = life["provider"]["provider_name"][0]
-    # for all entries since coo_gal column not masked column
-
-    life_star_basic["coo_gal_ref"] = life_star_basic["coo_gal_ref"].astype(str)
     life_star_basic = life_star_basic[
         "main_id",
         "coo_gal_l",
@@ -449,6 +549,7 @@ def create_star_basic_table():
         "coo_gal_qual",
         "coo_gal_ref",
         "dist_st_value",
+        "dist_st_err",
         "dist_st_ref",
         "sptype_string",
     ]
@@ -642,8 +743,10 @@ def provider_life():
 
     # triple_star_handling()
 
+    life = intern_tables(life)
     save(
         list(life.values()),
         ["life_" + element for element in list(life.keys())],
+        fmt="npy",
     )
     return life
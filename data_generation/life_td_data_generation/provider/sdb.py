@@ -9,6 +9,7 @@ from provider.utils import (
     create_provider_table,
     create_sources_table,
     fetch_main_id,
+    intern_tables,
     replace_value,
 )
 from sdata import empty_dict
@@ -200,5 +201,10 @@ def provider_sdb(distance_cut_in_pc, data):
     sdb["sources"] = create_sdb_sources_table(sdb_helptab, sdb)
     sdb["disk_basic"] = create_disk_basic_table(sdb_helptab)
 
-    save(list(sdb.values()), ["sdb_" + element for element in list(sdb.keys())])
+    sdb = intern_tables(sdb)
+    save(
+        list(sdb.values()),
+        ["sdb_" + element for element in list(sdb.keys())],
+        fmt="npy",
+    )
     return sdb
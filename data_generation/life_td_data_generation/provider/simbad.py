@@ -5,13 +5,22 @@ Generates the data for the database for each of the data providers separately.
 from collections.abc import Sequence
 
 import numpy as np  # arrays
-from astropy.table import MaskedColumn, Table, join, setdiff, unique, vstack
+from astropy.table import (
+    Column,
+    MaskedColumn,
+    Table,
+    join,
+    setdiff,
+    unique,
+    vstack,
+)
 from provider.assign_quality_funcs import assign_quality
 from provider.utils import (
     OidCreator,
     create_provider_table,
     create_sources_table,
     fetch_main_id,
+    intern_tables,
     nullvalues,
     query,
     replace_value,
@@ -39,18 +48,60 @@ adql_queries_moduls = {
                     LEFT JOIN allfluxes AS f ON b.oid=f.oidref
 
     """,
+    # Narrow variants used with server side filtering: one row per object
+    # and the parent links in a separate query.
+    "objects_select_statement": """SELECT b.main_id,b.ra AS coo_ra,
+        b.dec AS coo_dec, b.coo_err_angle, b.coo_err_maj, b.coo_err_min,
+        b.oid, b.coo_bibcode AS coo_ref, b.coo_qual,
+        b.sp_type AS sptype_string, b.sp_qual AS sptype_qual,
+        b.sp_bibcode AS sptype_ref, b.plx_err, b.plx_value,
+        b.plx_bibcode AS plx_ref,b.plx_qual, a.otypes,ids.ids,
+        f.I as mag_i_value, f.J as mag_j_value, f.K as mag_k_value,
+        f.U as mag_u_value
+        """,
+    "objects_tables_statement": """
+    FROM basic AS b
+        JOIN ids ON b.oid=ids.oidref
+            JOIN alltypes AS a ON b.oid=a.oidref
+                LEFT JOIN allfluxes AS f ON b.oid=f.oidref
+
+    """,
+    "h_link_select_statement": """SELECT h_link.child AS oid,
+        h_link.membership, h_link.parent AS parent_oid,
+        h_link.link_bibcode AS h_link_ref
+        """,
+    # Same selection as classify_object_types: planets, stars and systems.
+    "otype_filter": "(a.otypes LIKE '%Pl%' OR a.otypes LIKE '%*%')",
 }
 
+# With server_side the object types are filtered in the ADQL and the parent
+# links are queried separately, so that the objects are downloaded once
+# instead of once per parent. Only the download shrinks, attach_h_links
+# expands the objects to one row per parent again on the client.
+query_settings = {"server_side": False}
+
 
-def main_adql_queries(plx_cut: float) -> str:
+def main_adql_queries(plx_cut: float, server_side: bool = False) -> str:
     """
     Build the main ADQL query for SIMBAD with a parallax cut.
 
     :param plx_cut: Minimum parallax in milliarcseconds to include.
     :type plx_cut: float
+    :param server_side: Whether to only select planets, stars and systems,
+        one row per object and without the parent link columns.
+    :type server_side: bool
     :returns: Complete ADQL string for the TAP service.
     :rtype: str
     """
+    if server_side:
+        return (
+            adql_queries_moduls["objects_select_statement"]
+            + adql_queries_moduls["objects_tables_statement"]
+            + "WHERE b.plx_value >="
+            + str(plx_cut)
+            + " AND "
+            + adql_queries_moduls["otype_filter"]
+        )
     return (
         adql_queries_moduls["select_statement"]
         + adql_queries_moduls["tables_statement"]
@@ -59,6 +110,31 @@ def main_adql_queries(plx_cut: float) -> str:
     )
 
 
+def h_link_adql_query(plx_cut: float) -> str:
+    """
+    Build the ADQL query for the parent links of the main query objects.
+
+    The links of all children within the parallax cut are selected, not
+    only of those passing the object type filter of the main query. As
+    with the LEFT JOIN in the main query of the default mode, parents
+    reached only through a child that is removed later are still queried
+    as systems without parallax.
+
+    :param plx_cut: Minimum parallax in milliarcseconds of the children.
+    :type plx_cut: float
+    :returns: Complete ADQL string for the TAP service.
+    :rtype: str
+    """
+    return (
+        adql_queries_moduls["h_link_select_statement"]
+        + """
+    FROM h_link
+        JOIN basic AS b ON b.oid=h_link.child
+    WHERE b.plx_value >="""
+        + str(plx_cut)
+    )
+
+
 adql_upload_queries = {
     "sy_without_plx_but_child_with_upload": adql_queries_moduls[
         "select_statement"
@@ -75,9 +151,151 @@ adql_upload_queries = {
     "ids_from_upload": """SELECT id, t1.*
                           FROM ident
                           JOIN TAP_UPLOAD.t1 ON oidref = t1.oid""",
+    "sy_without_plx_but_child_objects_upload": adql_queries_moduls[
+        "objects_select_statement"
+    ]
+    + adql_queries_moduls["objects_tables_statement"]
+    + """JOIN TAP_UPLOAD.t1 ON b.oid=t1.parent_oid
+            WHERE (b.plx_value IS NULL) AND (otype='**..')""",
+    "pl_without_plx_but_host_objects_upload": adql_queries_moduls[
+        "objects_select_statement"
+    ]
+    + adql_queries_moduls["objects_tables_statement"]
+    + """JOIN TAP_UPLOAD.t1 ON b.oid=t1.oid
+            WHERE (b.plx_value IS NULL) AND (otype='Pl..')""",
+    "h_link_from_upload": adql_queries_moduls["h_link_select_statement"]
+    + """FROM h_link
+            JOIN TAP_UPLOAD.t1 ON h_link.child=t1.oid""",
 }
 
 
+def attach_h_links(cat: Table, h_links: Table) -> Table:
+    """
+    Add the parent link columns to a table of objects.
+
+    Gives the same rows as the LEFT JOIN with h_link in the main query:
+    one row per parent, and objects without parent with masked membership,
+    parent_oid and h_link_ref. The objects are thereby held once per
+    parent in memory, as in the default mode.
+
+    :param cat: Objects with oid column.
+    :type cat: astropy.table.Table
+    :param h_links: Parent links with oid, membership, parent_oid and
+        h_link_ref columns.
+    :type h_links: astropy.table.Table
+    :returns: Objects with parent link columns.
+    :rtype: astropy.table.Table
+    """
+    if len(cat) > 0 and len(h_links) > 0:
+        return join(cat, h_links, keys="oid", join_type="left")
+    cat = Table(cat, masked=True, copy=True)
+    for colname in ["membership", "parent_oid", "h_link_ref"]:
+        cat[colname] = MaskedColumn(
+            np.zeros(len(cat), dtype=h_links[colname].dtype),
+            mask=np.ones(len(cat), dtype=bool),
+        )
+    return cat
+
+
+def query_objects_and_h_links(
+    link: str, plx_cut: float
+) -> tuple[Table, Table, Table]:
+    """
+    Query the SIMBAD objects and their parent links separately.
+
+    Server side variant of the main and no parallax queries: only planets,
+    stars and systems are selected and each object is downloaded once.
+    The parent links are queried in a narrow query and joined afterwards.
+
+    :param link: Link to the SIMBAD TAP service.
+    :type link: str
+    :param plx_cut: Minimum parallax in milliarcseconds to include.
+    :type plx_cut: float
+    :returns: Objects within the parallax cut, parents and planets without
+        parallax, each with one row per parent link.
+    :rtype: tuple[astropy.table.Table, astropy.table.Table,
+        astropy.table.Table]
+    """
+    objects = query(link, main_adql_queries(plx_cut, server_side=True))
+    h_links = query(link, h_link_adql_query(plx_cut))
+
+    parent_oids = unique(h_links["parent_oid",])
+    parents = objects[:0].copy()
+    if len(parent_oids) > 0:
+        parents = query(
+            link,
+            adql_upload_queries["sy_without_plx_but_child_objects_upload"],
+            [parent_oids],
+        )
+    children = objects[:0].copy()
+    if len(objects) > 0:
+        children = query(
+            link,
+            adql_upload_queries["pl_without_plx_but_host_objects_upload"],
+            [objects["oid",]],
+        )
+
+    # links of the objects without parallax
+    no_plx_oids = vstack([parents["oid",], children["oid",]])
+    if len(no_plx_oids) > 0:
+        h_links = vstack(
+            [
+                h_links,
+                query(
+                    link,
+                    adql_upload_queries["h_link_from_upload"],
+                    [unique(no_plx_oids)],
+                ),
+            ]
+        )
+    return (
+        attach_h_links(objects, h_links),
+        attach_h_links(parents, h_links),
+        attach_h_links(children, h_links),
+    )
+
+
+def classify_object_types(
+    otypes: Column,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, dict[str, int]]:
+    """
+    Sort SIMBAD object types into planets, systems and stars.
+
+    Objects with "Pl" in their otypes are planets, the others with "**"
+    systems and the others with "*" stars. Systems get the binary flag.
+    Everything else, e.g. most single brown dwarfs (though they have BD*
+    and get caught as stars), is to be removed.
+
+    :param otypes: Column of "|" separated SIMBAD object types.
+    :type otypes: astropy.table.Column
+    :returns: Object type ("pl", "sy", "st" or "None") and binary flag
+        ("True" or "False") per row, mask of the rows to keep and number
+        of removed rows per otypes value.
+    :rtype: tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray,
+        dict[str, int]]
+    """
+    otypes = np.asarray(np.ma.getdata(otypes)).astype(str)
+    planet = np.strings.find(otypes, "Pl") >= 0
+    star = ~planet & (np.strings.find(otypes, "*") >= 0)
+    system = star & (np.strings.find(otypes, "**") >= 0)
+
+    types = np.full(len(otypes), "None", dtype=object)
+    types[star] = "st"
+    types[system] = "sy"
+    types[planet] = "pl"
+    binary_flag = np.full(len(otypes), "False", dtype=object)
+    binary_flag[system] = "True"
+
+    keep = planet | star
+    removed, counts = np.unique(otypes[~keep], return_counts=True)
+    return (
+        types,
+        binary_flag,
+        keep,
+        dict(zip(removed.tolist(), counts.tolist())),
+    )
+
+
 def create_simbad_helpertable(
     distance_cut_in_pc: float,
     test_objects: Sequence[str] | None,
@@ -105,23 +323,30 @@ def create_simbad_helpertable(
     )
 
     # ------------------querrying----------------------------------------
-    # perform query for objects with in distance given
-    sim_helptab = query(
-        sim["provider"]["provider_url"][0], main_adql_queries(plx_cut)
-    )
+    if query_settings["server_side"]:
+        sim_helptab, parents_without_plx, children_without_plx = (
+            query_objects_and_h_links(
+                sim["provider"]["provider_url"][0], plx_cut
+            )
+        )
+    else:
+        # perform query for objects with in distance given
+        sim_helptab = query(
+            sim["provider"]["provider_url"][0], main_adql_queries(plx_cut)
+        )
+        # querries parent and children objects with no parallax value
+        parents_without_plx = query(
+            sim["provider"]["provider_url"][0],
+            adql_upload_queries["sy_without_plx_but_child_with_upload"],
+            [sim_helptab],
+        )
+        children_without_plx = query(
+            sim["provider"]["provider_url"][0],
+            adql_upload_queries["pl_without_plx_but_host_with_upload"],
+            [sim_helptab],
+        )
     save([sim_helptab], ["sim_helptab_query"])
-    # querries parent and children objects with no parallax value
-    parents_without_plx = query(
-        sim["provider"]["provider_url"][0],
-        adql_upload_queries["sy_without_plx_but_child_with_upload"],
-        [sim_helptab],
-    )
     save([parents_without_plx], ["parents_without_plx_query"])
-    children_without_plx = query(
-        sim["provider"]["provider_url"][0],
-        adql_upload_queries["pl_without_plx_but_host_with_upload"],
-        [sim_helptab],
-    )
     save([children_without_plx], ["children_without_plx_query"])
 
     test_objects = np.array(test_objects)
@@ -153,47 +378,24 @@ def create_simbad_helpertable(
     print(" sorting object types...")
 
     # sorting from object type into star, system and planet type
-    sim_helptab["type"] = ["None" for i in range(len(sim_helptab))]
-    sim_helptab["type"] = sim_helptab["type"].astype(object)
-    sim_helptab["binary_flag"] = np.array(
-        ["False" for i in range(len(sim_helptab))], dtype=object
+    types, binary_flag, keep, removed_otypes = classify_object_types(
+        sim_helptab["otypes"]
     )
-    to_remove_list = []
-    removed_otypes = []
-    for i in range(len(sim_helptab)):
-        # planets
-        if "Pl" in sim_helptab["otypes"][i]:
-            sim_helptab["type"][i] = "pl"
-        # stars
-        elif "*" in sim_helptab["otypes"][i]:
-            # system containing multiple stars
-            if "**" in sim_helptab["otypes"][i]:
-                sim_helptab["type"][i] = "sy"
-                sim_helptab["binary_flag"][i] = "True"
-            # individual stars
-            else:
-                sim_helptab["type"][i] = "st"
-        else:
-            removed_otypes.append(sim_helptab["otypes"][i])
-            # most likely single brown dwarfs
-            # -> wait, they have BD* and get caught above...
-            # so I am not as restrictive as I thought I am here.
-            # shouldn't matter as they shouldn't make it into the catalog
-            # because of the spectral type criteria
-            # storing information for later removal from table called simbad
-            to_remove_list.append(i)
+    sim_helptab["type"] = types
+    sim_helptab["binary_flag"] = binary_flag
     # removing any objects that are neither planet, star nor system in type
-    if to_remove_list != []:
+    if not keep.all():
         print(
             "removing",
-            len(removed_otypes),
+            sum(removed_otypes.values()),
             " objects that had object types:",
-            list(set(removed_otypes)),
+            list(removed_otypes),
         )
         print(
-            "example object of them:", sim_helptab["main_id"][to_remove_list[0]]
+            "example object of them:",
+            sim_helptab["main_id"][np.flatnonzero(~keep)[0]],
         )
-        sim_helptab.remove_rows(to_remove_list)
+        sim_helptab = sim_helptab[keep]
 
     if len(test_objects) > 0:
         print(
@@ -659,5 +861,10 @@ def provider_simbad(
         "main_id", "binary_flag", "binary_qual", "binary_ref"
     ]
 
-    save(list(sim.values()), ["sim_" + element for element in list(sim.keys())])
+    sim = intern_tables(sim)
+    save(
+        list(sim.values()),
+        ["sim_" + element for element in list(sim.keys())],
+        fmt="npy",
+    )
     return sim
@@ -2,6 +2,14 @@
 Generates the data for the database for each of the data providers separately.
 """
 
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 import numpy as np  # arrays
@@ -15,8 +23,53 @@ from astropy.table import (
     unique,
     vstack,
 )
-from pyvo.dal import DALServiceError, TAPService
-from utils.io import load
+from pyvo.dal import AsyncTAPJob, DALServiceError, TAPService
+from utils.io import Path, load, load_npy, save_npy
+
+# Maximum number of rows returned by a TAP query.
+maxrec = 1600000
+
+# On-disk cache of TAP query results used by query. Entries older than
+# ttl_in_days are fetched again, the least recently used entries are
+# removed once the cache exceeds max_size_in_mb. In offline mode only
+# cached results are returned, however old, and no service is contacted.
+# The cache is off by default so that a database build always gets the
+# current data of the services, enable it for development and CI runs.
+query_cache_settings = {
+    "enabled": False,
+    "location": Path().additional_data + "query_cache/",
+    "ttl_in_days": 7.0,
+    "max_size_in_mb": 2000.0,
+    "offline": False,
+}
+
+# Uploads of a single table with more than chunk_size rows are split by
+# query into chunks, queried with at most max_workers concurrent jobs.
+# A failing chunk is tried again up to retries times.
+upload_settings = {
+    "chunk_size": 50000,
+    "max_workers": 4,
+    "retries": 2,
+}
+
+# Asynchronous TAP jobs started by query. The urls of running jobs are
+# kept in jobs_file so that an interrupted build picks the jobs up again
+# instead of submitting them anew. Job phases are polled with intervals
+# growing by the backoff factor, and at most max_jobs_per_service queries
+# run against the same service at once.
+tap_job_settings = {
+    "jobs_file": Path().additional_data + "tap_jobs.json",
+    "max_jobs_per_service": 2,
+    "poll_interval_in_s": 1.0,
+    "max_poll_interval_in_s": 60.0,
+    "backoff": 1.5,
+}
+# Identifier columns holding the same strings in many rows and tables,
+# compacted by intern_strings together with the reference columns.
+identifier_columns = ["main_id", "parent_main_id", "id", "ids", "provider_name"]
+
+_service_semaphores = {}
+_tap_jobs_lock = threading.Lock()
 
 
 def sorting_number_of_id(input_column, occurences, match_column):
@@ -89,18 +142,343 @@ def create_provider_table(
     return provider_table
 
 
+def table_content_hash(cat: table.Table) -> str:
+    """
+    Compute a hash of the column names, types and values of a table.
+
+    :param cat: Table to hash.
+    :type cat: astropy.table.table.Table
+    :returns: Hexadecimal sha256 digest.
+    :rtype: str
+    """
+    sha = hashlib.sha256()
+    for colname in cat.colnames:
+        col = cat[colname]
+        sha.update(f"{colname}:{col.dtype.str}:".encode())
+        data = np.ma.getdata(col)
+        if col.dtype == object:
+            sha.update("\x00".join(str(value) for value in data).encode())
+        else:
+            sha.update(np.ascontiguousarray(data).tobytes())
+        sha.update(np.ascontiguousarray(np.ma.getmaskarray(col)).tobytes())
+    return sha.hexdigest()
+
+
+def query_cache_key(
+    link: str,
+    adql_query: str,
+    upload_tables: list[table.Table],
+    no_description: bool,
+) -> str:
+    """
+    Compute the cache key of a TAP query.
+
+    :param link: Service access URL.
+    :type link: str
+    :param adql_query: Query to execute (ADQL).
+    :type adql_query: str
+    :param upload_tables: Tables uploaded for join operations.
+    :type upload_tables: list[astropy.table.table.Table]
+    :param no_description: Whether column descriptions are removed.
+    :type no_description: bool
+    :returns: Hexadecimal sha256 digest.
+    :rtype: str
+    """
+    key = [
+        link,
+        adql_query,
+        [table_content_hash(t) for t in upload_tables],
+        maxrec,
+        no_description,
+    ]
+    return hashlib.sha256(json.dumps(key).encode()).hexdigest()
+
+
+def load_cached_query(key: str) -> table.Table | None:
+    """
+    Load a cached TAP query result.
+
+    :param key: Cache key from query_cache_key.
+    :type key: str
+    :returns: Cached result, None if there is no valid entry.
+    :rtype: astropy.table.table.Table or None
+    """
+    path = os.path.join(query_cache_settings["location"], key)
+    header_filename = os.path.join(path, "columns.json")
+    if not os.path.isfile(header_filename):
+        return None
+    age_in_days = (time.time() - os.path.getmtime(path)) / 86400.0
+    if (
+        age_in_days > query_cache_settings["ttl_in_days"]
+        and not query_cache_settings["offline"]
+    ):
+        return None
+    print("Using cached query result.")
+    cat = load_npy(path)
+    # keeping track of use for the eviction of least recently used entries
+    os.utime(header_filename)
+    return cat
+
+
+def store_cached_query(key: str, cat: table.Table) -> None:
+    """
+    Store a TAP query result in the cache and evict old entries.
+
+    The least recently used entries are removed until the cache is
+    smaller than max_size_in_mb again. Results that save_npy can not
+    store unchanged are not cached.
+
+    :param key: Cache key from query_cache_key.
+    :type key: str
+    :param cat: Query result.
+    :type cat: astropy.table.table.Table
+    """
+    location = query_cache_settings["location"]
+    path = os.path.join(location, key)
+    try:
+        save_npy(cat, path)
+    except TypeError as e:
+        # a cached result has to be identical to the queried one
+        print(f"Query result not cached: {e}")
+        shutil.rmtree(path, ignore_errors=True)
+        return
+    os.utime(path)
+
+    entries = []
+    for entry in os.listdir(location):
+        entry_path = os.path.join(location, entry)
+        header_filename = os.path.join(entry_path, "columns.json")
+        if not os.path.isfile(header_filename):
+            continue
+        size = sum(
+            os.path.getsize(os.path.join(entry_path, filename))
+            for filename in os.listdir(entry_path)
+        )
+        entries.append((os.path.getmtime(header_filename), size, entry_path))
+    total_size = sum(size for _, size, _ in entries)
+    max_size = query_cache_settings["max_size_in_mb"] * 1e6
+    for _, size, entry_path in sorted(entries):
+        if total_size <= max_size or entry_path == path:
+            break
+        shutil.rmtree(entry_path)
+        total_size -= size
+    return
+
+
+def service_semaphore(link: str) -> threading.BoundedSemaphore:
+    """
+    Get the semaphore limiting the number of concurrent queries of a service.
+
+    :param link: Service access URL.
+    :type link: str
+    :returns: Semaphore shared by all queries of the service.
+    :rtype: threading.BoundedSemaphore
+    """
+    with _tap_jobs_lock:
+        if link not in _service_semaphores:
+            _service_semaphores[link] = threading.BoundedSemaphore(
+                tap_job_settings["max_jobs_per_service"]
+            )
+        return _service_semaphores[link]
+
+
+def update_tap_jobs(key: str, url: str | None = None) -> str | None:
+    """
+    Record, forget or look up the url of a running TAP job.
+
+    :param key: Cache key of the query from query_cache_key.
+    :type key: str
+    :param url: Job url to record. If None, the job is forgotten.
+    :type url: str or None
+    :returns: Previously recorded url of the job, None if there is none.
+    :rtype: str or None
+    """
+    filename = tap_job_settings["jobs_file"]
+    with _tap_jobs_lock:
+        jobs = {}
+        if os.path.isfile(filename):
+            with open(filename) as f:
+                jobs = json.load(f)
+        previous_url = jobs.pop(key, None)
+        if url is not None:
+            jobs[key] = url
+        if url != previous_url:
+            os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+            with open(filename + ".tmp", "w") as f:
+                json.dump(jobs, f, indent=2)
+            os.replace(filename + ".tmp", filename)
+    return previous_url
+
+
+def resume_tap_job(key: str) -> AsyncTAPJob | None:
+    """
+    Reconnect to a job recorded by a previous, interrupted query.
+
+    :param key: Cache key of the query from query_cache_key.
+    :type key: str
+    :returns: The job, None if there is none or it can not be used.
+    :rtype: pyvo.dal.AsyncTAPJob or None
+    """
+    url = update_tap_jobs(key)
+    if url is None:
+        return None
+    try:
+        job = AsyncTAPJob(url, delete=False)
+        if job.phase in ["ERROR", "ABORTED", "ARCHIVED"]:
+            return None
+    except Exception as e:
+        print(f"Could not resume TAP job {url}: {e}")
+        return None
+    print(f"Resuming TAP job {url}")
+    update_tap_jobs(key, url)
+    return job
+
+
+def run_tap_job(
+    service: TAPService,
+    adql_query: str,
+    key: str,
+    uploads: dict[str, table.Table] | None = None,
+) -> object:
+    """
+    Run an asynchronous TAP job, resuming a recorded one if possible.
+
+    The job phase is polled with growing intervals until the job is done.
+    The job url is recorded until the result is fetched.
+
+    :param service: Service to query.
+    :type service: pyvo.dal.TAPService
+    :param adql_query: Query to execute (ADQL).
+    :type adql_query: str
+    :param key: Cache key of the query from query_cache_key.
+    :type key: str
+    :param uploads: Tables to upload, by TAP_UPLOAD name.
+    :type uploads: dict[str, astropy.table.table.Table]
+    :returns: Result of the job.
+    :rtype: pyvo.dal.TAPResults
+    """
+    job = resume_tap_job(key)
+    if job is None:
+        job = service.submit_job(adql_query, maxrec=maxrec, uploads=uploads)
+        job.run()
+        update_tap_jobs(key, job.url)
+
+    interval = tap_job_settings["poll_interval_in_s"]
+    while job.phase not in ["COMPLETED", "ERROR", "ABORTED"]:
+        time.sleep(interval)
+        interval = min(
+            interval * tap_job_settings["backoff"],
+            tap_job_settings["max_poll_interval_in_s"],
+        )
+
+    try:
+        job.raise_if_error()
+        result = job.fetch_result()
+    finally:
+        update_tap_jobs(key)
+        try:
+            job.delete()
+        except DALServiceError:
+            pass
+    return result
+
+
+def query_chunk(
+    link: str,
+    adql_query: str,
+    chunk: table.Table,
+    no_description: bool = True,
+    sync: bool = False,
+) -> table.Table:
+    """
+    Perform a TAP query for one chunk of an upload table, with retries.
+
+    :param link: Service access URL.
+    :type link: str
+    :param adql_query: Query to execute (ADQL).
+    :type adql_query: str
+    :param chunk: Rows of the upload table.
+    :type chunk: astropy.table.table.Table
+    :returns: Result table returned by the TAP service.
+    :rtype: astropy.table.table.Table
+    :raises RuntimeError: If the last try fails.
+    """
+    retries = upload_settings["retries"]
+    if query_cache_settings["offline"]:
+        retries = 0
+    for attempt in range(retries + 1):
+        try:
+            return query(
+                link, adql_query, [chunk], no_description, sync, chunked=False
+            )
+        except RuntimeError as e:
+            if attempt == retries:
+                raise
+            print(f"Retrying chunk after failure: {e}")
+
+
+def query_in_chunks(
+    link: str,
+    adql_query: str,
+    upload_table: table.Table,
+    no_description: bool = True,
+    sync: bool = False,
+) -> table.Table:
+    """
+    Perform a TAP query with the upload table split into chunks.
+
+    Only valid for queries whose result rows each depend on a single
+    uploaded row, e.g. joins on TAP_UPLOAD.t1 without aggregation. The
+    chunks are queried concurrently and cached separately, so after a
+    failure only the missing chunks are fetched again.
+
+    :param link: Service access URL.
+    :type link: str
+    :param adql_query: Query to execute (ADQL).
+    :type adql_query: str
+    :param upload_table: Table uploaded as TAP_UPLOAD.t1.
+    :type upload_table: astropy.table.table.Table
+    :returns: Stacked result tables of all chunks.
+    :rtype: astropy.table.table.Table
+    """
+    chunk_size = upload_settings["chunk_size"]
+    chunks = [
+        upload_table[start : start + chunk_size]
+        for start in range(0, len(upload_table), chunk_size)
+    ]
+    print(f"Uploading {len(upload_table)} rows in {len(chunks)} chunks")
+    with ThreadPoolExecutor(
+        max_workers=upload_settings["max_workers"]
+    ) as executor:
+        results = list(
+            executor.map(
+                lambda chunk: query_chunk(
+                    link, adql_query, chunk, no_description, sync
+                ),
+                chunks,
+            )
+        )
+    return vstack(results, metadata_conflicts="silent")
+
+
 def query(
     link: str,
     adql_query: str,
     upload_tables: list[table.Table] | None = None,
     no_description=True,
     sync=False,
+    chunked=True,
 ) -> table.Table:
     """
     Perform a TAP query against a service.
 
     If upload tables are provided, they are made available to the service
-    as TAP_UPLOAD tables.
+    as TAP_UPLOAD tables. A single upload table larger than the chunk size
+    in upload_settings is uploaded in chunks, see query_in_chunks. Results
+    are cached on disk keyed by service, query, uploaded table content and
+    maxrec, see query_cache_settings. Asynchronous queries are run as
+    resumable jobs with a limit of concurrent jobs per service, see
+    tap_job_settings.
 
     :param link: Service access URL.
     :type link: str
@@ -108,31 +486,53 @@ def query(
     :type adql_query: str
     :param upload_tables: Optional tables to upload for join operations.
     :type upload_tables: list[astropy.table.table.Table]
+    :param chunked: If False, upload tables are never split.
+    :type chunked: bool
     :returns: Result table returned by the TAP service.
     :rtype: astropy.table.table.Table
     """
     if upload_tables is None:
         upload_tables = []
 
+    if (
+        chunked
+        and len(upload_tables) == 1
+        and len(upload_tables[0]) > upload_settings["chunk_size"]
+    ):
+        return query_in_chunks(
+            link, adql_query, upload_tables[0], no_description, sync
+        )
+
+    key = query_cache_key(link, adql_query, upload_tables, no_description)
+    if query_cache_settings["enabled"]:
+        cat = load_cached_query(key)
+        if cat is not None:
+            return cat
+        if query_cache_settings["offline"]:
+            raise RuntimeError(
+                f"TAP query failed: offline and no cached result for {link}"
+            )
+
+    tables = None
+    if upload_tables == []:
+        adql_query = adql_query.format(**locals())
+    else:
+        tables = {}
+        for i, t in enumerate(upload_tables, start=1):
+            tables[f"t{i}"] = t
+
     try:
         service = TAPService(link)
 
-        if sync:
-            print("Running synchronously")
-            run_query = service.run_sync
-        else:
-            print("Running asynchronously")
-            run_query = service.run_async
-
-        if upload_tables == []:
-            result = run_query(adql_query.format(**locals()), maxrec=1600000)
-        else:
-            tables = {}
-            for i, t in enumerate(upload_tables, start=1):
-                tables[f"t{i}"] = t
-            result = run_query(
-                adql_query, uploads=tables, timeout=None, maxrec=1600000
-            )
+        with service_semaphore(link):
+            if sync:
+                print("Running synchronously")
+                result = service.run_sync(
+                    adql_query, uploads=tables, maxrec=maxrec
+                )
+            else:
+                print("Running asynchronously")
+                result = run_tap_job(service, adql_query, key, tables)
 
         cat = result.to_table()
 
@@ -143,13 +543,16 @@ def query(
             cat.meta = {}
         # does not seem to work properly yet, getting warndings for exomercat/building
         print("Service is UP and running.")
-        return cat
 
     except DALServiceError as e:
         raise RuntimeError(f"Service is DOWN or unreachable: {e}") from e
     except Exception as e:
         raise RuntimeError(f"TAP query failed: {e}") from e
 
+    if query_cache_settings["enabled"]:
+        store_cached_query(key, cat)
+    return cat
+
 
 def remove_catalog_description(
     cat: table.Table, no_description: bool
@@ -318,7 +721,8 @@ def fetch_main_id(
 
     The id_creator decides whether to join via 'oid' (OidCreator) or
     via identifiers (IdentifierCreator). The returned table is the
-    uploaded table with an additional main_id-alias column.
+    uploaded table with an additional main_id-alias column. Large tables
+    are uploaded in chunks, see query_in_chunks.
 
     :param cat: Table containing the join column (as decided by id_creator).
     :type cat: astropy.table.table.Table
@@ -353,14 +757,14 @@ def distance_cut(
     :rtype: astropy.table.table.Table
     """
     if main_id:
-        [sim] = load(["sim_objects"])
+        [sim] = load(["sim_objects"], columns=["main_id", "ids"])
         sim.rename_columns(["main_id", "ids"], ["temp1", "temp2"])
         cat = join(
             cat, sim["temp1", "temp2"], keys_left=colname, keys_right="temp1"
         )
         cat.remove_columns(["temp1", "temp2"])
     else:
-        [sim] = load(["sim_ident"])
+        [sim] = load(["sim_ident"], columns=["id", "main_id"])
         sim.rename_columns(["id"], ["temp1"])
         cat = join(
             cat, sim["temp1", "main_id"], keys_left=colname, keys_right="temp1"
@@ -416,6 +820,187 @@ def replace_value(
     return cat
 
 
+def replace_values(
+    cat: table.Table, colname: str, values: list, replace_by: object
+) -> table.Table:
+    """
+    Replace all occurrences of several values in a column with another value.
+
+    Finds all values with a single mask instead of one comparison per
+    value. Masked entries are left as they are.
+
+    :param cat: Table containing the column to modify.
+    :type cat: astropy.table.table.Table
+    :param colname: Target column name.
+    :type colname: str
+    :param values: Values to be replaced.
+    :type values: list
+    :param replace_by: Value to insert instead.
+    :type replace_by: object
+    :returns: Table with values replaced in the specified column.
+    :rtype: astropy.table.table.Table
+    """
+    col = cat[colname]
+    where = np.isin(np.ma.getdata(col), values) & ~np.ma.getmaskarray(col)
+    if where.any():
+        col[where] = replace_by
+    return cat
+
+
+def encode_strings(*columns: Column) -> tuple[np.ndarray, list[np.ndarray]]:
+    """
+    Dictionary-encode string columns on shared categories.
+
+    Equal strings get the same integer code across all given columns and
+    the codes follow the sort order of the strings, so comparisons, joins
+    and sorts can work on the codes instead of the strings. Masked and
+    None entries are no strings and get the code -1.
+
+    :param columns: Columns or arrays of strings.
+    :type columns: astropy.table.Column or numpy.ndarray
+    :returns: Sorted unique strings and one code array per column.
+    :rtype: tuple[numpy.ndarray, list[numpy.ndarray]]
+    """
+    values = np.concatenate(
+        [np.asarray(np.ma.getdata(col), dtype=object) for col in columns]
+    )
+    valid = np.concatenate(
+        [np.invert(np.ma.getmaskarray(col)) for col in columns]
+    )
+    valid &= values != None  # noqa: E711
+    codes = np.full(len(values), -1)
+    categories, codes[valid] = np.unique(values[valid], return_inverse=True)
+    splits = np.cumsum([len(col) for col in columns])[:-1]
+    return categories, np.split(codes, splits)
+
+
+def intern_strings(
+    cat: table.Table, colnames: list[str] | None = None
+) -> table.Table:
+    """
+    Let equal strings in object type columns share one string object.
+
+    Identifier and reference columns repeat the same strings in many rows,
+    e.g. one bibcode for all values of a provider, and the same main_id
+    shows up in the tables of all providers. After dictionary encoding
+    each distinct string is interned, so it is held only once in memory
+    over all tables. Missing and non object type columns as well as
+    masked and None entries are skipped.
+
+    :param cat: Table containing the columns to compact.
+    :type cat: astropy.table.table.Table
+    :param colnames: Names of the columns to compact. Defaults to None,
+        meaning the identifier_columns and the reference columns.
+    :type colnames: list[str] or None
+    :returns: The same table with compacted columns.
+    :rtype: astropy.table.table.Table
+    """
+    if colnames is None:
+        colnames = [
+            colname
+            for colname in cat.colnames
+            if colname in identifier_columns
+            or colname == "ref"
+            or colname.endswith("_ref")
+        ]
+    for colname in colnames:
+        if colname not in cat.colnames or cat[colname].dtype != object:
+            continue
+        categories, [codes] = encode_strings(cat[colname])
+        if len(categories) == 0:
+            continue
+        categories = np.array(
+            [sys.intern(category) for category in categories], dtype=object
+        )
+        data = np.ma.getdata(cat[colname])
+        data[codes >= 0] = categories[codes[codes >= 0]]
+    return cat
+
+
+def intern_tables(cat: dict[str, table.Table]) -> dict[str, table.Table]:
+    """
+    Interns the identifier and reference strings of all tables.
+
+    Used where the provider tables are created or loaded, see
+    intern_strings.
+
+    :param cat: Dictionary of table names and tables.
+    :type cat: dict[str, astropy.table.table.Table]
+    :returns: The same dictionary with compacted tables.
+    :rtype: dict[str, astropy.table.table.Table]
+    """
+    for table_name in cat:
+        cat[table_name] = intern_strings(cat[table_name])
+    return cat
+
+
+def join_on_codes(
+    cat: table.Table,
+    other: table.Table,
+    key_left: str,
+    key_right: str,
+    colname: str,
+) -> table.Table:
+    """
+    Left join one column of another table on a string key column.
+
+    Gives the same result as astropy.table.join with join_type 'left'
+    followed by removing the right key column, i.e. rows sorted by the
+    key and missing matches masked. Rows with equal keys keep their
+    original order, which join leaves unspecified. The keys are compared
+    as integer codes from encode_strings instead of as strings. Masked
+    and None keys get the code -1, so they never match and their rows
+    are sorted first. Falls back to join if the right key column contains
+    duplicates.
+
+    :param cat: Left table.
+    :type cat: astropy.table.table.Table
+    :param other: Right table containing key_right and colname.
+    :type other: astropy.table.table.Table
+    :param key_left: Key column name in cat.
+    :type key_left: str
+    :param key_right: Key column name in other.
+    :type key_right: str
+    :param colname: Column of other to add to cat.
+    :type colname: str
+    :returns: Joined table.
+    :rtype: astropy.table.table.Table
+    """
+    categories, [left_codes, right_codes] = encode_strings(
+        cat[key_left], other[key_right]
+    )
+    right_valid = right_codes >= 0
+    right_codes = right_codes[right_valid]
+    if len(np.unique(right_codes)) != len(right_codes):
+        joined = join(
+            cat,
+            other[key_right, colname],
+            keys_left=key_left,
+            keys_right=key_right,
+            join_type="left",
+        )
+        if key_right != key_left:
+            joined.remove_column(key_right)
+        return joined
+
+    cat = cat[np.argsort(left_codes, kind="stable")]
+    left_codes = np.sort(left_codes, kind="stable")
+
+    # right table position of each left row, -1 if there is none
+    lookup = np.full(len(categories), -1)
+    lookup[right_codes] = np.flatnonzero(right_valid)
+    index = np.full(len(left_codes), -1)
+    index[left_codes >= 0] = lookup[left_codes[left_codes >= 0]]
+    missing = index == -1
+    values = np.zeros(len(index), dtype=other[colname].dtype)
+    values[~missing] = np.asarray(other[colname])[index[~missing]]
+    if missing.any():
+        cat[colname] = MaskedColumn(values, mask=missing)
+    else:
+        cat[colname] = Column(values)
+    return cat
+
+
 def ids_from_ident(ident: table.Table, objects: table.Table) -> table.Table:
     """
     Concatenate identifier entries of the same object into one 'ids' string.
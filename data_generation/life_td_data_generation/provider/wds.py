@@ -13,6 +13,7 @@ from provider.utils import (
     create_sources_table,
     distance_cut,
     ids_from_ident,
+    intern_tables,
     query,
 )
 from sdata import empty_dict
@@ -196,7 +197,7 @@ def create_wds_helptab(
     wds_helptab = vstack([wds_system_cut, wds_primary_cut])
     wds_helptab = vstack([wds_helptab, wds_secondary_cut])
     look_at_test_objects_after_wds_creation(test_objects, wds_helptab)
-    save([wds_helptab], ["wds_helptab"])
+    save([wds_helptab], ["wds_helptab"], fmt="npy")
     return wds_helptab
 
 
@@ -619,5 +620,10 @@ def provider_wds(
     )
     wds["sources"] = create_wds_sources_table(wds)
 
-    save(list(wds.values()), ["wds_" + element for element in list(wds.keys())])
+    wds = intern_tables(wds)
+    save(
+        list(wds.values()),
+        ["wds_" + element for element in list(wds.keys())],
+        fmt="npy",
+    )
     return wds
@@ -0,0 +1,76 @@
+import numpy as np
+from benchmarks.synthetic import (
+    provider_columns,
+    provider_layout,
+    providers_without_errors,
+    synthetic_measurements,
+    synthetic_provider_tables,
+)
+from building import build_tables
+from sdata import empty_dict_wit_columns
+
+
+def test_provider_columns():
+    columns = dict(provider_columns("mes_teff_st"))
+    assert "main_id" in columns
+    assert "object_idref" not in columns
+    assert "teff_st_source_idref" not in columns
+    assert columns["teff_st_value"].kind == "f"
+
+    columns = dict(provider_columns("star_basic", ["coo"]))
+    assert "coo_ra" in columns
+    assert "coo_gal_l" not in columns
+    assert "plx_value" not in columns
+
+
+def test_synthetic_provider_tables():
+    prov_tables_dict = synthetic_provider_tables(300)
+
+    assert list(prov_tables_dict) == list(provider_layout)
+    for prov_name, (provider_name, table_names) in provider_layout.items():
+        prov = prov_tables_dict[prov_name]
+        assert prov["provider"]["provider_name"][0] == provider_name
+        assert set(prov["sources"]["provider_name"]) == {provider_name}
+        for table_name in table_names:
+            if table_name in ["objects", "ident", "h_link"]:
+                continue
+            paras = None
+            if table_name == "star_basic":
+                paras = [
+                    colname[: -len("_ref")]
+                    for colname in prov[table_name].colnames
+                    if colname.endswith("_ref")
+                ]
+            colnames = [
+                colname for colname, _ in provider_columns(table_name, paras)
+            ]
+            if prov_name in providers_without_errors and table_name.startswith(
+                "mes_"
+            ):
+                colnames = [
+                    colname for colname in colnames if "_err" not in colname
+                ]
+            assert prov[table_name].colnames == colnames
+
+    # the measurement tables of the providers differ in their columns
+    assert "teff_st_err" in prov_tables_dict["gaia"]["mes_teff_st"].colnames
+    assert "teff_st_err" not in prov_tables_dict["life"]["mes_teff_st"].colnames
+    # and have missing errors and references
+    mes_table = prov_tables_dict["gaia"]["mes_teff_st"]
+    assert mes_table["teff_st_err"].mask.any()
+    assert mes_table["teff_st_ref"].mask.any()
+
+    # the synthetic data goes through the whole building
+    cat = build_tables(prov_tables_dict)
+    assert len(cat["objects"]) == 300
+    for table_name in empty_dict_wit_columns:
+        assert len(cat[table_name]) > 0
+
+
+def test_synthetic_measurements_masked():
+    mes_table = synthetic_measurements(1000)
+
+    for colname in ["teff_st_err", "teff_st_source_idref"]:
+        mask = np.ma.getmaskarray(mes_table[colname])
+        assert 0 < mask.sum() < len(mes_table)
+    assert not mes_table.mask["teff_st_value"].any()
@@ -1,13 +1,33 @@
+import copy
+
 import numpy as np  # arrays
-from astropy.table import MaskedColumn, Table, setdiff
+from astropy.table import Column, MaskedColumn, Table, join, setdiff
+from benchmarks.reference import (
+    assign_source_idref_join,
+    best_para_id_loop,
+    best_para_loop,
+    best_para_membership_loop,
+    objectmerging_loop,
+    provider_data_merging_loop,
+)
+from benchmarks.synthetic import (
+    synthetic_measurements,
+    synthetic_objects,
+    synthetic_provider_tables,
+)
 from building import (
+    ObjectIndex,
     assign_source_idref,
-    assign_type,
     best_para,
     best_para_id,
     best_para_membership,
+    build_source_index,
+    build_sources_table,
     idsjoin,
+    merge_provider_tables,
+    objectmerging,
     provider_data_merging,
+    unify_null_values,
 )
 from sdata import empty_dict
 
@@ -115,6 +135,29 @@ def test_idsjoin_large_table():
         assert f"ID{i + 1}" in id_val
 
 
+def _provider_table():
+    return Table(
+        {
+            "provider_name": [
+                "Exo-MerCat",
+                "Gaia",
+                "Grant Kennedy Disks",
+                "LIFE",
+                "SIMBAD",
+                "WDS",
+            ],
+            "provider_bibcode": [
+                "2020A&C....3100370A",
+                "2016A&A...595A...1G",
+                "priv. comm.",
+                "2022A&A...664A..21Q",
+                "2000A&AS..143....9W",
+                "2001AJ....122.3466M",
+            ],
+        }
+    )
+
+
 def test_best_para_id():
     mes_table = Table(
         data=[
@@ -143,7 +186,7 @@ def test_best_para_id():
         names=["object_idref", "id", "id_ref"],
         dtype=[int, object, object],
     )
-    best_para_table = best_para_id(mes_table)
+    best_para_table = best_para_id(mes_table, _provider_table())
 
     # non provider reverences don't get included
     assert "irgendein_id_obj1" not in best_para_table["id"]
@@ -182,10 +225,66 @@ def test_best_para_of_id():
         names=["object_idref", "id", "id_ref"],
         dtype=[int, object, object],
     )
-    best_para_table = best_para("id", mes_table)
+    best_para_table = best_para("id", mes_table, _provider_table())
     assert type(best_para_table) == type(Table())
 
 
+def test_best_para_id_priority_order():
+    mes_table = Table(
+        data=[
+            [5, 1, 2, 3, 2, 4, 1, 6],
+            ["wds1", "a", "b", "c", "b", "wds1", "a", "d"],
+            [
+                "2001AJ....122.3466M",
+                "2016A&A...595A...1G",
+                "2022A&A...664A..21Q",
+                "2016A&A...595A...1G",
+                "2016A&A...595A...1G",
+                "2001AJ....122.3466M",
+                "2000A&AS..143....9W",
+                "1925AnHar.100...17C",
+            ],
+        ],
+        names=["object_idref", "id", "id_ref"],
+        dtype=[int, object, object],
+    )
+
+    best_para_table = best_para_id(mes_table, _provider_table())
+
+    # same result as the previous per reference vstack: rows ordered by
+    # reference priority, all rows of the best reference of an id kept
+    assert best_para_table.colnames == ["object_idref", "id"]
+    assert list(best_para_table["id"]) == ["a", "b", "c", "wds1", "wds1"]
+    assert list(best_para_table["object_idref"]) == [1, 2, 3, 5, 4]
+
+
+def test_best_para_id_equals_loop():
+    rng = np.random.default_rng(0)
+    refs = list(_provider_table()["provider_bibcode"]) + ["1925AnHar.100...17C"]
+    for n_rows in [1, 10, 300, 3000]:
+        mes_table = Table(
+            data=[
+                rng.integers(0, n_rows, n_rows),
+                np.array(
+                    [
+                        f"id {i}"
+                        for i in rng.integers(0, n_rows // 3 + 1, n_rows)
+                    ],
+                    dtype=object,
+                ),
+                np.array(rng.choice(refs, n_rows), dtype=object),
+            ],
+            names=["object_idref", "id", "id_ref"],
+        )
+
+        result = best_para_id(mes_table.copy(), _provider_table())
+        expected = best_para_id_loop(mes_table.copy())
+
+        assert result.colnames == expected.colnames
+        for colname in expected.colnames:
+            assert result[colname].tolist() == expected[colname].tolist()
+
+
 def test_best_para_membership():
     mes_table = Table(
         data=[
@@ -205,6 +304,58 @@ def test_best_para_membership():
     assert len(setdiff(wanted_table, mes_table)) == 0
 
 
+def test_best_para_membership_order_and_ties():
+    mes_table = Table(
+        data=[
+            [3, 1, 3, 1, 1, 2],
+            [4, 2, 4, 2, 2, 1],
+            [999999, 50, 20, 80, 80, 999999],
+            ["a", "b", "c", "d", "e", "f"],
+        ],
+        names=[
+            "child_object_idref",
+            "parent_object_idref",
+            "membership",
+            "membership_ref",
+        ],
+    )
+
+    result = best_para("membership", mes_table)
+
+    # sorted by child and parent, first of the maximal memberships
+    assert list(result["child_object_idref"]) == [1, 2, 3]
+    assert list(result["membership"]) == [80, 999999, 20]
+    assert list(result["membership_ref"]) == ["d", "f", "c"]
+
+
+def test_best_para_membership_equals_loop():
+    rng = np.random.default_rng(0)
+    for n_rows in [1, 30, 600]:
+        # few distinct values, so that there are ties and groups without
+        # any membership value
+        mes_table = Table(
+            data=[
+                rng.integers(0, n_rows // 4 + 1, n_rows),
+                rng.integers(0, 3, n_rows),
+                rng.choice([20, 50, 100, 999999], n_rows),
+                np.arange(n_rows),
+            ],
+            names=[
+                "child_object_idref",
+                "parent_object_idref",
+                "membership",
+                "membership_source_idref",
+            ],
+        )
+
+        result = best_para_membership(mes_table.copy())
+        expected = best_para_membership_loop(mes_table.copy())
+
+        assert result.colnames == expected.colnames
+        for colname in expected.colnames:
+            assert result[colname].tolist() == expected[colname].tolist()
+
+
 def test_best_para():
     """
     Test the best_para function with different parameter types and edge cases.
@@ -301,34 +452,111 @@ def test_best_para():
     assert star1_qual == "A"
 
 
-def test_assign_type_with_masked_constant():
-    # Create a mock Table
+def test_best_para_equals_loop():
+    for seed, n_rows in enumerate([1, 30, 600]):
+        mes_table = synthetic_measurements(n_rows, seed=seed)
+        # masked and invalid quality flags are never selected
+        rng = np.random.default_rng(seed)
+        qual = np.array(mes_table["teff_st_qual"])
+        qual[rng.random(n_rows) < 0.1] = "X"
+        mes_table["teff_st_qual"] = MaskedColumn(
+            qual, mask=rng.random(n_rows) < 0.1
+        )
+
+        result = best_para("teff_st", mes_table.copy())
+        expected = best_para_loop("teff_st", mes_table.copy())
+
+        assert result.colnames == expected.colnames
+        for colname in expected.colnames:
+            assert result[colname].dtype == expected[colname].dtype
+            assert result[colname].tolist() == expected[colname].tolist()
+
+
+def test_best_para_without_valid_quality():
+    mes_table = Table(
+        {
+            "main_id": ["star3", "star1", "star1", "star2", "star3"],
+            "teff_st_value": [3000, 5000, 5100, 6000, 3100],
+            "teff_st_err": [100, 100, 150, 100, 150],
+            "teff_st_qual": MaskedColumn(
+                ["B", "A", "A", "X", "B"],
+                mask=[False, True, False, False, False],
+            ),
+            "teff_st_source_idref": [1, 2, 3, 4, 5],
+        }
+    )
+
+    result = best_para("teff_st", mes_table)
+
+    # star2 has no valid quality, masked quality of star1 is ignored,
+    # result is sorted by main_id
+    assert list(result["main_id"]) == ["star1", "star3"]
+    assert list(result["teff_st_value"]) == [5100, 3000]
+    assert len(best_para("teff_st", mes_table[:0])) == 0
+
+
+def test_objectmerging_unmasked_types():
     cat = Table(
         {
-            "type_1": ["A", "B", "C"],
-            "type_2": [np.ma.core.MaskedConstant(), "None", "D"],
-            "type": [""] * 3,  # Initialize 'type' column as empty
+            "main_id": ["A", "B"],
+            "ids_1": np.array(["A", "B"], dtype=object),
+            "ids_2": np.array(["A", ""], dtype=object),
+            "type_1": ["X", "st"],
+            "type_2": ["Y", "None"],
         }
     )
 
-    # Test the function for each row in the table
-    assert assign_type(cat, 0) == "A"  # type_2 is masked, fallback to type_1
-    assert assign_type(cat, 1) == "B"  # type_2 is 'None', fallback to type_1
-    assert assign_type(cat, 2) == "D"  # type_2 is valid, use it
+    result = objectmerging(cat)
 
+    # type_2 'None' falls back to type_1 without any masked entries
+    assert list(result["type"]) == ["Y", "st"]
+    assert result["type"].dtype == object
 
-def test_assign_type_with_no_masked_constant():
-    # Create a mock Table
+
+def test_objectmerging():
     cat = Table(
         {
-            "type_1": ["X"],
-            "type_2": ["Y"],
-            "type": [""],  # Initialize 'type' column as empty
+            "main_id": ["A", "B", "C"],
+            "ids_1": MaskedColumn(
+                ["A|HD 1", "B", ""], mask=[False, False, True], dtype=object
+            ),
+            "ids_2": MaskedColumn(
+                ["HD 1|Gaia 5", "", "C"],
+                mask=[False, True, False],
+                dtype=object,
+            ),
+            "type_1": MaskedColumn(["st", "sy", "pl"], dtype=object),
+            "type_2": MaskedColumn(
+                ["None", "st", "st"], mask=[False, True, False], dtype=object
+            ),
         }
     )
 
-    # Test the function for the first (and only) row in the table
-    assert assign_type(cat, 0) == "Y"  # type_2 is valid, use it
+    result = objectmerging(cat)
+
+    assert result.colnames == ["main_id", "ids", "type"]
+    assert list(result["ids"]) == ["A|Gaia 5|HD 1", "B", "C"]
+    assert list(result["type"]) == ["st", "sy", "st"]
+
+
+def test_objectmerging_equals_loop():
+    for seed, n_rows in enumerate([1, 30, 600]):
+        cat = synthetic_objects(n_rows, seed=seed)
+        # type_2 'None' falls back to type_1 like a masked one
+        none_type = np.random.default_rng(seed).random(n_rows) < 0.1
+        cat["type_2"][none_type] = "None"
+
+        result = objectmerging(cat.copy())
+        expected = objectmerging_loop(cat.copy())
+
+        assert result.colnames == expected.colnames
+        for colname in expected.colnames:
+            assert result[colname].dtype == expected[colname].dtype
+            assert (
+                np.ma.getmaskarray(result[colname]).tolist()
+                == np.ma.getmaskarray(expected[colname]).tolist()
+            )
+            assert result[colname].tolist() == expected[colname].tolist()
 
 
 def test_assign_source_idref():
@@ -385,6 +613,128 @@ def test_assign_source_idref():
     assert len(result) == len(cat)
 
 
+def test_assign_source_idref_with_index():
+    cat = Table(
+        {
+            "main_id": ["star1", "star2", "star3"],
+            "temp_ref": ["ref2", "ref3", "ref1"],
+            "temp_value": [100, 200, 300],
+        }
+    )
+    sources = Table(
+        {
+            "ref": ["ref1", "ref2", "ref3"],
+            "source_id": [1, 2, 3],
+            "provider_name": ["provider1", "provider1", "provider2"],
+        }
+    )
+
+    source_index = build_source_index(sources)
+    assert list(source_index["provider1"][0]) == ["ref1", "ref2"]
+    assert list(source_index["provider1"][1]) == [1, 2]
+
+    result = assign_source_idref(
+        cat, sources, ["temp"], "provider1", source_index
+    )
+
+    # sorted by reference, ref3 belongs to another provider
+    assert list(result["main_id"]) == ["star3", "star1", "star2"]
+    assert list(result["temp_source_idref"].mask) == [False, False, True]
+    assert list(result["temp_source_idref"][:2]) == [1, 2]
+
+
+def assert_same_rows(result, expected, key):
+    # same columns, dtypes, masks and rows, compared in the order of the
+    # unique column key
+    assert result.colnames == expected.colnames
+    result = result[np.argsort(np.asarray(result[key]), kind="stable")]
+    expected = expected[np.argsort(np.asarray(expected[key]), kind="stable")]
+    for colname in expected.colnames:
+        assert result[colname].dtype == expected[colname].dtype
+        assert (
+            np.ma.getmaskarray(result[colname]).tolist()
+            == np.ma.getmaskarray(expected[colname]).tolist()
+        )
+        assert result[colname].tolist() == expected[colname].tolist()
+
+
+def test_assign_source_idref_equals_join():
+    rng = np.random.default_rng(0)
+    refs = np.array([f"ref{i}" for i in range(8)], dtype=object)
+    sources = Table(
+        {
+            "ref": np.concatenate([refs[:5], refs[3:7]]),
+            "source_id": np.arange(9) + 1,
+            "provider_name": ["provider1"] * 5 + ["provider2"] * 4,
+        }
+    )
+    for n_rows in [1, 30, 600]:
+        cat = Table(
+            {
+                "main_id": np.array(
+                    [f"star {i}" for i in range(n_rows)], dtype=object
+                ),
+                "teff_st_value": MaskedColumn(
+                    rng.random(n_rows), mask=rng.random(n_rows) < 0.2
+                ),
+                "teff_st_ref": MaskedColumn(
+                    rng.choice(refs, n_rows), mask=rng.random(n_rows) < 0.2
+                ),
+                "coo_ref": np.array(rng.choice(refs, n_rows), dtype=object),
+            }
+        )
+        paras = ["teff_st", "radius_st", "coo"]
+
+        expected = assign_source_idref_join(
+            cat.copy(), sources, paras, "provider1"
+        )
+        for source_index in [None, build_source_index(sources)]:
+            result = assign_source_idref(
+                cat.copy(), sources, paras, "provider1", source_index
+            )
+
+            # join sorts by its key with an unstable sort, so only the
+            # order by the last reference column is defined
+            assert result["coo_ref"].tolist() == expected["coo_ref"].tolist()
+            assert_same_rows(result, expected, "main_id")
+
+
+def test_object_index():
+    objects = Table(
+        {
+            "main_id": np.array(["b", "c", "a"], dtype=object),
+            "type": np.array(["st", "pl", "sy"], dtype=object),
+            "object_id": [1, 2, 3],
+        }
+    )
+    objects_index = ObjectIndex(objects)
+
+    assert list(objects_index.codes(Column(["a", "x", "c"]))) == [0, -1, 2]
+    assert list(objects_index.rows_of_type(["st", "sy"])) == [0, 2]
+
+    h_link = Table(
+        {
+            "main_id": np.array(["c", "b", "c"], dtype=object),
+            "parent_main_id": np.array(["b", "x", "a"], dtype=object),
+        }
+    )
+    linked = objects_index.link_object_ids(h_link, "main_id", "child_idref")
+    assert list(linked["main_id"]) == ["b", "c", "c"]
+    assert list(linked["child_idref"]) == [1, 2, 2]
+    linked = objects_index.link_object_ids(
+        h_link, "parent_main_id", "parent_idref", inner=True
+    )
+    assert list(linked["parent_main_id"]) == ["a", "b"]
+    assert list(linked["parent_idref"]) == [3, 1]
+
+    basic = Table({"main_id": np.array(["c", "a"], dtype=object)})
+    best = Table({"main_id": np.array(["a"], dtype=object), "value": [1.5]})
+    joined = objects_index.left_join(basic, best)
+    assert list(joined["main_id"]) == ["a", "c"]
+    assert list(joined["value"].mask) == [False, True]
+    assert joined["value"][0] == 1.5
+
+
 def test_provider_data_merging():
     """Test the provider_data_merging function with various scenarios."""
     # Setup basic catalog with required tables
@@ -468,3 +818,212 @@ def test_provider_data_merging():
     assert (
         len(result["sources"]) == initial_length
     )  # Should not change when merging empty data
+
+
+def test_merge_provider_tables():
+    """Test the one pass merge against successive outer joins."""
+    tables = [
+        Table(
+            {
+                "main_id": np.array(["b", "a", "a"], dtype=object),
+                "value": [2.0, 1.0, 1.0],
+                "ref": np.array(["r1", "r1", "r1"], dtype=object),
+            }
+        ),
+        Table(
+            {
+                "main_id": np.array(["a", "c"], dtype=object),
+                "value": [1.0, np.nan],
+                "ref": np.array(["r1", "r2"], dtype=object),
+            }
+        ),
+        Table(
+            {
+                "ref": np.array(["r2", "r1"], dtype=object),
+                "main_id": np.array(["c", "b"], dtype=object),
+                "value": [np.nan, 3.0],
+            }
+        ),
+    ]
+    expected = join(tables[0], tables[1], join_type="outer")
+    expected = join(expected, tables[2], join_type="outer")
+
+    result = merge_provider_tables(tables)
+
+    assert result.colnames == expected.colnames
+    assert list(result["main_id"]) == list(expected["main_id"])
+    assert list(result["ref"]) == list(expected["ref"])
+    np.testing.assert_array_equal(result["value"], expected["value"])
+    # duplicated rows multiply like in a join, missing values never match
+    assert list(result["main_id"]) == ["a", "a", "b", "b", "c", "c"]
+
+
+def test_merge_provider_tables_different_columns():
+    """Test providers adding their own columns or lacking some."""
+    tables = [
+        Table(
+            {
+                "main_id": np.array(["a", "b", "b"], dtype=object),
+                "value": [1.0, 2.0, 3.0],
+                "err": [0.1, 0.2, 0.3],
+            }
+        ),
+        Table(
+            {
+                "main_id": np.array(["b", "c"], dtype=object),
+                "value": [2.0, 4.0],
+            }
+        ),
+        Table(
+            {
+                "main_id": np.array(["c", "b"], dtype=object),
+                "value": [4.0, 2.0],
+                "dist": [10, 20],
+            }
+        ),
+    ]
+    expected = join(tables[0], tables[1], join_type="outer")
+    expected = join(expected, tables[2], join_type="outer")
+
+    result = merge_provider_tables(tables)
+
+    assert result.colnames == ["main_id", "value", "err", "dist"]
+    assert result.colnames == expected.colnames
+    for colname in expected.colnames:
+        mask = np.ma.getmaskarray(expected[colname])
+        assert np.ma.getmaskarray(result[colname]).tolist() == mask.tolist()
+        assert (
+            np.asarray(result[colname])[~mask].tolist()
+            == np.asarray(expected[colname])[~mask].tolist()
+        )
+
+    # the key columns change from the second to the third table, where
+    # successive joins stop at the masked err of the second table
+    tables[2].remove_column("dist")
+    tables[2]["err"] = [0.4, 0.2]
+
+    result = merge_provider_tables(tables)
+
+    assert result.colnames == ["main_id", "value", "err"]
+    assert list(result["main_id"]) == ["a", "b", "b", "c", "c"]
+    assert list(result["err"].filled(-1)) == [0.1, 0.2, 0.3, -1, 0.4]
+
+
+def test_merge_provider_tables_masked():
+    """Test masked values in the key columns, which join refuses."""
+    tables = [
+        Table(
+            {
+                "main_id": np.array(["a", "a", "b"], dtype=object),
+                "err": MaskedColumn([0.1, 0.0, 0.0], mask=[False, True, True]),
+                "ref": MaskedColumn(
+                    np.array(["r1", "r1", ""], dtype=object),
+                    mask=[False, False, True],
+                ),
+            }
+        ),
+        Table(
+            {
+                "main_id": np.array(["a", "a", "b"], dtype=object),
+                "err": MaskedColumn([0.1, 0.0, 0.0], mask=[True, True, False]),
+                "ref": np.array(["r1", "r1", "r2"], dtype=object),
+            }
+        ),
+    ]
+
+    result = merge_provider_tables(tables)
+
+    # masked values match masked values only and sort first, the masked
+    # rows of a group multiply like in a join
+    assert list(result["main_id"]) == ["a", "a", "a", "b", "b"]
+    assert result["err"].mask.tolist() == [True, True, False, True, False]
+    assert list(result["ref"].filled("-")) == ["r1", "r1", "r1", "-", "r2"]
+
+    # None entries match None entries, sorted after the masked ones
+    tables = [
+        Table({"main_id": np.array(["a", None], dtype=object)}),
+        Table(
+            {
+                "main_id": MaskedColumn(
+                    np.array(["a", None], dtype=object), mask=[True, False]
+                )
+            }
+        ),
+    ]
+
+    result = merge_provider_tables(tables)
+
+    assert result["main_id"].mask.tolist() == [True, False, False]
+    assert list(result["main_id"].data.data[1:]) == [None, "a"]
+
+
+def test_provider_data_merging_equals_loop():
+    for n_objects, seed in [(20, 0), (300, 1)]:
+        prov_tables_dict = synthetic_provider_tables(n_objects, seed)
+        # the successive joins refuse masked keys, so masked entries are
+        # filled with a value of their column, e.g. a known reference
+        for prov_data in prov_tables_dict.values():
+            for cat_prov in prov_data.values():
+                for colname in cat_prov.colnames:
+                    mask = np.ma.getmaskarray(cat_prov[colname])
+                    if mask.any():
+                        cat_prov[colname] = cat_prov[colname].filled(
+                            cat_prov[colname][~mask][0]
+                        )
+        sources = build_sources_table(copy.deepcopy(prov_tables_dict))
+        source_index = build_source_index(sources["sources"])
+        table_names = [
+            table_name
+            for table_name in prov_tables_dict["sim"]
+            if table_name not in ["sources", "objects"]
+        ]
+        for table_name in table_names:
+            para_match = table_name != "provider"
+            expected = provider_data_merging_loop(
+                dict(sources),
+                table_name,
+                copy.deepcopy(prov_tables_dict),
+                para_match,
+                source_index,
+            )[table_name]
+            result = provider_data_merging(
+                dict(sources),
+                table_name,
+                copy.deepcopy(prov_tables_dict),
+                para_match=para_match,
+                source_index=source_index,
+            )[table_name]
+
+            assert result.colnames == expected.colnames, table_name
+            assert len(result) == len(expected), table_name
+            for colname in expected.colnames:
+                assert result[colname].dtype == expected[colname].dtype
+                mask = np.ma.getmaskarray(result[colname])
+                assert (
+                    mask.tolist()
+                    == np.ma.getmaskarray(expected[colname]).tolist()
+                ), (table_name, colname)
+                np.testing.assert_array_equal(
+                    np.asarray(result[colname])[~mask],
+                    np.asarray(expected[colname])[~mask],
+                )
+
+
+def test_unify_null_values():
+    """Test the null value unification with default and custom tokens."""
+    cat = {
+        "mes_teff_st": Table(
+            {"teff_st_qual": np.array(["N", "A", "", "N/A"], dtype=object)}
+        ),
+        "mes_binary": Table(
+            {"binary_qual": np.array(["-", "B"], dtype=object)}
+        ),
+    }
+
+    cat = unify_null_values(cat)
+
+    assert list(cat["mes_teff_st"]["teff_st_qual"]) == ["?", "A", "?", "?"]
+    assert list(cat["mes_binary"]["binary_qual"]) == ["-", "B"]
+
+    cat = unify_null_values(cat, {"mes_binary": ["binary_qual"]}, ["-"])
+    assert list(cat["mes_binary"]["binary_qual"]) == ["?", "B"]
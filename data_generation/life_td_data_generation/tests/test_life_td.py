@@ -1,10 +1,21 @@
+import os
+import threading
+
+import life_td as life_td_module
 import numpy as np
+import pytest
 from astropy.table import Table, setdiff
-from life_td import load_cat
+from life_td import (
+    LazyCat,
+    create_provider,
+    load_cat,
+    provider_input_hash,
+    run_providers,
+)
 
 # self created modules
 from sdata import empty_dict_wit_columns
-from utils.io import save, string_to_object_whole_dict
+from utils.io import Path, save, string_to_object_whole_dict
 
 
 def test_load_cat():
@@ -35,6 +46,134 @@ def test_load_cat():
                 )
 
 
+def test_lazy_cat():
+    # data
+    sptype = np.array(["dM3.51", "dM3:", "dM5.0"])
+    main_id = np.array(["G 227-48B", "* mu. Dra C", "FBS 1415+456"])
+    example_table = Table((main_id, sptype), names=("main_id", "sptype_string"))
+    provider_name = "test_lazy_cat"
+    save([example_table], [provider_name + "_star_basic"])
+
+    # function
+    lazy_cat = LazyCat(provider_name)
+    subset = lazy_cat.load_columns("star_basic", ["main_id"])
+
+    # assert
+    assert list(lazy_cat.keys()) == list(empty_dict_wit_columns.keys())
+    assert lazy_cat.tables == {}
+    assert subset.colnames == ["main_id"]
+    assert subset["main_id"].dtype == object
+    assert lazy_cat["star_basic"].colnames == ["main_id", "sptype_string"]
+    assert list(lazy_cat.tables.keys()) == ["star_basic"]
+
+    # memory mapped string columns stay fixed width
+    save([example_table], [provider_name + "_star_basic"], fmt="npy")
+    lazy_cat = LazyCat(provider_name)
+    assert lazy_cat["star_basic"]["main_id"].dtype.kind == "U"
+    assert (
+        LazyCat(provider_name, mmap=False)["star_basic"]["main_id"].dtype
+        == object
+    )
+
+
+def test_run_providers():
+    # data
+    finished = []
+    gaia_done = threading.Event()
+    started_after = {}
+
+    def provider(name, wait_for=None):
+        started_after[name] = list(finished)
+        # sim only finishes once gaia did, which cannot happen if gaia
+        # waited for sim
+        if wait_for is not None:
+            assert wait_for.wait(timeout=10)
+        finished.append(name)
+        if name == "gaia":
+            gaia_done.set()
+        return {"sources": Table({"ref": [name]})}
+
+    tasks = {
+        "sim": (provider, ("sim", gaia_done)),
+        "gaia": (provider, ("gaia",)),
+        "wds": (provider, ("wds",)),
+    }
+
+    # function
+    results = run_providers(tasks, {"sim": [], "gaia": [], "wds": ["sim"]})
+
+    # assert
+    assert set(results.keys()) == {"sim", "gaia", "wds"}
+    assert results["wds"]["sources"]["ref"][0] == "wds"
+    # gaia does not wait for sim, wds does
+    assert "sim" not in started_after["gaia"]
+    assert "sim" in started_after["wds"]
+    assert finished.index("sim") < finished.index("wds")
+
+
+def test_run_providers_circular_dependencies():
+    tasks = {"sim": (dict, ()), "wds": (dict, ())}
+
+    with pytest.raises(ValueError):
+        run_providers(tasks, {"sim": ["wds"], "wds": ["sim"]})
+
+
+def test_create_provider_only_if_changed(monkeypatch):
+    # data
+    monkeypatch.setitem(
+        life_td_module.provider_inputs,
+        "test_prov",
+        {
+            "distance_cut": False,
+            "tables": ["test_upstream_objects"],
+            "modules": [],
+            "snapshots": [],
+        },
+    )
+    manifest = Path().additional_data + "test_prov_manifest.json"
+    if os.path.isfile(manifest):
+        os.remove(manifest)
+    save([Table({"main_id": ["A"]})], ["test_upstream_objects"])
+    calls = []
+
+    def provider():
+        calls.append(1)
+        cat = {"sources": Table({"ref": ["ref1"]})}
+        save([cat["sources"]], ["test_prov_sources"])
+        return cat
+
+    # function
+    first = create_provider("test_prov", provider, (), 5.0, True)
+    second = create_provider("test_prov", provider, (), 10.0, True)
+    save([Table({"main_id": ["A", "B"]})], ["test_upstream_objects"])
+    third = create_provider("test_prov", provider, (), 10.0, True)
+
+    # assert
+    assert first["sources"]["ref"][0] == "ref1"
+    # distance cut is no input of test_prov, upstream table unchanged
+    assert second is None
+    assert third is not None
+    assert len(calls) == 2
+    assert os.path.isfile(manifest)
+
+
+def test_provider_input_hash_shared_modules(monkeypatch, tmp_path):
+    # data
+    shared_module = tmp_path / "shared.py"
+    shared_module.write_text("x = 1\n")
+    monkeypatch.setattr(
+        life_td_module, "shared_provider_modules", [str(shared_module)]
+    )
+
+    # function
+    before = provider_input_hash("wds", 30.0)
+    shared_module.write_text("x = 2\n")
+    after = provider_input_hash("wds", 30.0)
+
+    # assert
+    assert before != after
+
+
 # def test_partial_create():
 #     partial_create(distance_cut_in_pc,create=[])
 #     assert
@@ -1,12 +1,21 @@
 import numpy as np
-from astropy.table import Table
+from astropy import units
+from astropy.table import MaskedColumn, Table
+from benchmarks.reference import (
+    match_spectral_type_scan,
+    sptype_string_to_class_loop,
+)
 from provider.life import (
     assign_null_values,
     create_star_basic_table,
     deal_with_leading_d_sptype,
+    derive_astrometry,
     extract_lum_class,
     initiate_columns,
+    match_sptype,
+    model_param_index,
     modeled_param,
+    parse_sptype,
     realspectype,
     spec,
     sptype_string_to_class,
@@ -128,6 +137,45 @@ def test_deal_with_minus_in_sptype():
     assert result["class_temp_nr"][4] == "2"
 
 
+def test_parse_sptype():
+    assert parse_sptype("dM2.5") == ("M2.5", "M", "2.5", "V")
+    assert parse_sptype("K2-IIIbCa-1") == ("K2IIIbCa1", "K", "2", "III")
+    assert parse_sptype("G") == ("G", "G", None, "V")
+    assert parse_sptype("M5V+K7V") == ("M5V+K7V", "?", "?", "?")
+    assert parse_sptype("T1V") == ("T1V", "?", "?", "?")
+    assert parse_sptype("") == ("", "?", "?", "?")
+
+
+def test_sptype_string_to_class_equals_loop():
+    # randomly generated spectral types, many of them repeated
+    rng = np.random.default_rng(0)
+    alphabet = list("OBAFGKMTdIVab0123456789.-+: ")
+    sptypes = [
+        "".join(rng.choice(alphabet, size=rng.integers(0, 9)))
+        for _ in range(2000)
+    ]
+    sptypes += ["K2.5V", "M3.51", "dM4", "F5IV-V", "K-2-V", "G8III", "d"]
+    sptypes = sptypes + sptypes[::3]
+    main_id = np.array([f"star {i}" for i in range(len(sptypes))])
+
+    def example_table():
+        return Table(
+            (main_id, np.array(sptypes)),
+            names=("main_id", "sptype_string"),
+            dtype=[object, object],
+        )
+
+    result = sptype_string_to_class(example_table(), "fake_ref")
+    expected = sptype_string_to_class_loop(example_table(), "fake_ref")
+
+    for colname in expected.colnames:
+        assert (
+            np.ma.getmaskarray(result[colname]).tolist()
+            == np.ma.getmaskarray(expected[colname]).tolist()
+        )
+        assert result[colname].tolist() == expected[colname].tolist()
+
+
 def test_modeled_param():
     mp = modeled_param()  # create model table as votable
 
@@ -137,6 +185,36 @@ def test_modeled_param():
     assert mp["Teff"][np.where(mp["SpT"] == "M3.5V")] == 3270
 
 
+def test_match_sptype_equals_scan():
+    model_param = modeled_param(save_votable=False)
+    sptypes = [
+        temp + nr + lum
+        for temp in "OBAFGKM"
+        for nr in ["0", "2", "2.5", "5", "5.5", "9.5"]
+        for lum in ["V", "IV", ""]
+    ]
+    # half-subtypes with and without model row, luminosity class or
+    # integer fallback
+    sptypes += ["dM4V", "G", "K", "", "dK2.5V", "K2.3V", "M3.5.", "G2.5."]
+    sptypes += ["M3.5", "M3.5IV", "K2.5", "K2.5IV", "K2.5e", "L9.5V"]
+    cat = Table(
+        (np.array(sptypes + sptypes[::4], dtype=object),),
+        names=("mp_specmatch",),
+        dtype=[object],
+    )
+
+    result = match_sptype(cat)
+
+    for i, sptype in enumerate(result["mp_specmatch"]):
+        teff = match_spectral_type_scan(sptype, model_param)
+        if teff is None:
+            assert result["mod_Teff"].mask[i]
+        else:
+            assert result["mod_Teff"][i] == teff
+    assert "None" in result["mp_specmatch"]
+    assert model_param_index() is model_param_index()
+
+
 def test_assign_teff():
     temp = np.array(["M", "M", "M", "M", "M", "K"])
     temp_nr = np.array(["5.0", "3.5", "5.5", "6.5", "4.0", "2.5"])
@@ -213,6 +291,35 @@ def test_assign_mass():
     assert result["mod_M"][np.where(result["main_id"] == "test4")] == 0.82
 
 
+def test_derive_astrometry():
+    def example_table():
+        table = Table()
+        table["main_id"] = ["galactic center", "north pole", "a", "b", "c"]
+        table["coo_ra"] = [266.405, 192.859, 10.0, 100.0, 300.0] * units.deg
+        table["coo_dec"] = [-28.936, 27.128, -5.0, 45.0, 80.0] * units.deg
+        table["plx_value"] = MaskedColumn(
+            [100.0, 50.0, 10.0, 4.0, 1.0], mask=[0, 0, 0, 1, 0]
+        )
+        table["plx_err"] = MaskedColumn(
+            [0.1, 0.5, 0.2, 0.1, 0.1], mask=[0, 0, 1, 0, 0]
+        )
+        return table
+
+    result = derive_astrometry(example_table(), "LIFE")
+    chunked = derive_astrometry(example_table(), "LIFE", chunk_size=2)
+
+    for colname in result.colnames:
+        assert result[colname].tolist() == chunked[colname].tolist()
+    assert abs(result["coo_gal_l"][0]) < 0.01 or result["coo_gal_l"][0] > 359.99
+    assert abs(result["coo_gal_b"][0]) < 0.01
+    assert result["coo_gal_b"][1] > 89.99
+    assert result["dist_st_value"].tolist() == [10.0, 20.0, 100.0, None, 1000.0]
+    assert result["dist_st_err"].tolist() == [0.01, 0.2, None, None, 100.0]
+    assert result["dist_st_ref"].tolist() == ["LIFE"] * 3 + [None, "LIFE"]
+    assert result["coo_gal_ref"].tolist() == ["LIFE"] * 5
+    assert result["coo_gal_err_maj"].tolist() == [-1] * 5
+
+
 def test_no_stas_lost():
     [sim_star_basic] = load(["sim_star_basic"])
 
@@ -4,7 +4,9 @@ import numpy as np  # arrays
 import provider.simbad as simbad_module
 import pytest
 from astropy.table import MaskedColumn, Table, setdiff
+from benchmarks.reference import classify_object_types_loop
 from provider.simbad import (
+    classify_object_types,
     create_h_link_table,
     create_ident_table,
     create_objects_table,
@@ -12,6 +14,8 @@ from provider.simbad import (
     create_simbad_helpertable,
     creating_helpertable_stars,
     expanding_helpertable_stars,
+    h_link_adql_query,
+    main_adql_queries,
     stars_in_multiple_system,
 )
 from provider.utils import nullvalues
@@ -235,6 +239,35 @@ def test_create_simbad_helpertable(query_returns):
     assert len(result_sim["provider"]) == 1
 
 
+def test_classify_object_types():
+    otypes = [
+        "*|**",
+        "BD?",
+        "Pl|*",
+        "*",
+        "**",
+        "Pl?",
+        "PM*|BD*",
+        "G",
+        "",
+        "BD?",
+        "SB*|**|PM*",
+    ]
+    wanted_types, wanted_flags, wanted_removed, wanted_otypes = (
+        classify_object_types_loop(otypes)
+    )
+
+    types, binary_flag, keep, removed_otypes = classify_object_types(
+        np.array(otypes, dtype=object)
+    )
+
+    assert list(types) == wanted_types
+    assert list(binary_flag) == wanted_flags
+    assert list(np.flatnonzero(~keep)) == wanted_removed
+    assert removed_otypes == {"": 1, "BD?": 2, "G": 1}
+    assert sum(removed_otypes.values()) == len(wanted_otypes)
+
+
 def test_creating_helpertable_stars(query_returns):
     # Data
     result_sim_helptab, result_sim, t0, return_ident = query_returns
@@ -624,3 +657,95 @@ def test_create_sim_sources_table(query_returns):
     # to do next:
     # clean up provider_sim while making sure that tests still work
     # clean up tests for provider sim afterwards
+
+
+def test_main_adql_queries_server_side():
+    adql = main_adql_queries(20.0, server_side=True)
+    assert "h_link" not in adql
+    assert "a.otypes LIKE '%Pl%'" in adql
+    assert "h_link" in main_adql_queries(20.0)
+    assert "h_link.child AS oid" in h_link_adql_query(20.0)
+    # links of all children in the cut, like the LEFT JOIN of the default
+    assert "otypes" not in h_link_adql_query(20.0)
+
+
+def test_create_simbad_helpertable_server_side(monkeypatch):
+    def objects(main_ids, oids, otypes):
+        n = len(main_ids)
+        return Table(
+            {
+                "main_id": np.array(main_ids, dtype=object),
+                "coo_ra": MaskedColumn(np.ones(n)),
+                "oid": oids,
+                "plx_value": MaskedColumn(
+                    np.ones(n), mask=[oid > 3 for oid in oids]
+                ),
+                "otypes": np.array(otypes, dtype=object),
+                "ids": np.array(main_ids, dtype=object),
+            }
+        )
+
+    def h_links(children, parents):
+        return Table(
+            {
+                "oid": children,
+                "membership": [100] * len(children),
+                "parent_oid": parents,
+                "h_link_ref": np.array(
+                    ["ref_hlink"] * len(children), dtype=object
+                ),
+            }
+        )
+
+    answers = {
+        "otype_filter": objects(
+            ["star1", "star3", "star4"], [1, 3, 2], ["*|**", "*", "*"]
+        ),
+        # oid 7 is no star, system or planet and not among the objects
+        "h_link_main": h_links([1, 3, 1, 7], [4, 4, 6, 8]),
+        "sy_upload": objects(["system1"], [4], ["**"]),
+        "pl_upload": objects(["planet1"], [5], ["Pl"]),
+        "h_link_upload": h_links([5], [3]),
+    }
+    uploads = {}
+
+    def fake_query(url, adql, uploads_tables=None):
+        if "TAP_UPLOAD" not in adql:
+            key = "h_link_main" if "FROM h_link" in adql else "otype_filter"
+        elif "t1.parent_oid" in adql:
+            key = "sy_upload"
+        elif "otype='Pl..'" in adql:
+            key = "pl_upload"
+        else:
+            key = "h_link_upload"
+        uploads[key] = uploads_tables
+        return answers[key]
+
+    monkeypatch.setattr(simbad_module, "query", fake_query)
+    monkeypatch.setattr(simbad_module, "save", lambda *args, **kwargs: None)
+    monkeypatch.setitem(simbad_module.query_settings, "server_side", True)
+
+    sim_helptab, sim = create_simbad_helpertable(5, [])
+
+    # one row per parent link as with the LEFT JOIN in the main query
+    rows = sorted(
+        (main_id, -1 if parent is np.ma.masked else int(parent), object_type)
+        for main_id, parent, object_type in zip(
+            sim_helptab["main_id"],
+            sim_helptab["parent_oid"],
+            sim_helptab["type"],
+        )
+    )
+    assert rows == [
+        ("planet1", 3, "pl"),
+        ("star1", 4, "sy"),
+        ("star1", 6, "sy"),
+        ("star3", 4, "st"),
+        ("star4", -1, "st"),
+        ("system1", -1, "sy"),
+    ]
+    # the parent of the removed object 7 is still queried, as its link
+    # is part of the LEFT JOIN in the default mode
+    assert list(uploads["sy_upload"][0]["parent_oid"]) == [4, 6, 8]
+    assert sorted(uploads["h_link_upload"][0]["oid"]) == [4, 5]
+    assert sim["provider"]["provider_name"][0] == "SIMBAD"
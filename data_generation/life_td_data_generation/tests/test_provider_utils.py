@@ -3,16 +3,22 @@ from datetime import datetime
 import numpy as np  # arrays
 import provider.utils as utils_module
 import pytest
-from astropy.table import Table, setdiff
+from astropy.table import MaskedColumn, Table, setdiff
 from provider.utils import (
     IdentifierCreator,
     OidCreator,
     create_provider_table,
     create_sources_table,
     distance_cut,
+    encode_strings,
     fetch_main_id,
     fill_sources_table,
+    intern_strings,
+    intern_tables,
+    join_on_codes,
     lower_quality,
+    query,
+    replace_values,
 )
 
 
@@ -175,7 +181,7 @@ def test_distance_cut_by_main_id(monkeypatch: pytest.MonkeyPatch) -> None:
         }
     )
 
-    def fake_load(names):
+    def fake_load(names, **kwargs):
         # utils.distance_cut loads ["sim_objects"] in main_id=True mode
         assert names == ["sim_objects"]
         return [_make_sim_objects()]
@@ -209,7 +215,7 @@ def test_distance_cut_by_identifier(monkeypatch: pytest.MonkeyPatch) -> None:
         }
     )
 
-    def fake_load(names):
+    def fake_load(names, **kwargs):
         # utils.distance_cut loads ["sim_ident"] in main_id=False mode
         assert names == ["sim_ident"]
         return [_make_sim_ident()]
@@ -225,3 +231,339 @@ def test_distance_cut_by_identifier(monkeypatch: pytest.MonkeyPatch) -> None:
 
     # Temp column removed
     assert "temp1" not in out.colnames
+
+
+def test_encode_strings():
+    categories, [codes1, codes2] = encode_strings(
+        np.array(["b", "a", "b"], dtype=object), np.array(["c", "a"])
+    )
+
+    assert list(categories) == ["a", "b", "c"]
+    assert list(codes1) == [1, 0, 1]
+    assert list(codes2) == [2, 0]
+
+    # masked and None entries are no strings
+    categories, [codes] = encode_strings(
+        MaskedColumn(
+            np.array(["b", None, "a", "c"], dtype=object),
+            mask=[False, False, False, True],
+        )
+    )
+    assert list(categories) == ["a", "b"]
+    assert list(codes) == [1, -1, 0, -1]
+
+
+def test_intern_strings():
+    cat = Table(
+        {
+            "h_link_ref": MaskedColumn(
+                np.array(["2000A&AS..143"] * 3).astype(object),
+                mask=[False, True, False],
+            ),
+            "value": [1, 2, 3],
+        }
+    )
+    assert cat["h_link_ref"].data.data[0] is not cat["h_link_ref"].data.data[2]
+
+    cat = intern_strings(cat, ["h_link_ref", "value", "missing"])
+
+    assert cat["h_link_ref"].data.data[0] is cat["h_link_ref"].data.data[2]
+    assert list(cat["h_link_ref"].mask) == [False, True, False]
+    assert cat["h_link_ref"][0] == "2000A&AS..143"
+
+
+def test_intern_tables():
+    # strings built at runtime are distinct objects
+    main_ids = ["".join(["HD ", str(i)]) for i in [1, 1, 2]]
+    prov = {
+        "objects": Table(
+            {
+                "main_id": np.array(main_ids[:2] + [None], dtype=object),
+            }
+        ),
+        "mes_teff_st": Table(
+            {
+                "main_id": np.array(main_ids[1:], dtype=object),
+                "teff_st_ref": MaskedColumn(
+                    np.array(["ref", None], dtype=object),
+                    mask=[False, True],
+                ),
+            }
+        ),
+    }
+    assert prov["objects"]["main_id"][0] is not main_ids[1]
+
+    prov = intern_tables(prov)
+
+    objects = prov["objects"]
+    mes_table = prov["mes_teff_st"]
+    # identifiers are shared between rows and tables
+    assert objects["main_id"][0] is objects["main_id"][1]
+    assert objects["main_id"][0] is mes_table["main_id"][0]
+    assert objects["main_id"][2] is None
+    assert mes_table["teff_st_ref"][0] == "ref"
+    assert list(mes_table["teff_st_ref"].mask) == [False, True]
+
+
+def test_replace_values():
+    cat = Table(
+        {
+            "qual": MaskedColumn(
+                np.array(["N", "A", "", "N/A", "N"], dtype=object),
+                mask=[False, False, False, False, True],
+            )
+        }
+    )
+
+    cat = replace_values(cat, "qual", ["N", "N/A", ""], "?")
+
+    assert list(cat["qual"].data.data) == ["?", "A", "?", "?", "N"]
+    assert list(cat["qual"].mask) == [False, False, False, False, True]
+
+
+def test_join_on_codes():
+    cat = Table(
+        {
+            "main_id": np.array(["b", "a", "c", "a"], dtype=object),
+            "value": [1, 2, 3, 4],
+        }
+    )
+    objects = Table(
+        {
+            "object_id": [10, 20],
+            "main_id": np.array(["a", "b"], dtype=object),
+        }
+    )
+
+    result = join_on_codes(cat, objects, "main_id", "main_id", "object_id")
+
+    # sorted by key like join, input order kept within equal keys
+    assert list(result["main_id"]) == ["a", "a", "b", "c"]
+    assert list(result["value"]) == [2, 4, 1, 3]
+    assert list(result["object_id"].mask) == [False, False, False, True]
+    assert list(result["object_id"][:3]) == [10, 10, 20]
+
+
+def test_join_on_codes_masked_keys():
+    # the data under the masked left key equals a right key
+    cat = Table(
+        {
+            "main_id": MaskedColumn(
+                np.array(["b", "a", "a"], dtype=object),
+                mask=[False, True, False],
+            ),
+            "value": [1, 2, 3],
+        }
+    )
+    objects = Table(
+        {
+            "object_id": [10, 20, 30],
+            "main_id": MaskedColumn(
+                np.array(["a", "b", "b"], dtype=object),
+                mask=[False, False, True],
+            ),
+        }
+    )
+
+    result = join_on_codes(cat, objects, "main_id", "main_id", "object_id")
+
+    # masked keys never match and are sorted first
+    assert list(result["value"]) == [2, 3, 1]
+    assert list(result["object_id"].mask) == [True, False, False]
+    assert list(result["object_id"][1:]) == [10, 20]
+
+
+class FakeResult:
+    def __init__(self, cat):
+        self.cat = cat
+
+    def to_table(self):
+        return self.cat
+
+
+class FakeTAPJob:
+    def __init__(self, result, url="https://tap.example/async/1"):
+        self.url = url
+        self.result = result
+        self.phases = ["QUEUED", "EXECUTING", "COMPLETED"]
+
+    @property
+    def phase(self):
+        if len(self.phases) > 1:
+            return self.phases.pop(0)
+        return self.phases[0]
+
+    def run(self):
+        return self
+
+    def raise_if_error(self):
+        pass
+
+    def fetch_result(self):
+        return self.result
+
+    def delete(self):
+        pass
+
+
+@pytest.fixture
+def tap_settings(monkeypatch: pytest.MonkeyPatch, tmp_path):
+    monkeypatch.setitem(utils_module.query_cache_settings, "enabled", True)
+    monkeypatch.setitem(
+        utils_module.query_cache_settings, "location", str(tmp_path) + "/"
+    )
+    monkeypatch.setitem(
+        utils_module.tap_job_settings,
+        "jobs_file",
+        str(tmp_path / "tap_jobs.json"),
+    )
+    monkeypatch.setitem(
+        utils_module.tap_job_settings, "poll_interval_in_s", 0.0
+    )
+
+
+def test_query_cache(monkeypatch: pytest.MonkeyPatch, tap_settings) -> None:
+    calls = []
+
+    class FakeTAPService:
+        def __init__(self, link):
+            pass
+
+        def submit_job(self, adql_query, **kwargs):
+            calls.append(adql_query)
+            cat = Table({"main_id": np.array(["A", "B"], dtype=object)})
+            return FakeTAPJob(FakeResult(cat))
+
+    monkeypatch.setattr(utils_module, "TAPService", FakeTAPService)
+    upload = Table({"id": ["x", "y"]})
+
+    first = query("link", "SELECT main_id FROM t1", [upload])
+    second = query("link", "SELECT main_id FROM t1", [upload])
+    assert len(calls) == 1
+    assert list(second["main_id"]) == list(first["main_id"])
+
+    # different upload content is a different query
+    query("link", "SELECT main_id FROM t1", [Table({"id": ["x", "z"]})])
+    assert len(calls) == 2
+
+    # expired entries are fetched again, except in offline mode
+    monkeypatch.setitem(utils_module.query_cache_settings, "ttl_in_days", -1)
+    monkeypatch.setitem(utils_module.query_cache_settings, "offline", True)
+    query("link", "SELECT main_id FROM t1", [upload])
+    assert len(calls) == 2
+    with pytest.raises(RuntimeError):
+        query("link", "SELECT other FROM t1", [upload])
+    monkeypatch.setitem(utils_module.query_cache_settings, "offline", False)
+    query("link", "SELECT main_id FROM t1", [upload])
+    assert len(calls) == 3
+
+
+def test_query_cache_identical_result(
+    monkeypatch: pytest.MonkeyPatch, tap_settings
+) -> None:
+    calls = []
+    cat = Table(
+        {
+            "main_id": np.array(["A", None, "None"], dtype=object),
+            "plx_value": MaskedColumn([1.5, 2.5, 3.5], mask=[0, 1, 0]),
+        },
+        meta={"name": "basic", "INFO": [{"name": "QUERY_STATUS"}]},
+    )
+    cat["plx_value"].format = ".2f"
+    cat["plx_value"].meta["ucd"] = "pos.parallax"
+
+    class FakeTAPService:
+        def __init__(self, link):
+            pass
+
+        def submit_job(self, adql_query, **kwargs):
+            calls.append(adql_query)
+            return FakeTAPJob(FakeResult(cat.copy()))
+
+    monkeypatch.setattr(utils_module, "TAPService", FakeTAPService)
+
+    first = query("link", "SELECT main_id", no_description=False)
+    second = query("link", "SELECT main_id", no_description=False)
+
+    assert len(calls) == 1
+    assert second.meta == first.meta == cat.meta
+    assert second["main_id"].tolist() == ["A", None, "None"]
+    assert list(second["plx_value"].mask) == [False, True, False]
+    assert second["plx_value"].format == ".2f"
+    assert second["plx_value"].meta == {"ucd": "pos.parallax"}
+
+
+def test_query_cache_disabled_by_default() -> None:
+    assert not utils_module.query_cache_settings["enabled"]
+
+
+def test_query_in_chunks(monkeypatch: pytest.MonkeyPatch, tap_settings) -> None:
+    uploaded = []
+
+    class FakeTAPService:
+        def __init__(self, link):
+            pass
+
+        def submit_job(self, adql_query, uploads=None, **kwargs):
+            t1 = uploads["t1"]
+            # first try of the second chunk fails
+            failed_before = [3, 4] in [list(t["oid"]) for t in uploaded]
+            uploaded.append(t1)
+            if list(t1["oid"]) == [3, 4] and not failed_before:
+                raise ValueError("timeout")
+            cat = t1.copy()
+            cat["main_id"] = np.array([f"star {i}" for i in t1["oid"]])
+            return FakeTAPJob(FakeResult(cat))
+
+    monkeypatch.setattr(utils_module, "TAPService", FakeTAPService)
+    monkeypatch.setitem(utils_module.upload_settings, "chunk_size", 2)
+
+    cat = Table({"oid": [1, 2, 3, 4, 5]})
+    result = fetch_main_id(cat)
+
+    assert sorted(result["oid"]) == [1, 2, 3, 4, 5]
+    assert sorted(result["main_id"]) == [f"star {i}" for i in range(1, 6)]
+    # three chunks and one retry
+    assert len(uploaded) == 4
+
+    # chunks are cached, nothing is uploaded again
+    fetch_main_id(cat)
+    assert len(uploaded) == 4
+
+
+def test_query_resumes_tap_job(
+    monkeypatch: pytest.MonkeyPatch, tap_settings
+) -> None:
+    submitted = []
+    resumed = []
+    cat = Table({"main_id": np.array(["A"], dtype=object)})
+
+    class FakeTAPService:
+        def __init__(self, link):
+            pass
+
+        def submit_job(self, adql_query, **kwargs):
+            submitted.append(adql_query)
+            return FakeTAPJob(FakeResult(cat))
+
+    def fake_async_tap_job(url, delete=True):
+        resumed.append(url)
+        return FakeTAPJob(FakeResult(cat), url)
+
+    monkeypatch.setattr(utils_module, "TAPService", FakeTAPService)
+    monkeypatch.setattr(utils_module, "AsyncTAPJob", fake_async_tap_job)
+    monkeypatch.setitem(utils_module.query_cache_settings, "enabled", False)
+
+    # job recorded by an interrupted build
+    key = utils_module.query_cache_key("link", "SELECT main_id", [], True)
+    utils_module.update_tap_jobs(key, "https://tap.example/async/7")
+
+    result = query("link", "SELECT main_id")
+    assert list(result["main_id"]) == ["A"]
+    assert resumed == ["https://tap.example/async/7"]
+    assert submitted == []
+    # finished jobs are forgotten
+    assert utils_module.update_tap_jobs(key) is None
+
+    query("link", "SELECT main_id")
+    assert len(submitted) == 1
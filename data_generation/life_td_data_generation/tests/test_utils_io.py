@@ -1,11 +1,18 @@
+import os
+
 import numpy as np
-from astropy.table import Table
+import pytest
+from astropy import units
+from astropy.table import MaskedColumn, Table
 from sdata import empty_dict_wit_columns
 from utils.io import (
+    Path,
+    load,
     objecttostring,
     save,
     string_to_object_whole_dict,
     stringtoobject,
+    table_hash,
 )
 
 
@@ -45,6 +52,148 @@ def test_save():
     # original catalog does get changed
 
 
+def test_save_default_format():
+    # data
+    cat = Table({"main_id": np.array(["A", "B"], dtype=object)})
+    location = Path().additional_data
+    save([cat], ["test_default_format"], fmt="npy")
+
+    # function
+    save([cat], ["test_default_format"])
+
+    # assert
+    # exports are VOTable xml and replace an outdated binary copy
+    assert os.path.isfile(f"{location}test_default_format.xml")
+    assert not os.path.isdir(f"{location}test_default_format")
+
+
+def test_save_load_npy_round_trip():
+    # data
+    cat = Table(
+        data=[
+            np.array(
+                ["G 227-48B", "* mu. Dra C", "FBS 1415+456"], dtype=object
+            ),
+            MaskedColumn(
+                np.array(["dM3.51", "", "dM5.0"], dtype=object),
+                mask=[False, True, False],
+            ),
+            MaskedColumn([1.5, 2.5, 3.5], mask=[True, False, False]),
+            [1, 2, 999999],
+            ["A", "B", "C"],
+        ],
+        names=["main_id", "sptype_string", "plx_value", "source_id", "qual"],
+    )
+    cat["plx_value"].unit = units.mas
+
+    # function
+    save([cat], ["test_round_trip"], fmt="npy")
+    [loaded] = load(["test_round_trip"], stringtoobjects=False)
+
+    # assert
+    assert loaded.colnames == cat.colnames
+    for colname in cat.colnames:
+        assert loaded[colname].dtype == cat[colname].dtype
+        assert isinstance(loaded[colname], MaskedColumn) == isinstance(
+            cat[colname], MaskedColumn
+        )
+    assert list(loaded["sptype_string"].mask) == [False, True, False]
+    assert list(loaded["plx_value"].mask) == [True, False, False]
+    assert loaded["plx_value"].unit == units.mas
+    assert list(loaded["main_id"]) == list(cat["main_id"])
+    assert list(loaded["source_id"]) == [1, 2, 999999]
+
+
+def test_save_load_npy_none_entries():
+    # data
+    cat = Table(
+        data=[
+            np.array(["x", None, "None"], dtype=object),
+            MaskedColumn(
+                np.array([None, "y", None], dtype=object),
+                mask=[False, False, True],
+            ),
+        ],
+        names=["main_id", "sptype_string"],
+    )
+
+    # function
+    save([cat], ["test_none_entries"], fmt="npy")
+    [loaded] = load(["test_none_entries"], stringtoobjects=False)
+
+    # assert
+    assert loaded["main_id"].tolist() == ["x", None, "None"]
+    assert loaded["sptype_string"][0] is None
+    assert loaded["sptype_string"][1] == "y"
+    assert list(loaded["sptype_string"].mask) == [False, False, True]
+
+
+def test_save_npy_non_string_object_entries():
+    # data
+    cat = Table(
+        data=[np.array(["x", 1], dtype=object)],
+        names=["class_temp_nr"],
+    )
+
+    # function and assert
+    with pytest.raises(TypeError):
+        save([cat], ["test_non_string_entries"], fmt="npy")
+
+
+def test_load_npy_mmap():
+    # data
+    cat = Table(
+        data=[
+            np.array(["G 227-48B", "* mu. Dra C"], dtype=object),
+            MaskedColumn([1.5, 2.5], mask=[True, False]),
+            np.array(["G 227-48", None], dtype=object),
+        ],
+        names=["main_id", "plx_value", "parent_main_id"],
+    )
+    save([cat], ["test_mmap"], fmt="npy")
+
+    # function
+    [loaded] = load(["test_mmap"], mmap=True)
+    loaded["plx_value"][1] = 5.0
+    [reloaded] = load(["test_mmap"], stringtoobjects=False)
+
+    # assert
+    def is_memory_mapped(col):
+        base = np.ma.getdata(col)
+        while not isinstance(base, np.memmap) and base.base is not None:
+            base = base.base
+        return isinstance(base, np.memmap)
+
+    assert is_memory_mapped(loaded["plx_value"])
+    # string columns stay fixed width, also with stringtoobjects
+    assert is_memory_mapped(loaded["main_id"])
+    assert loaded["main_id"].dtype.kind == "U"
+    assert list(loaded["main_id"]) == ["G 227-48B", "* mu. Dra C"]
+    # but fixed width strings cannot hold None
+    assert loaded["parent_main_id"].dtype == object
+    assert loaded["parent_main_id"][1] is None
+    assert reloaded["main_id"].dtype == object
+    assert list(loaded["plx_value"].mask) == [True, False]
+    # changes to memory mapped tables are not written back
+    assert reloaded["plx_value"][1] == 2.5
+
+
+def test_table_hash():
+    # data
+    cat = Table({"main_id": ["A", "B"], "value": [1.0, 2.0]})
+
+    # function
+    save([cat, cat], ["test_hash1", "test_hash2"], fmt="npy")
+    hash1 = table_hash("test_hash1")
+    cat["value"][1] = 3.0
+    save([cat], ["test_hash2"], fmt="npy")
+
+    # assert
+    assert hash1 is not None
+    assert table_hash("test_hash2") != hash1
+    assert table_hash("test_hash_not_saved") is None
+
+
 def test_stringtoobject():
     # data
     sptype = np.array(["dM3.51", "dM3:", "dM5.0"])
@@ -58,6 +207,20 @@ def test_stringtoobject():
     assert example_table["main_id"].dtype == object
 
 
+def test_stringtoobject_unicode():
+    # data
+    sptype = np.array(["dM3.51", "dM3:", "dM5.0"], dtype="<U20")
+    main_id = np.array(["G 227-48B", "* mu. Dra C", "FBS 1415+456"])
+    example_table = Table((main_id, sptype), names=("main_id", "sptype_string"))
+
+    # function
+    example_table = stringtoobject(example_table, string_type="unicode")
+
+    # assert
+    assert example_table["main_id"].dtype == "<U12"
+    assert example_table["sptype_string"].dtype == "<U6"
+
+
 def test_string_to_object_whole_dict():
     # data
     sptype = np.array(["dM3.51", "dM3:", "dM5.0"])
@@ -74,5 +237,6 @@ def test_string_to_object_whole_dict():
     for tablename in dictionary.keys():
         if tablename == "star_basic":  # change to more once this works
             for columnname in dictionary[tablename].colnames:
-                # no idea why there is a type error here, when there is none above
+                # no idea why there is a type error here, when there is none
+                # above
                 assert dictionary[tablename][columnname].dtype == object
@@ -0,0 +1,41 @@
+import json
+
+import pytest
+from astropy.table import Table
+from utils.profiling import StageReport, row_counts
+
+
+def test_stage_report(tmp_path):
+    report = StageReport()
+    cat = {"sources": Table({"ref": ["a", "b"]}), "objects": Table()}
+
+    with report.stage("build") as record:
+        record["rows"] = row_counts(cat, ["sources", "missing"])
+
+    with report.stage("merge"):
+        pass
+    with pytest.raises(ValueError):
+        with report.stage("failing"):
+            raise ValueError
+
+    report.write(tmp_path / "report.json")
+    with open(tmp_path / "report.json") as f:
+        written = json.load(f)
+
+    assert [stage["stage"] for stage in written["stages"]] == [
+        "build",
+        "merge",
+        "failing",
+    ]
+    assert written["stages"][0]["rows"] == {"sources": 2}
+    for stage in written["stages"]:
+        assert stage["wall_time_in_s"] >= 0
+        assert stage["cpu_time_in_s"] >= 0
+        if stage["process_peak_rss_in_mb"] is not None:
+            assert stage["peak_rss_increase_in_mb"] >= 0
+    # the peak of the process never goes down between stages
+    peaks = [stage["process_peak_rss_in_mb"] for stage in written["stages"]]
+    if peaks[0] is not None:
+        assert peaks == sorted(peaks)
+    assert written["total_wall_time_in_s"] >= 0
+    assert row_counts(cat) == {"sources": 2, "objects": 0}
@@ -3,8 +3,20 @@ Helper functions for the creation and analysis of the LIFE Target
     Database.
 """
 
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+from astropy import units
 from astropy.io import votable
-from numpy import dtype
+from astropy.io.misc import yaml
+from astropy.table import Column, MaskedColumn, Table
+
+# Formats understood by save and load. "xml" is the VOTable export ingested
+# by DaCHS, "npy" the columnar binary format used for intermediate tables.
+storage_formats = ["xml", "npy"]
 
 
 class Path:
@@ -23,7 +35,232 @@ def objecttostring(cat):
     return cat
 
 
-def save(cats, names, location=Path().additional_data):
+def _write_array(filename, array):
+    """
+    Writes a numpy array to an .npy file.
+
+    The array is first written to a temporary file which then replaces
+    filename, so that tables still memory mapped from the old file are
+    not invalidated.
+
+    :param str filename: Path of the .npy file.
+    :param array: Array to be written.
+    :type array: numpy.ndarray
+    """
+    temp_filename = f"{filename}.tmp"
+    with open(temp_filename, "wb") as f:
+        np.save(f, array, allow_pickle=False)
+    os.replace(temp_filename, filename)
+    return
+
+
+def _none_entries(col, data):
+    """
+    Finds the None entries of an object type column.
+
+    Only strings and None survive the conversion to fixed width strings
+    unchanged, other entries would come back as their string
+    representation.
+
+    :param col: Object type column.
+    :type col: astropy.table.Column or astropy.table.MaskedColumn
+    :param data: Data of the column without its mask.
+    :type data: numpy.ndarray
+    :returns: True where an unmasked entry is None.
+    :rtype: numpy.ndarray
+    :raises TypeError: If an unmasked entry is neither a string nor None.
+    """
+    unmasked = ~np.ma.getmaskarray(col)
+    is_str = np.array([isinstance(value, str) for value in data], dtype=bool)
+    is_none = np.array([value is None for value in data], dtype=bool)
+    is_none &= unmasked
+    other = unmasked & ~is_str & ~is_none
+    if other.any():
+        value = data[np.flatnonzero(other)[0]]
+        raise TypeError(
+            f"Column {col.name} contains {type(value).__name__} entries, "
+            "only strings and None can be saved in object type columns"
+        )
+    return is_none
+
+
+def save_npy(cat, path):
+    """
+    Saves a table in the columnar binary format.
+
+    The table is written into the directory path, one .npy file per
+    column plus one per column mask, and a columns.json header keeping
+    column order, object type flags, units and descriptions. Object type
+    columns are stored as fixed width strings and restored on loading,
+    None entries in them are kept in an additional mask. Table meta data
+    and column formats and meta data are kept in a meta.yaml file.
+
+    :param cat: Table to be saved.
+    :type cat: astropy.table.table.Table
+    :param str path: Directory to save the table in.
+    """
+    os.makedirs(path, exist_ok=True)
+    header = []
+    for i, colname in enumerate(cat.colnames):
+        col = cat[colname]
+        data = np.ma.getdata(col)
+        is_object = col.dtype == object
+        is_masked = isinstance(col, MaskedColumn)
+        has_none = False
+        if is_object:
+            is_none = _none_entries(col, data)
+            has_none = bool(is_none.any())
+            if has_none:
+                _write_array(os.path.join(path, f"{i}_none.npy"), is_none)
+            data = data.astype(str)
+        _write_array(os.path.join(path, f"{i}.npy"), data)
+        if is_masked:
+            _write_array(
+                os.path.join(path, f"{i}_mask.npy"), np.ma.getmaskarray(col)
+            )
+        header.append(
+            {
+                "name": colname,
+                "object": bool(is_object),
+                "none": has_none,
+                "masked": is_masked,
+                "unit": None if col.unit is None else col.unit.to_string(),
+                "description": col.description,
+            }
+        )
+    with open(os.path.join(path, "columns.json"), "w") as f:
+        json.dump(header, f)
+    _write_meta(cat, path)
+    return
+
+
+def _write_meta(cat, path):
+    """
+    Writes table and column meta data next to a table in the binary format.
+
+    Nothing is written for tables without meta data, a meta.yaml file of
+    an earlier save of the table is removed then.
+
+    :param cat: Table whose meta data is written.
+    :type cat: astropy.table.table.Table
+    :param str path: Directory the table is saved in.
+    """
+    filename = os.path.join(path, "meta.yaml")
+    meta = {}
+    if cat.meta:
+        meta["table"] = dict(cat.meta)
+    columns = {}
+    for colname in cat.colnames:
+        col_meta = {}
+        if cat[colname].format is not None:
+            col_meta["format"] = cat[colname].format
+        if cat[colname].meta:
+            col_meta["meta"] = dict(cat[colname].meta)
+        if col_meta:
+            columns[colname] = col_meta
+    if columns:
+        meta["columns"] = columns
+    if not meta:
+        if os.path.isfile(filename):
+            os.remove(filename)
+        return
+    with open(f"{filename}.tmp", "w") as f:
+        f.write(yaml.dump(meta))
+    os.replace(f"{filename}.tmp", filename)
+    return
+
+
+def _read_meta(cat, path):
+    """
+    Restores the meta data written by _write_meta.
+
+    :param cat: Table loaded from path, possibly only some of its columns.
+    :type cat: astropy.table.table.Table
+    :param str path: Directory the table was saved in.
+    :returns: Table with meta data.
+    :rtype: astropy.table.table.Table
+    """
+    filename = os.path.join(path, "meta.yaml")
+    if not os.path.isfile(filename):
+        return cat
+    with open(filename) as f:
+        meta = yaml.load(f)
+    cat.meta.update(meta.get("table", {}))
+    for colname, col_meta in meta.get("columns", {}).items():
+        if colname not in cat.colnames:
+            continue
+        cat[colname].format = col_meta.get("format")
+        cat[colname].meta.update(col_meta.get("meta", {}))
+    return cat
+
+
+def load_npy(path, mmap=False, columns=None):
+    """
+    Loads a table saved in the columnar binary format.
+
+    :param str path: Directory the table was saved in by save_npy.
+    :param bool mmap: If True, columns are memory mapped copy-on-write
+        instead of read into memory, so only the pages that are accessed
+        get read from disk and changes are never written back. Object
+        type columns stay memory mapped fixed width string columns then,
+        except for columns with None entries, which fixed width strings
+        cannot hold and which are read into memory as object type
+        columns. Defaults to False.
+    :param columns: Names of the columns to load, all if None. Only the
+        files of those columns are read.
+    :type columns: list(str) or None
+    :returns: Table with the column types and masks it was saved with.
+    :rtype: astropy.table.table.Table
+    """
+    mmap_mode = "c" if mmap else None
+    with open(os.path.join(path, "columns.json")) as f:
+        header = json.load(f)
+    cols = []
+    for i, col_info in enumerate(header):
+        if columns is not None and col_info["name"] not in columns:
+            continue
+        data = np.load(
+            os.path.join(path, f"{i}.npy"),
+            mmap_mode=mmap_mode,
+            allow_pickle=False,
+        )
+        has_none = col_info.get("none", False)
+        if col_info["object"] and (not mmap or has_none):
+            data = data.astype(object)
+            if has_none:
+                is_none = np.load(
+                    os.path.join(path, f"{i}_none.npy"), allow_pickle=False
+                )
+                data[is_none] = None
+        unit = col_info["unit"]
+        if unit is not None:
+            unit = units.Unit(unit, parse_strict="silent")
+        if col_info["masked"]:
+            mask = np.load(
+                os.path.join(path, f"{i}_mask.npy"),
+                mmap_mode=mmap_mode,
+                allow_pickle=False,
+            )
+            col_class = MaskedColumn
+            kwargs = {"mask": mask}
+        else:
+            col_class = Column
+            kwargs = {}
+        cols.append(
+            col_class(
+                data,
+                name=col_info["name"],
+                unit=unit,
+                description=col_info["description"],
+                copy=False,
+                **kwargs,
+            )
+        )
+    # copy=False keeps the memory mapped arrays as column data
+    return _read_meta(Table(cols, copy=False), path)
+
+
+def save(cats, names, location=Path().additional_data, fmt="xml"):
     """
     This functions saves the tables given as list in the cats parameter.
 
@@ -33,9 +270,22 @@ def save(cats, names, location=Path().additional_data):
         of tables in cats.
     :type names: list(str)
     :param str location: Defaults to ../../data/additional_data/
+    :param str fmt: Storage format, one of storage_formats. Defaults to
+        the VOTable export "xml", use "npy" for the columnar binary format
+        of intermediate tables. Saving as xml removes a binary copy of the
+        same name, which load would otherwise prefer.
     """
+    if fmt not in storage_formats:
+        raise ValueError(f"Unknown storage format {fmt}")
     # go through all the elements in both lists
     for cat, path in zip(cats, names):
+        if fmt == "npy":
+            save_npy(cat, f"{location}{path}")
+            continue
+        # load prefers the binary format, so an outdated copy would
+        # shadow the new export
+        if os.path.isdir(f"{location}{path}"):
+            shutil.rmtree(f"{location}{path}")
         temp = cat.copy()
         # for each column header
         temp = objecttostring(temp)
@@ -44,7 +294,7 @@ def save(cats, names, location=Path().additional_data):
     return
 
 
-def stringtoobject(cat, number=100):
+def stringtoobject(cat, number=100, string_type="object"):
     """
     This function changes string type columns to object type.
 
@@ -54,53 +304,145 @@ def stringtoobject(cat, number=100):
     :param cat: Table with at least two columns
     :type cat: astropy.table.table.Table
     :param int number: Length of longest string type element in the table.
-        Default is 100.
+        Default is 100. Columns of fixed width number or more are left
+        unchanged.
+    :param str string_type: Either "object" (default) or "unicode". The
+        later keeps fixed width unicode columns, shrunk to the length of
+        their longest element, which needs less memory than Python
+        string objects.
     :returns: Table with all string type columns transformed into object
         type ones.
     :rtype: astropy.table.table.Table
     """
-    # defining string types as calling them string does not work and
-    # instead the type name <U3 is needed for a string of length 3
-    stringtypes = [dtype(f"<U{j}") for j in range(1, number)]
+    if string_type not in ["object", "unicode"]:
+        raise ValueError(f"Unknown string type {string_type}")
     # for each column header
     for i in cat.colnames:
-        # if the type of the column is string
-        if cat[i].dtype in stringtypes:
+        col_dtype = cat[i].dtype
+        # if the type of the column is string, <U3 being a string of
+        # length 3 taking up 4 bytes per character
+        if col_dtype.kind != "U" or col_dtype.itemsize // 4 >= number:
+            continue
+        if string_type == "object":
             # transform the type into object
             cat[i] = cat[i].astype(object)
+        elif len(cat[i]) > 0:
+            width = max(int(np.char.str_len(np.ma.getdata(cat[i])).max()), 1)
+            if width < col_dtype.itemsize // 4:
+                cat[i] = cat[i].astype(f"<U{width}")
     return cat
 
 
-def string_to_object_whole_dict(dictionary, number=100):
+def string_to_object_whole_dict(dictionary, number=100, string_type="object"):
     for table_name in list(dictionary.keys()):
-        dictionary[table_name] = stringtoobject(dictionary[table_name], number)
+        dictionary[table_name] = stringtoobject(
+            dictionary[table_name], number, string_type
+        )
     return dictionary
 
 
-def load(paths, stringtoobjects=True, location=Path().additional_data):
+def load(
+    paths,
+    stringtoobjects=True,
+    location=Path().additional_data,
+    fmt=None,
+    mmap=False,
+    columns=None,
+):
     """
-    This function loads xml tables.
+    This function loads saved tables.
 
     :param paths: Filenames.
     :type paths: list(str)
     :param stringtoobjects: Wheter stringtoobject function should be
-        called.
+        called. Memory mapped tables are left unchanged, converting their
+        string columns would read them into memory.
     :type stringtoobjects: bool
     :param location: Folder to save the file in, default is
         ../../data/additional_data/
     :type location: str
+    :param fmt: Storage format, one of storage_formats. Defaults to None,
+        meaning the columnar binary format is used where present and
+        VOTable xml otherwise.
+    :type fmt: str or None
+    :param mmap: Whether tables in the columnar binary format should be
+        memory mapped instead of read into memory, see load_npy.
+    :type mmap: bool
+    :param columns: Names of the columns to load, all if None.
+    :type columns: list(str) or None
     :returns: Loaded tables.
     :rtype: list(astropy.table.table.Table)
     """
+    if fmt is not None and fmt not in storage_formats:
+        raise ValueError(f"Unknown storage format {fmt}")
     # initialize return parameter as list
     cats = []
     # go through all the elements in the paths list
     for path in paths:
-        # read the saved data into the cats lists as astropy votable element
-        to_append = votable.parse_single_table(f"{location}{path}.xml")
-        cats.append(to_append.to_table())
-    # go through all the tables in the cats list
-    if stringtoobjects:
-        for cat in cats:
-            cat = stringtoobject(cat, 3000)
+        if fmt == "npy" or (fmt is None and os.path.isdir(f"{location}{path}")):
+            cat = load_npy(f"{location}{path}", mmap, columns)
+            if stringtoobjects and not mmap:
+                cat = stringtoobject(cat, 3000)
+        else:
+            # read the saved data into the cats lists as astropy votable
+            # element
+            to_append = votable.parse_single_table(
+                f"{location}{path}.xml", columns=columns
+            )
+            cat = to_append.to_table()
+            if stringtoobjects:
+                cat = stringtoobject(cat, 3000)
+        cats.append(cat)
     return cats
+
+
+def file_hash(filename, sha=None):
+    """
+    Computes the content hash of a file.
+
+    :param str filename: Path of the file.
+    :param sha: Hash object to update instead of creating a new one.
+    :type sha: hashlib._Hash or None
+    :returns: Hexadecimal sha256 digest, None if the file does not exist.
+    :rtype: str or None
+    """
+    if not os.path.isfile(filename):
+        return None
+    if sha is None:
+        sha = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def table_hash(name, location=Path().additional_data):
+    """
+    Computes the content hash of a saved table.
+
+    Like load, the columnar binary format is used where present and
+    VOTable xml otherwise.
+
+    :param str name: Filename of the table.
+    :param str location: Folder the table was saved in, default is
+        ../../data/additional_data/
+    :returns: Hexadecimal sha256 digest, None if the table is not saved.
+    :rtype: str or None
+    """
+    path = f"{location}{name}"
+    if not os.path.isdir(path):
+        return file_hash(f"{path}.xml")
+    header_filename = os.path.join(path, "columns.json")
+    sha = hashlib.sha256()
+    if file_hash(header_filename, sha) is None:
+        return None
+    with open(header_filename) as f:
+        header = json.load(f)
+    for i, col_info in enumerate(header):
+        file_hash(os.path.join(path, f"{i}.npy"), sha)
+        if col_info["masked"]:
+            file_hash(os.path.join(path, f"{i}_mask.npy"), sha)
+        if col_info.get("none", False):
+            file_hash(os.path.join(path, f"{i}_none.npy"), sha)
+    file_hash(os.path.join(path, "meta.yaml"), sha)
+    return sha.hexdigest()
@@ -0,0 +1,112 @@
+"""
+Lightweight timing and memory instrumentation of the database building.
+"""
+
+import json
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+def peak_rss_in_mb():
+    """
+    Peak resident set size of the process so far.
+
+    :returns: Peak memory in MB, None where the resource module is not
+        available.
+    :rtype: float or None
+    """
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is given in bytes on macOS and in kilobytes elsewhere
+    if sys.platform == "darwin":
+        return maxrss / 1024**2
+    return maxrss / 1024
+
+
+def row_counts(cat, table_names=None):
+    """
+    Numbers of rows of the tables in a dictionary.
+
+    :param cat: Dictionary of table names and tables.
+    :type cat: dict(str,astropy.table.table.Table)
+    :param table_names: Tables to count, defaults to all of them.
+    :type table_names: list(str) or None
+    :returns: Dictionary of table names and numbers of rows.
+    :rtype: dict(str,int)
+    """
+    if table_names is None:
+        table_names = list(cat.keys())
+    return {name: len(cat[name]) for name in table_names if name in cat}
+
+
+class StageReport:
+    """
+    Collects wall time, CPU time, peak memory and row counts of stages.
+
+    Stages are measured with the stage context manager and written to a
+    JSON file with write.
+    """
+
+    def __init__(self):
+        """Constructor method"""
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Measures the enclosed code as one stage.
+
+        The yielded record is a dictionary that is added to the report
+        when the stage ends. Further entries like the row counts of the
+        tables built in the stage can be set on it. The peak resident set
+        size only grows over the lifetime of the process, so the record
+        holds the peak of the process at the end of the stage and how far
+        the stage raised it. A stage staying below an earlier peak raises
+        it by 0.
+
+        :param str name: Name of the stage.
+        :returns: Record of the stage.
+        :rtype: dict
+        """
+        record = {"stage": name}
+        peak = peak_rss_in_mb()
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield record
+        finally:
+            record["wall_time_in_s"] = time.perf_counter() - wall
+            record["cpu_time_in_s"] = time.process_time() - cpu
+            record["process_peak_rss_in_mb"] = peak_rss_in_mb()
+            record["peak_rss_increase_in_mb"] = (
+                None
+                if peak is None
+                else record["process_peak_rss_in_mb"] - peak
+            )
+            self.stages.append(record)
+
+    def write(self, filename):
+        """
+        Writes the report as JSON.
+
+        :param str filename: Path of the JSON file.
+        """
+        report = {
+            "stages": self.stages,
+            "total_wall_time_in_s": sum(
+                record["wall_time_in_s"] for record in self.stages
+            ),
+            "total_cpu_time_in_s": sum(
+                record["cpu_time_in_s"] for record in self.stages
+            ),
+        }
+        with open(filename, "w") as f:
+            json.dump(report, f, indent=2)
+        return